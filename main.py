@@ -3,11 +3,10 @@ import asyncio
 from aiogram import Bot, Dispatcher, types
 from aiogram.fsm.storage.redis import RedisStorage as redis_storage
 
-
-from src.scripts.queue.worker import QueueWorker
 from src.utils.redis_cache.redis_cache import redis_manager
 from src.config.config import settings
 from src.utils.logger import setup_logger
+from src.scripts.queue.rabbit_queue import model
 from src.bot.handlers import (
     cancel_handler,
     dialogs_config_handler,
@@ -65,27 +64,21 @@ async def on_startup():
     await bot.set_my_commands(commands)
 
 
+async def on_shutdown():
+    # Задачи, которые брокер ещё не подтвердил, откладываются в Redis до следующего запуска
+    logger.info("Отправка outbox перед остановкой")
+    await model.publisher.close()
+
+
 async def run():
     await bot.delete_webhook(drop_pending_updates=True)
     await on_startup()
+    dp.shutdown.register(on_shutdown)
 
-    logger.info("Запуск воркера")
-
-    await run_workers()
-
+    # Воркеры очередей запускаются отдельно: python run_worker.py
     logger.info("Запуск бота")
 
     await dp.start_polling(bot)
-    logger.info("Запуск бота")
-
-
-async def run_workers():
-    try:
-        worker = QueueWorker()
-        task = asyncio.create_task(worker.start())
-        await task
-    except Exception as e:
-        await run_workers()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,16 @@
+import argparse
+
+from src.config.config import settings
+from src.scripts.queue.supervisor import WorkerSupervisor
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Воркеры очередей")
+    parser.add_argument(
+        "groups",
+        nargs="*",
+        choices=list(settings.WORKER_GROUPS),
+        help="Группы очередей для запуска (по умолчанию все)",
+    )
+    args = parser.parse_args()
+
+    WorkerSupervisor(groups=args.groups).run()
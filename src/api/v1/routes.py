@@ -12,6 +12,8 @@ from src.db.orm.gpt_assistant_orm import GPTAssistantOrm
 from src.db.orm.bonus_links_orm import BonusLinksOrm
 from src.db.orm.user_orm import AnalyticsORM, logger
 from src.config.config import ROOT_PATH
+from src.scripts.circuit_breaker.service import get_metrics as get_circuit_metrics
+from src.scripts.response_cache.service import get_metrics as get_response_cache_metrics
 from src.scripts.spammer.service import TelegramBroadcaster
 
 router = APIRouter()
@@ -35,6 +37,20 @@ async def get_overview_stats():
     return JSONResponse(content=data)
 
 
+@router.get("/metrics/circuit-breakers")
+async def get_circuit_breakers():
+    """Состояние выключателей текстовых моделей по данным воркеров"""
+
+    return JSONResponse(content=await get_circuit_metrics())
+
+
+@router.get("/metrics/response-cache")
+async def get_response_cache():
+    """Попадания в кэш ответов на первые сообщения по моделям"""
+
+    return JSONResponse(content=await get_response_cache_metrics())
+
+
 @router.get("/analytics/activity")
 async def get_activity_data():
     data = await AnalyticsORM.get_activity_users()
@@ -13,6 +13,8 @@ from src.config.config import EXCLUDE_PATTERN, settings
 from src.db.orm.gpt_assistant_orm import GPTAssistantOrm
 from src.bot.keyboards.gpt_assist_keyboard import gpt_assist_keyboard
 from src.db.orm.user_orm import PremiumUserORM
+from src.scripts.admission.service import admission_controller
+from src.scripts.queue.deadline import lock_ttl, new_deadline
 from src.scripts.queue.rabbit_queue import model
 from src.utils.redis_cache.redis_cache import redis_manager
 from src.utils.text_scripts import _get_dialogs, _create_new_dialog, _get_dialog
@@ -168,7 +170,18 @@ async def text_handler(message: types.Message, state: FSMContext):
         await message.answer("⚠️ Дождитесь завершения предыдущей генерации")
         return
 
-    answer_message = await message.answer("⏳ Подождите ваше сообщение в обработке...")
+    admission = await admission_controller.check(
+        data.get("queue_select"), data["priority"]
+    )
+    if admission.shed:
+        await message.answer(admission.text)
+        return
+
+    answer_message = await message.answer(admission.text or "⏳ Подождите ваше сообщение в обработке...")
+
+    deadline = new_deadline(data.get("queue_select"))
+    # Ключ ставится до публикации, чтобы быстрый воркер не снял его раньше
+    await redis_manager.set(key=key, value="generate", ttl=lock_ttl(deadline))
 
     await _publish_message(
         queue_name=data.get("queue_select"),
@@ -180,10 +193,9 @@ async def text_handler(message: types.Message, state: FSMContext):
         energy_cost=data["energy_cost"],
         key=key,
         priority=data["priority"],
+        deadline=deadline,
     )
 
-    await redis_manager.set(key=key, value="generate", ttl=120)
-
 
 @router.message(F.document, StateFilter(GPTState.text))
 async def file_handler(message: types.Message, state: FSMContext, bot: Bot):
@@ -197,9 +209,21 @@ async def file_handler(message: types.Message, state: FSMContext, bot: Bot):
     if not any(file_name.endswith(ext) for ext in allowed_extensions):
         await message.answer("⚠️ Поддерживаются только файлы .txt, .csv, .html!")
         return
+    if message.document.file_size and message.document.file_size > settings.DOCUMENT_MAX_BYTES:
+        await message.answer(
+            f"⚠️ Файл слишком большой, максимум {settings.DOCUMENT_MAX_BYTES / 1_000_000:g} МБ"
+        )
+        return
 
     file_url = f"https://api.telegram.org/file/bot{settings.BOT_API}/{file.file_path}"
-    answer_message = await message.answer(f"📂 Файл `{file_name}` обрабатывается...")
+    admission = await admission_controller.check(
+        data.get("queue_select"), data["priority"]
+    )
+    if admission.shed:
+        await message.answer(admission.text)
+        return
+
+    answer_message = await message.answer(admission.text or f"📂 Файл `{file_name}` обрабатывается...")
 
     await _publish_message(
         queue_name=data.get("queue_select"),
@@ -229,22 +253,36 @@ async def voice_handler(message: types.Message, state: FSMContext, bot: Bot):
         return
 
     file_url = f"https://api.telegram.org/file/bot{settings.BOT_API}/{file.file_path}"
-    answer_message = await message.answer("🎙 Обработка голосового сообщения...")
+    admission = await admission_controller.check(
+        data.get("queue_select"), data["priority"]
+    )
+    if admission.shed:
+        await message.answer(admission.text)
+        return
+
+    answer_message = await message.answer(admission.text or "🎙 Обработка голосового сообщения...")
+
+    deadline = new_deadline(data.get("queue_select"))
+    await redis_manager.set(key=key, value="generate", ttl=lock_ttl(deadline))
 
     await _publish_message(
         queue_name=data.get("queue_select"),
         dialog_id=int(data.get("dialog_id")),
         version=data.get("select_model"),
-        file={"url": file_url, "type": "voice"},
+        file={
+            "url": file_url,
+            "type": "voice",
+            "unique_id": voice.file_unique_id,
+            "duration": voice.duration,
+        },
         user_id=message.from_user.id,
         answer_message=answer_message.message_id,
         energy_cost=data["energy_cost"],
         key=key,
         priority=data["priority"],
+        deadline=deadline,
     )
 
-    await redis_manager.set(key=key, value="generate", ttl=120)
-
 
 async def _publish_message(**kwargs):
     await model.publish_message(**kwargs)
@@ -10,7 +10,8 @@ from src.bot.keyboards.select_gpt import select_image_model, cancel_kb
 from src.bot.states.image_state import ImageState
 from src.db.orm.config_orm import ConfigORM
 from src.db.orm.user_orm import PremiumUserORM
-from src.scripts.queue.rabbit_queue import RabbitQueue
+from src.scripts.admission.service import admission_controller
+from src.scripts.queue.rabbit_queue import model
 from src.utils.cached_user import _cached_user
 from src.utils.logger import setup_logger
 from src.utils.redis_cache.redis_cache import redis_manager
@@ -21,8 +22,6 @@ PREMIUM_TEXT = "⚠️ Дождитесь завершения ваших ген
 NOT_PREMIUM_TEXT = "⚠️ Дождитесь завершения предыдущей генерации или оформите Premium, чтобы запускать несколько генераций одновременно. 👉 /premium"
 
 
-model = RabbitQueue()
-
 router = Router()
 logger = setup_logger(__name__)
 
@@ -103,12 +102,22 @@ async def handle_text(message: types.Message, state: FSMContext):
 
     data = await state.get_data()
     text = message.text
+
+    admission = await admission_controller.check(
+        data.get("type_gpt"), data.get("priority", 0)
+    )
+    if admission.shed:
+        await message.answer(admission.text)
+        return
+
     key = await check_generation(message, data.get("priority", 0))
 
     if key is False:
         return
 
-    answer_message = await message.answer("⏳ Подождите ваше сообщение в обработке...")
+    answer_message = await message.answer(
+        admission.text or "⏳ Подождите ваше сообщение в обработке..."
+    )
 
     await model.publish_message(
         queue_name=data.get("type_gpt"),
@@ -132,13 +141,18 @@ async def refresh_image(callback_data: types.CallbackQuery, state: FSMContext):
     user_id = callback_data.from_user.id
     data = await state.get_data()
 
+    admission = await admission_controller.check("refresh_midjourney", data.get("priority", 0))
+    if admission.shed:
+        await callback_data.message.answer(admission.text)
+        return
+
     key = await check_generation(callback_data, data.get("priority", 0))
 
     if key is False:
         return
 
     answer_message = await callback_data.message.answer(
-        "⏳ Подождите ваше сообщение в обработке..."
+        admission.text or "⏳ Подождите ваше сообщение в обработке..."
     )
 
     await model.publish_message(
@@ -164,13 +178,18 @@ async def upscale_image(callback_data: types.CallbackQuery, state: FSMContext):
     user_id = callback_data.from_user.id
     data = await state.get_data()
 
+    admission = await admission_controller.check("variation_midjourney", data.get("priority", 0))
+    if admission.shed:
+        await callback_data.message.answer(admission.text)
+        return
+
     key = await check_generation(callback_data, data.get("priority", 0))
 
     if key is False:
         return
 
     answer_message = await callback_data.message.answer(
-        "⏳ Подождите ваше сообщение в обработке..."
+        admission.text or "⏳ Подождите ваше сообщение в обработке..."
     )
 
     await model.publish_message(
@@ -197,13 +216,18 @@ async def upscale_image(callback_data: types.CallbackQuery, state: FSMContext):
     user_id = callback_data.from_user.id
     data = await state.get_data()
 
+    admission = await admission_controller.check("upscale_midjourney", data.get("priority", 0))
+    if admission.shed:
+        await callback_data.message.answer(admission.text)
+        return
+
     key = await check_generation(callback_data, data.get("priority", 0))
 
     if key is False:
         return
 
     answer_message = await callback_data.message.answer(
-        "⏳ Подождите ваше сообщение в обработке..."
+        admission.text or "⏳ Подождите ваше сообщение в обработке..."
     )
 
     await model.publish_message(
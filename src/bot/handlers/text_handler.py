@@ -12,6 +12,8 @@ from src.bot.keyboards.select_gpt import (
 from src.bot.states.text_state import TextState
 from src.config.config import settings, EXCLUDE_PATTERN
 from src.db.orm.user_orm import PremiumUserORM
+from src.scripts.admission.service import admission_controller
+from src.scripts.queue.deadline import lock_ttl, new_deadline
 from src.scripts.queue.rabbit_queue import model
 from src.utils.logger import setup_logger
 from src.utils.redis_cache.redis_cache import redis_manager
@@ -211,7 +213,18 @@ async def text_handler(message: types.Message, state: FSMContext):
         await message.answer("⚠️ Дождитесь завершения предыдущей генерации")
         return
 
-    answer_message = await message.answer("⏳ Подождите ваше сообщение в обработке...")
+    admission = await admission_controller.check(
+        data.get("queue_select"), data["priority"]
+    )
+    if admission.shed:
+        await message.answer(admission.text)
+        return
+
+    answer_message = await message.answer(admission.text or "⏳ Подождите ваше сообщение в обработке...")
+
+    deadline = new_deadline(data.get("queue_select"))
+    # Ключ ставится до публикации, чтобы быстрый воркер не снял его раньше
+    await redis_manager.set(key=key, value="generate", ttl=lock_ttl(deadline))
 
     await model.publish_message(
         queue_name=data.get("queue_select"),
@@ -223,10 +236,9 @@ async def text_handler(message: types.Message, state: FSMContext):
         energy_cost=data["energy_cost"],
         key=key,
         priority=data["priority"],
+        deadline=deadline,
     )
 
-    await redis_manager.set(key=key, value="generate", ttl=120)
-
 
 @router.message(F.document, StateFilter(TextState.text))
 async def file_handler(message: types.Message, state: FSMContext, bot: Bot):
@@ -241,6 +253,11 @@ async def file_handler(message: types.Message, state: FSMContext, bot: Bot):
     if not any(file_name.endswith(ext) for ext in allowed_extensions):
         await message.answer("⚠️ Поддерживаются только файлы .txt, .csv, .html!")
         return
+    if message.document.file_size and message.document.file_size > settings.DOCUMENT_MAX_BYTES:
+        await message.answer(
+            f"⚠️ Файл слишком большой, максимум {settings.DOCUMENT_MAX_BYTES / 1_000_000:g} МБ"
+        )
+        return
 
     key = f"{message.from_user.id}:generate"
 
@@ -250,7 +267,17 @@ async def file_handler(message: types.Message, state: FSMContext, bot: Bot):
         return
 
     file_url = f"https://api.telegram.org/file/bot{settings.BOT_API}/{file.file_path}"
-    answer_message = await message.answer(f"📂 Файл `{file_name}` обрабатывается...")
+    admission = await admission_controller.check(
+        data.get("queue_select"), data["priority"]
+    )
+    if admission.shed:
+        await message.answer(admission.text)
+        return
+
+    answer_message = await message.answer(admission.text or f"📂 Файл `{file_name}` обрабатывается...")
+
+    deadline = new_deadline(data.get("queue_select"))
+    await redis_manager.set(key=key, value="generate", ttl=lock_ttl(deadline))
 
     await model.publish_message(
         queue_name=data.get("queue_select"),
@@ -263,8 +290,8 @@ async def file_handler(message: types.Message, state: FSMContext, bot: Bot):
         energy_cost=data["energy_cost"],
         key=key,
         priority=data["priority"],
+        deadline=deadline,
     )
-    await redis_manager.set(key=key, value="generate", ttl=120)
 
 
 @router.message(F.voice, StateFilter(TextState.text))
@@ -281,18 +308,32 @@ async def voice_handler(message: types.Message, state: FSMContext, bot: Bot):
         return
 
     file_url = f"https://api.telegram.org/file/bot{settings.BOT_API}/{file.file_path}"
-    answer_message = await message.answer("🎙 Обработка голосового сообщения...")
+    admission = await admission_controller.check(
+        data.get("queue_select"), data["priority"]
+    )
+    if admission.shed:
+        await message.answer(admission.text)
+        return
+
+    answer_message = await message.answer(admission.text or "🎙 Обработка голосового сообщения...")
+
+    deadline = new_deadline(data.get("queue_select"))
+    await redis_manager.set(key=key, value="generate", ttl=lock_ttl(deadline))
 
     await model.publish_message(
         queue_name=data.get("queue_select"),
         dialog_id=int(data.get("dialog_id")),
         version=data.get("select_model"),
-        file={"url": file_url, "type": "voice"},
+        file={
+            "url": file_url,
+            "type": "voice",
+            "unique_id": voice.file_unique_id,
+            "duration": voice.duration,
+        },
         user_id=message.from_user.id,
         answer_message=answer_message.message_id,
         energy_cost=data["energy_cost"],
         key=key,
         priority=data["priority"],
+        deadline=deadline,
     )
-
-    await redis_manager.set(key=key, value="generate", ttl=120)
@@ -1,3 +1,4 @@
+import os
 import pathlib
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -25,13 +26,20 @@ class Settings(BaseSettings):
     RABBIT_PASS: str = "guest"
     RABBIT_HOST: str = "rabbitmq"
     RABBIT_PORT: int = 5672
+    RABBIT_PUBLISH_CHANNELS: int = 4
+    QUEUE_CODEC: str = "json"  # msgpack - когда все воркеры читают оба формата
 
     # text / code
     GPT_KEY: str = None
     CLAUDE_KEY: str = None
     GPT_ASSIS_KEY: str = None
+    # дополнительные ключи через запятую, нагрузка распределяется по всем
+    GPT_KEYS: str = ""
+    CLAUDE_KEYS: str = ""
+    CREDENTIAL_QUARANTINE: int = 600  # ключ с ошибкой авторизации или квоты не используется
     # image
     MJ_KEY: str = None
+    MJ_KEYS: str = ""
     FLUX_KEY: str = None
     DALL_KEY: str = None
     # YOOMONEY_API
@@ -43,62 +51,142 @@ class Settings(BaseSettings):
     ADMIN_USER: str = "root"
     ADMIN_PASS: str = "root"
 
+    # worker
+    WORKER_TEXT_PROCESSES: int = 0  # 0 - по количеству ядер
+    WORKER_MIDJOURNEY_PROCESSES: int = 1
+    WORKER_DRAIN_TIMEOUT: int = 45  # ожидание текущих задач при SIGTERM
+    WORKER_SHUTDOWN_TIMEOUT: int = 60
+    WORKER_GROUP_PROCESSES: int = 1  # процессов в группе воркера, задаёт супервизор
+
+    # streaming
+    STREAM_ANSWERS: bool = True  # выводить ответы текстовых моделей по мере генерации
+    STREAM_EDIT_INTERVAL: float = 1.5  # Telegram ограничивает частоту правок сообщения
+    ASSISTANT_RUN_TIMEOUT: int = 180  # жёсткий предел на run ассистента
+
+    # admission
+    ADMISSION_CACHE_TTL: int = 5  # как часто обновляется глубина очередей
+
+    # http client
+    HTTP_TIMEOUT: int = 120  # общий предел на запрос вместе с чтением ответа
+    HTTP_CONNECT_TIMEOUT: int = 10
+    HTTP_LIMIT: int = 100  # соединений на процесс
+    HTTP_LIMIT_PER_HOST: int = 20
+    HTTP_DNS_TTL: int = 300
+    HTTP_KEEPALIVE_TIMEOUT: int = 30
+    PROVIDER_TIMEOUT: int = 600  # предел на вызов OpenAI/Anthropic, если у задачи нет срока
+
+    # dialog summary
+    SUMMARY_MODEL: str = "gpt-4o-mini"  # дешёвая модель для сжатия истории
+    SUMMARY_TRIGGER: float = 0.75  # доля context_tokens, после которой история сжимается
+    SUMMARY_KEEP: float = 0.25  # доля context_tokens, которая остаётся дословно
+
+    # documents
+    DOCUMENT_MAX_BYTES: int = 2_000_000  # больше файла не скачивается
+    DOCUMENT_INLINE_CHARS: int = 20000  # документ длиннее пересказывается по частям
+    DOCUMENT_CHUNK_TOKENS: int = 8000
+    DOCUMENT_MAP_CONCURRENCY: int = 4  # частей документа пересказывается одновременно
+    DOCUMENT_MODEL: str = "gpt-4o-mini"
+
+    # response cache
+    RESPONSE_CACHE_TTL: int = 7 * 24 * 3600
+    RESPONSE_CACHE_MAX_ENTRIES: int = 10000  # на модель, лишние вытесняются по давности обращения
+    RESPONSE_CACHE_MAX_PROMPT_CHARS: int = 2000  # длинные запросы почти не повторяются
+
+    # voice
+    TRANSCRIPT_CACHE_TTL: int = 30 * 24 * 3600  # голосовые пересылают и спустя недели
+    TRANSCRIBE_SEGMENT_SECONDS: int = 60  # длинные записи режутся на фрагменты такой длины
+    TRANSCRIBE_CONCURRENCY: int = 4
+
+    # providers
+    TEXT_PROVIDER_OVERRIDE: str = ""  # mock - за все текстовые модели отвечает заглушка (нагрузочные тесты)
+    MOCK_LATENCY_MEDIAN: float = 0.8  # секунды до первого токена
+    MOCK_ERROR_RATE: float = 0.0
+
     # debug
     DEBUG: bool = False
 
     @property
     def TEXT_GPT(self):
+        """
+        context_tokens - сколько токенов истории диалога отправлять модели,
+        fallback - модель, которая отвечает, пока выключатель основной разомкнут,
+        slow_call - после скольких секунд ожидания первого токена стрима вызов считается неудачным,
+        response_cache - отвечать на одинаковые первые сообщения диалогов из кэша,
+        provider - реализация из ProviderRegistry (openai, anthropic, mock)
+        """
         return {
             "gpt-4o-mini": {
+                "provider": "openai",
                 "energy_cost": 10,
                 "select_model": "ChatGPT 4o-mini",
                 "premium_free": True,
                 "file_use": True,
                 "voice": True,
+                "context_tokens": 32000,
+                "fallback": "claude-3-5-haiku-20241022",
+                "response_cache": True,
             },
             "gpt-4o": {
+                "provider": "openai",
                 "energy_cost": 10,
                 "select_model": "ChatGPT 4o",
                 "premium_free": True,
                 "file_use": True,
                 "voice": True,
+                "context_tokens": 32000,
+                "fallback": "claude-3-7-sonnet-20250219",
             },
             "o1": {
+                "provider": "openai",
                 "energy_cost": 10,
                 "select_model": "ChatGPT o1",
                 "premium_free": True,
                 "file_use": True,
                 "voice": True,
+                "context_tokens": 32000,
+                "stream": False,
             },
             "gpt-4.5-preview": {
+                "provider": "openai",
                 "energy_cost": 10,
                 "select_model": "ChatGPT 4.5",
                 "premium_free": True,
                 "file_use": True,
                 "voice": True,
+                "context_tokens": 16000,
                 "disable": True,
             },
             "claude-3-5-haiku-20241022": {
+                "provider": "anthropic",
                 "energy_cost": 10,
                 "select_model": "Claude 3.5 Haiku",
                 "premium_free": True,
                 "file_use": True,
                 "voice": False,
+                "context_tokens": 32000,
+                "fallback": "gpt-4o-mini",
+                "response_cache": True,
                 "disable": False,
             },
             "claude-3-5-sonnet-20241022": {
+                "provider": "anthropic",
                 "energy_cost": 10,
                 "select_model": "Claude 3.5 Sonnet",
                 "premium_free": True,
                 "file_use": True,
                 "voice": False,
+                "context_tokens": 32000,
+                "fallback": "gpt-4o",
             },
             "claude-3-7-sonnet-20250219": {
+                "provider": "anthropic",
                 "energy_cost": 10,
                 "select_model": "Claude 3.7 Sonnet",
                 "premium_free": True,
                 "file_use": True,
                 "voice": False,
+                "context_tokens": 32000,
+                "fallback": "gpt-4o",
             },
         }
 
@@ -116,6 +204,160 @@ class Settings(BaseSettings):
             },
         }
 
+    @property
+    def QUEUES(self):
+        """
+        Настройки потребителей по очередям.
+        prefetch_count больше concurrency, чтобы планировщику было из чего
+        выбирать задачу следующего пользователя. avg_duration - ожидаемое время
+        задачи в секундах, по нему оценивается очередь, пока нет замеров.
+        ttl - срок ответа в секундах от отправки: задача, не выполненная за это время,
+        отменяется (в том числе посреди вызова провайдера), энергия возвращается.
+        """
+        return {
+            "gpt_assistant": {
+                "prefetch_count": 20,
+                "concurrency": 10,
+                "retry_delays": [5, 30],
+                "avg_duration": 30,
+                "ttl": 900,
+            },
+            "chatgpt": {
+                "prefetch_count": 60,
+                "concurrency": 30,
+                "retry_delays": [5, 30, 120],
+                "avg_duration": 15,
+                "ttl": 600,
+            },
+            "claude": {
+                "prefetch_count": 60,
+                "concurrency": 30,
+                "retry_delays": [5, 30, 120],
+                "avg_duration": 15,
+                "ttl": 600,
+            },
+            "midjourney": {
+                "prefetch_count": 20,
+                "concurrency": 10,
+                "retry_delays": [10, 60],
+                "avg_duration": 60,
+                "ttl": 900,
+            },
+            "refresh_midjourney": {
+                "prefetch_count": 10,
+                "concurrency": 5,
+                "retry_delays": [10, 60],
+                "avg_duration": 60,
+                "ttl": 900,
+            },
+            "upscale_midjourney": {
+                "prefetch_count": 10,
+                "concurrency": 5,
+                "retry_delays": [10, 60],
+                "avg_duration": 30,
+                "ttl": 900,
+            },
+            "variation_midjourney": {
+                "prefetch_count": 10,
+                "concurrency": 5,
+                "retry_delays": [10, 60],
+                "avg_duration": 60,
+                "ttl": 900,
+            },
+            "referral": {
+                "prefetch_count": 50,
+                "concurrency": 50,
+                "retry_delays": [30],
+                "avg_duration": 1,
+            },
+            "dialog_summary": {
+                "prefetch_count": 10,
+                "concurrency": 5,
+                "retry_delays": [30, 120],
+                "avg_duration": 20,
+                "ttl": 3600,
+            },
+        }
+
+    @property
+    def CIRCUIT_BREAKER(self):
+        """
+        Выключатели моделей: за последние window секунд при хотя бы min_calls вызовах
+        доля ошибок и стримов, первый токен которых пришёл позже slow_call секунд,
+        выше failure_rate - модель отключается на open_for секунд. Ответы без стрима
+        по времени не оцениваются: оно зависит от длины ответа
+        """
+        return {
+            "window": 60,
+            "min_calls": 10,
+            "failure_rate": 0.5,
+            "slow_call": 30,
+            "open_for": 30,
+        }
+
+    @property
+    def RATE_LIMITS(self):
+        """
+        Лимиты провайдеров на одну модель для всей группы воркера: rpm/tpm - запросы
+        и токены в минуту (уточняются по заголовкам ответов), concurrency - верхняя
+        граница параллельных запросов, которую подбирает AIMD. Лимитеры живут в
+        памяти процесса, поэтому каждый процесс группы берёт равную долю:
+        лимит / WORKER_GROUP_PROCESSES.
+        """
+        return {
+            "openai": {"rpm": 5000, "tpm": 2000000, "concurrency": 50},
+            "anthropic": {"rpm": 1000, "tpm": 400000, "concurrency": 30},
+            "goapi": {"rpm": 300, "tpm": None, "concurrency": 10},
+            "mock": {"rpm": None, "tpm": None, "concurrency": 5000},
+        }
+
+    @property
+    def MOCK_PROVIDER(self):
+        """
+        Заглушка модели: задержка до первого токена логнормальная с медианой
+        latency_median и разбросом latency_sigma, дальше tokens_per_second.
+        error_rate - доля временных ошибок (как 429), fatal_error_rate - постоянных
+        """
+        return {
+            "latency_median": self.MOCK_LATENCY_MEDIAN,
+            "latency_sigma": 0.5,
+            "tokens_per_second": 80,
+            "response_tokens": 300,
+            "error_rate": self.MOCK_ERROR_RATE,
+            "fatal_error_rate": 0.0,
+        }
+
+    @property
+    def ADMISSION(self):
+        """Пороги ожидания в очереди (секунды) по тарифам: после delay - предупреждаем, после shed - отказываем"""
+        return {
+            "free": {"delay_after": 20, "shed_after": 300},
+            "premium": {"delay_after": 60, "shed_after": 900},
+        }
+
+    @property
+    def WORKER_GROUPS(self):
+        """Группы очередей и количество процессов воркера для каждой"""
+        return {
+            "text": {
+                "queues": ["gpt_assistant", "chatgpt", "claude", "dialog_summary"],
+                "processes": self.WORKER_TEXT_PROCESSES or os.cpu_count() or 1,
+            },
+            "midjourney": {
+                "queues": [
+                    "midjourney",
+                    "refresh_midjourney",
+                    "upscale_midjourney",
+                    "variation_midjourney",
+                ],
+                "processes": self.WORKER_MIDJOURNEY_PROCESSES,
+            },
+            "notifications": {
+                "queues": ["referral"],
+                "processes": 1,
+            },
+        }
+
     @property
     def bot_api(self) -> str:
         return self.BOT_API
@@ -132,6 +374,20 @@ class Settings(BaseSettings):
     def get_reddis_link(self):
         return f"redis://{self.REDDIS_PASS}@{self.REDDIS_HOST}:{self.REDDIS_PORT}"
 
+    @property
+    def API_KEYS(self):
+        """Ключи провайдеров, основной - первым"""
+
+        def collect(primary, extra):
+            keys = [primary, *extra.split(",")]
+            return list(dict.fromkeys(key.strip() for key in keys if key and key.strip()))
+
+        return {
+            "openai": collect(self.GPT_KEY, self.GPT_KEYS),
+            "anthropic": collect(self.CLAUDE_KEY, self.CLAUDE_KEYS),
+            "goapi": collect(self.MJ_KEY, self.MJ_KEYS),
+        }
+
     @property
     def get_rabbit_link(self):
         return f"amqp://{self.RABBIT_USER}:{self.RABBIT_PASS}@{self.RABBIT_HOST}:{self.RABBIT_PORT}"
@@ -143,6 +143,15 @@ class Dialog(Base):
     title: Mapped[str] = mapped_column(String(128), nullable=False)
 
     gpt_select: Mapped[str] = mapped_column(nullable=False)
+
+    # Thread OpenAI Assistants и последнее сообщение диалога, которое в него уже попало
+    thread_id: Mapped[str] = mapped_column(nullable=True)
+    thread_message_id: Mapped[int] = mapped_column(BigInteger, nullable=True)
+
+    # Краткое содержание старой части диалога и последнее вошедшее в него сообщение
+    summary: Mapped[str] = mapped_column(Text, nullable=True)
+    summary_message_id: Mapped[int] = mapped_column(BigInteger, nullable=True)
+
     messages: Mapped[List["Message"]] = relationship(
         back_populates="dialog", cascade="all, delete-orphan"
     )
@@ -158,6 +167,8 @@ class Message(Base):
 
     role: Mapped[MessageRole] = mapped_column(SQLEnum(MessageRole), nullable=False)
     message: Mapped[str] = mapped_column(String(25000), nullable=False)
+    # Оценка токенов считается при записи, чтобы собирать контекст без подсчёта
+    token_count: Mapped[int] = mapped_column(Integer, nullable=True)
 
     dialog: Mapped["Dialog"] = relationship(back_populates="messages")
 
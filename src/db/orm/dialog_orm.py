@@ -1,5 +1,5 @@
 from typing import List, Optional
-from sqlalchemy import select, and_
+from sqlalchemy import select, and_, func, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
@@ -8,6 +8,12 @@ from src.db.models import Dialog, Message
 from src.db.custom_decorators import with_session
 
 
+# Токены сообщения; для строк без token_count - та же оценка, что в src/utils/token_counter.py
+MESSAGE_TOKENS = func.coalesce(
+    Message.token_count, func.ceil(func.octet_length(Message.message) / 4.0) + 4
+)
+
+
 class DialogORM:
     @staticmethod
     @with_session
@@ -80,6 +86,101 @@ class DialogORM:
         
         return messages
 
+    @staticmethod
+    @with_session
+    async def get_dialog_context(
+        dialog_id: int,
+        token_budget: int,
+        after_message_id: Optional[int] = None,
+        session: AsyncSession = None,
+    ) -> List[Message]:
+        """
+        Последние сообщения диалога после after_message_id, которые помещаются
+        в бюджет токенов (самое новое - всегда)
+        """
+
+        window = (
+            select(
+                Message.message_id,
+                MESSAGE_TOKENS.label("tokens"),
+                func.sum(MESSAGE_TOKENS)
+                .over(order_by=Message.message_id.desc())
+                .label("running"),
+            )
+            .where(
+                Message.dialog_id == dialog_id,
+                Message.message_id > (after_message_id or 0),
+            )
+            .subquery()
+        )
+
+        stmt = (
+            select(Message)
+            .join(window, Message.message_id == window.c.message_id)
+            .where(
+                Message.dialog_id == dialog_id,
+                or_(
+                    window.c.running <= token_budget,
+                    window.c.running == window.c.tokens,
+                ),
+            )
+            .order_by(Message.message_id.asc())
+        )
+
+        result = await session.execute(stmt)
+        return list(result.scalars().all())
+
+    @staticmethod
+    @with_session
+    async def count_dialog_tokens(
+        dialog_id: int, after_message_id: Optional[int] = None, session: AsyncSession = None
+    ) -> int:
+        """Сумма токенов сообщений диалога после after_message_id"""
+        stmt = select(func.coalesce(func.sum(MESSAGE_TOKENS), 0)).where(
+            Message.dialog_id == dialog_id,
+            Message.message_id > (after_message_id or 0),
+        )
+        result = await session.execute(stmt)
+        return int(result.scalar_one())
+
+    @staticmethod
+    @with_session
+    async def get_messages_after(
+        dialog_id: int,
+        after_message_id: Optional[int] = None,
+        limit: int = 200,
+        session: AsyncSession = None,
+    ) -> List[Message]:
+        """Сообщения диалога после after_message_id по порядку"""
+        stmt = (
+            select(Message)
+            .where(
+                Message.dialog_id == dialog_id,
+                Message.message_id > (after_message_id or 0),
+            )
+            .order_by(Message.message_id.asc())
+            .limit(limit)
+        )
+        result = await session.execute(stmt)
+        return list(result.scalars().all())
+
+    @staticmethod
+    @with_session
+    async def set_summary(
+        dialog_id: int,
+        summary: str,
+        summary_message_id: int,
+        session: AsyncSession = None,
+    ) -> None:
+        """Сохранить краткое содержание диалога"""
+        stmt = select(Dialog).where(Dialog.id == dialog_id)
+        result = await session.execute(stmt)
+        dialog = result.scalar_one_or_none()
+        if dialog:
+            dialog.summary = summary
+            dialog.summary_message_id = summary_message_id
+            await session.commit()
+
     @staticmethod
     @with_session
     async def get_dialog_messages_by_uuid(
@@ -140,6 +241,7 @@ class DialogORM:
         dialog: Dialog | int,
         role: MessageRole,
         message: str,
+        token_count: Optional[int] = None,
         session: AsyncSession = None,
     ) -> bool:
         """Добавить сообщение в диалог"""
@@ -158,7 +260,9 @@ class DialogORM:
         if dialog.title == "Не указан":
             dialog.title = message[:127]
 
-        new_message = Message(dialog_id=dialog.id, role=role, message=message)
+        new_message = Message(
+            dialog_id=dialog.id, role=role, message=message, token_count=token_count
+        )
         session.add(new_message)
         await session.commit()
 
@@ -178,6 +282,23 @@ class DialogORM:
 
         return dialog
 
+    @staticmethod
+    @with_session
+    async def set_thread(
+        dialog_id: int,
+        thread_id: str,
+        thread_message_id: Optional[int],
+        session: AsyncSession = None,
+    ) -> None:
+        """Сохранить thread ассистента и последнее переданное в него сообщение"""
+        stmt = select(Dialog).where(Dialog.id == dialog_id)
+        result = await session.execute(stmt)
+        dialog = result.scalar_one_or_none()
+        if dialog:
+            dialog.thread_id = thread_id
+            dialog.thread_message_id = thread_message_id
+            await session.commit()
+
     @staticmethod
     @with_session
     async def delete_dialog(dialog_id: int, session: AsyncSession = None):
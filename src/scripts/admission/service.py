@@ -0,0 +1,148 @@
+import asyncio
+import math
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from src.config.config import settings
+from src.scripts.queue.rabbit_queue import COMPLETED_KEY, model
+from src.utils.logger import setup_logger
+from src.utils.redis_cache.redis_cache import redis_manager
+
+
+ACCEPT = "accept"
+DELAY = "delay"
+SHED = "shed"
+
+SNAPSHOT_KEY = "admission:{queue_name}"
+# Предыдущий замер нужен для скорости разбора очереди, поэтому живёт дольше кэша
+SNAPSHOT_TTL = 300
+# Вес нового замера скорости в скользящем среднем
+RATE_SMOOTHING = 0.5
+
+DELAY_TEXT = "⏳ Сейчас много запросов, ответ будет примерно через {minutes} мин."
+SHED_TEXT = (
+    "⚠️ Сервис сейчас перегружен, ваш запрос не принят и энергия не списана.\n"
+    "Попробуйте отправить его через несколько минут."
+)
+
+
+@dataclass
+class Admission:
+    """Решение по новому запросу"""
+
+    action: str
+    eta: float = 0
+
+    @property
+    def shed(self) -> bool:
+        return self.action == SHED
+
+    @property
+    def text(self) -> Optional[str]:
+        """Сообщение пользователю или None, если запрос принят как обычно"""
+
+        if self.action == DELAY:
+            return DELAY_TEXT.format(minutes=max(1, math.ceil(self.eta / 60)))
+        if self.action == SHED:
+            return SHED_TEXT
+        return None
+
+
+class AdmissionController:
+    """
+    Решает, принять ли запрос в очередь, по оценке времени ожидания.
+
+    Глубина очереди берётся у брокера не чаще раза в ADMISSION_CACHE_TTL секунд
+    и кэшируется в Redis для всех процессов бота. Скорость разбора считается по
+    счётчику завершённых задач, который ведут воркеры; пока замеров нет,
+    используется avg_duration из settings.QUEUES.
+    """
+
+    def __init__(self):
+        self.logger = setup_logger(__name__)
+        self._snapshots: Dict[str, Dict[str, Any]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def check(self, queue_name: Optional[str], priority: int = 0) -> Admission:
+        if not queue_name or queue_name not in settings.QUEUES:
+            return Admission(ACCEPT)
+
+        try:
+            snapshot = await self._get_snapshot(queue_name)
+        except Exception as e:
+            # Без данных об очереди запрос принимается как раньше
+            self.logger.warning(f"Admission check for {queue_name} failed: {e}")
+            return Admission(ACCEPT)
+
+        eta = snapshot["eta"]
+        thresholds = settings.ADMISSION["premium" if priority >= 5 else "free"]
+
+        if eta >= thresholds["shed_after"]:
+            self.logger.warning(f"Shedding request to {queue_name}, eta {eta:.0f}s")
+            return Admission(SHED, eta)
+        if eta >= thresholds["delay_after"]:
+            return Admission(DELAY, eta)
+        return Admission(ACCEPT, eta)
+
+    async def _get_snapshot(self, queue_name: str) -> Dict[str, Any]:
+        snapshot = self._snapshots.get(queue_name)
+        if snapshot and time.time() - snapshot["at"] < settings.ADMISSION_CACHE_TTL:
+            return snapshot
+
+        # Одновременные запросы после рассылки обновляют замер один раз
+        lock = self._locks.setdefault(queue_name, asyncio.Lock())
+        async with lock:
+            snapshot = self._snapshots.get(queue_name)
+            if snapshot and time.time() - snapshot["at"] < settings.ADMISSION_CACHE_TTL:
+                return snapshot
+
+            key = SNAPSHOT_KEY.format(queue_name=queue_name)
+            shared = await redis_manager.get(key)
+            if shared and time.time() - shared["at"] < settings.ADMISSION_CACHE_TTL:
+                self._snapshots[queue_name] = shared
+                return shared
+
+            snapshot = await self._measure(queue_name, previous=shared)
+            self._snapshots[queue_name] = snapshot
+            await redis_manager.set(key, snapshot, ttl=SNAPSHOT_TTL)
+            return snapshot
+
+    async def _measure(
+        self, queue_name: str, previous: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Новый замер глубины очереди, скорости разбора и ожидаемого ожидания"""
+
+        depth, consumers = await model.queue_depth(queue_name)
+        completed = await redis_manager.get_int(COMPLETED_KEY.format(queue_name=queue_name))
+        now = time.time()
+
+        rate = previous.get("rate", 0) if previous else 0
+        # Скорость показательна, только если в очереди всё это время были задачи
+        if (
+            previous
+            and previous["depth"] > 0
+            and now > previous["at"]
+            and completed >= previous["completed"]
+        ):
+            measured = (completed - previous["completed"]) / (now - previous["at"])
+            rate = RATE_SMOOTHING * measured + (1 - RATE_SMOOTHING) * rate
+
+        queue_config = settings.QUEUES[queue_name]
+        capacity = queue_config["concurrency"] * max(consumers, 1)
+        estimated_rate = capacity / queue_config["avg_duration"]
+
+        # Пока очередь не разбиралась (нет замеров), считаем по ожидаемой длительности задач
+        eta = depth / rate if rate > 0 else depth / estimated_rate
+
+        return {
+            "depth": depth,
+            "consumers": consumers,
+            "completed": completed,
+            "rate": rate,
+            "eta": eta,
+            "at": now,
+        }
+
+
+admission_controller = AdmissionController()
@@ -1,10 +1,11 @@
 import types
-from typing import Dict, Any, Literal
+from typing import AsyncIterator, Dict, Any, Literal, Optional
 
 from aiogram import Bot
 from aiogram.types import FSInputFile, InputMediaPhoto, URLInputFile
 
 from src.bot.keyboards.select_gpt import upgrade_message, upgrade_photo
+from src.scripts.answer_messages.stream import StreamingMessage
 from src.config.config import settings
 from src.db.orm.user_orm import UserORM
 from src.utils.logger import setup_logger
@@ -84,6 +85,52 @@ class AnswerMessage:
             self.logger.error(f"Failed to answer message: {e}")
             return
 
+    async def answer_stream(
+        self,
+        data: Dict[str, Any],
+        chunks: AsyncIterator[str],
+        chunk_size: int = 4000,
+    ) -> str:
+        """Выводит ответ по мере генерации в сообщение-заглушку и возвращает полный текст"""
+
+        def on_message(message_id: Optional[int]) -> None:
+            # Статусы очереди (повтор, дедлайн) правят текущее сообщение, а не первый чанк
+            data["answer_message"] = message_id
+
+        stream = StreamingMessage(
+            self.bot,
+            chat_id=data["user_id"],
+            message_id=data.get("answer_message"),
+            chunk_size=chunk_size,
+            edit_interval=settings.STREAM_EDIT_INTERVAL,
+            on_message=on_message,
+        )
+        async for chunk in chunks:
+            await stream.push(chunk)
+        text = await stream.finish()
+
+        # Заглушка стала ответом, удалять её больше не нужно
+        data["answer_message"] = None
+
+        if data.get("energy_text"):
+            await self.bot.send_message(chat_id=data["user_id"], text=data["energy_text"])
+
+        return text
+
+    async def edit_message(self, data: Dict[str, Any], text: str) -> None:
+        """Изменение текста сообщения-заглушки"""
+
+        answer_message = data.get("answer_message")
+        if not answer_message:
+            return
+
+        try:
+            await self.bot.edit_message_text(
+                chat_id=data["user_id"], message_id=answer_message, text=text
+            )
+        except Exception as e:
+            self.logger.error(f"Failed to edit message: {e}")
+
     async def answer_photo(self, data: Dict[str, Any]) -> None:
         try:
             if not data.get("photo"):
@@ -0,0 +1,135 @@
+import asyncio
+import time
+from typing import Callable, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+
+from src.config.config import settings
+from src.utils.logger import setup_logger
+
+
+EMPTY_ANSWER_TEXT = "⚠ Произошла ошибка при генерации"
+CURSOR = " ▌"
+
+
+def stream_enabled(version: str) -> bool:
+    """Можно ли выводить ответ модели по мере генерации"""
+
+    return settings.STREAM_ANSWERS and settings.TEXT_GPT.get(version, {}).get("stream", True)
+
+
+class StreamingMessage:
+    """
+    Постепенный вывод ответа модели в Telegram.
+
+    Текст дописывается в сообщение-заглушку не чаще раза в edit_interval секунд
+    (ограничение Telegram на редактирование), а при превышении chunk_size
+    сообщение закрывается и ответ продолжается в новом. Промежуточные правки
+    идут без разметки, итоговая - с Markdown, как в AnswerMessage._send_message.
+    on_message получает id текущего сообщения ответа (None - пока его нет).
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        chat_id: int,
+        message_id: Optional[int] = None,
+        chunk_size: int = 4000,
+        edit_interval: float = 1.5,
+        on_message: Optional[Callable[[Optional[int]], None]] = None,
+    ):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.chunk_size = chunk_size
+        self.edit_interval = edit_interval
+        self.on_message = on_message
+        self.logger = setup_logger(__name__)
+
+        self.text = ""
+        self._offset = 0  # начало текущего сообщения в self.text
+        self._shown = ""
+        self._next_edit = 0
+
+    async def push(self, delta: Optional[str]) -> None:
+        """Добавляет очередной фрагмент ответа"""
+
+        if not delta:
+            return
+
+        self.text += delta
+        while len(self.text) - self._offset > self.chunk_size:
+            await self._rollover()
+
+        if time.monotonic() >= self._next_edit:
+            await self._render(self.text[self._offset :] + CURSOR)
+
+    async def finish(self) -> str:
+        """Выводит ответ целиком и возвращает его текст"""
+
+        await self._render(self.text[self._offset :] or EMPTY_ANSWER_TEXT, final=True)
+        return self.text
+
+    async def _rollover(self) -> None:
+        """Закрывает текущее сообщение на границе чанка, по возможности по переносу строки"""
+
+        chunk = self.text[self._offset : self._offset + self.chunk_size]
+        cut = chunk.rfind("\n")
+        if cut < self.chunk_size // 2:
+            cut = len(chunk)
+
+        await self._render(chunk[:cut], final=True)
+        self._offset += cut
+        self.message_id = None
+        self._shown = ""
+        # Продолжение ответа появляется сразу, без ожидания интервала правок
+        self._next_edit = 0
+        if self.on_message:
+            self.on_message(None)
+
+    async def _render(self, text: str, final: bool = False) -> None:
+        if not text.strip() or (text == self._shown and not final):
+            return
+
+        parse_modes = ["Markdown", None] if final else [None]
+        for parse_mode in parse_modes:
+            try:
+                await self._write(text, parse_mode)
+                break
+            except TelegramRetryAfter as e:
+                if not final:
+                    self._next_edit = time.monotonic() + e.retry_after
+                    return
+                await asyncio.sleep(e.retry_after)
+                await self._write(text, parse_mode)
+                break
+            except TelegramBadRequest as e:
+                if "message is not modified" in str(e):
+                    break
+                if "message to edit not found" in str(e):
+                    # Заглушку удалили - продолжаем ответ новым сообщением
+                    self.message_id = None
+                    await self._write(text, None)
+                    break
+                if parse_mode is None:
+                    self.logger.error(f"Failed to render streamed answer: {e}")
+
+        self._shown = text
+        self._next_edit = time.monotonic() + self.edit_interval
+
+    async def _write(self, text: str, parse_mode: Optional[str]) -> None:
+        if self.message_id is None:
+            message = await self.bot.send_message(
+                chat_id=self.chat_id, text=text, parse_mode=parse_mode
+            )
+            self.message_id = message.message_id
+            if self.on_message:
+                self.on_message(self.message_id)
+        else:
+            await self.bot.edit_message_text(
+                chat_id=self.chat_id,
+                message_id=self.message_id,
+                text=text,
+                parse_mode=parse_mode,
+            )
@@ -1,33 +1,62 @@
-import io
-from typing import Dict, Any
+from typing import AsyncIterator, Dict, Any, List, Optional
 
-import aiohttp
-from openai import AsyncOpenAI
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, NotFoundError
 import asyncio
 
 from src.config.config import settings
+from src.db.models import Message
 from src.scripts.answer_messages.answer_message import AnswerMessage
 from src.scripts.dialog.service import DialogService
-from src.scripts.energy_remover.service import EnergyService
+from src.scripts.providers.base import LLMProvider
+from src.scripts.queue.deadline import request_timeout
+from src.scripts.queue.retry import RetryableError
+from src.scripts.rate_limiter.service import estimate_tokens, rate_limiter
+from src.scripts.summarizer.service import summary_context
+from src.scripts.transcription.service import Transcriber
 from src.db.enums_class import MessageRole
 
 from src.utils.logger import setup_logger
 
 
-class ChatGPT:
+RUN_ACTIVE_STATUSES = {"queued", "in_progress", "cancelling"}
+RUN_FAILED_EVENTS = {
+    "thread.run.failed",
+    "thread.run.expired",
+    "thread.run.cancelled",
+    "thread.run.incomplete",
+    "thread.run.requires_action",
+}
+RETRYABLE_RUN_ERRORS = {"rate_limit_exceeded", "server_error"}
+RUN_POLL_MIN_DELAY = 0.5
+RUN_POLL_MAX_DELAY = 5
+
+
+class AssistantRunError(Exception):
+    """Run ассистента завершился без ответа"""
+
+
+class ChatGPT(LLMProvider):
+    name = "openai"
+    supports_transcription = True
+    supports_assistants = True
+
     def __init__(self):
         self.API_KEY = settings.GPT_KEY
+        # Ответ ассистента выводится внутри run: его нужно отменить при ошибке вывода
         self.message_client = AnswerMessage()
-        self.energy_service = EnergyService()
         self.dialog_service = DialogService()
 
-        self.client = AsyncOpenAI(api_key=self.API_KEY, max_retries=5)
+        # Повторы после 429 делает очередь: повторы SDK только добавляли бы нагрузку
+        self.client = AsyncOpenAI(
+            api_key=self.API_KEY,
+            max_retries=0,
+            http_client=DefaultAsyncHttpxClient(
+                event_hooks=rate_limiter.event_hooks("openai")
+            ),
+        )
+        self.transcriber = Transcriber(self.client)
         self.logger = setup_logger(__name__)
 
-        self.timeout = [
-            30,
-        ]
-
     async def _create_thread_with_messages(self, messages: list):
         """Создание thread с сообщениями"""
 
@@ -40,206 +69,202 @@ class ChatGPT:
             self.logger.error(e)
             raise
 
-    async def _file_generate(self, path_to_file: str) -> str:
-        """Создание файла для OpenAI из удалённой ссылки"""
-        
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(path_to_file) as response:
-                    if response.status != 200:
-                        self.logger.error(f"Ошибка загрузки: {response.status}")
-                        return ""
-
-                    raw_data = await response.read()
-
-                    try:
-                        return raw_data.decode("utf-8")
-                    except UnicodeDecodeError:
-                        for encoding in [
-                            "windows-1251",
-                            "cp1251",
-                            "iso-8859-1",
-                            "koi8-r",
-                        ]:
-                            try:
-                                return raw_data.decode(encoding)
-                            except UnicodeDecodeError:
-                                continue
-
-                        self.logger.warning(
-                            "Не удалось определить кодировку, используется замена ошибок"
-                        )
-                        return raw_data.decode("utf-8", errors="replace")
-
-        except Exception as e:
-            self.logger.error(e)
-            return ""
-
-    async def transcribe_audio(self, path_to_file: str) -> str:
-        """Отправка голосового файла в Whisper и получение текста"""
-
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(path_to_file) as response:
-                    if response.status != 200:
-                        self.logger.error(
-                            f"Ошибка загрузки файла для транскрипции: {response.status}"
-                        )
-                        return "Оповести пользователя о том, что произошла ошибка при транскрибации, предложи ему отправить снова его голосовое сообщение"
-
-                    audio_bytes = await response.read()
-
-                    audio_file = io.BytesIO(audio_bytes)
-                    audio_file.name = "voice.ogg"
-
-                    transcription = await self.client.audio.transcriptions.create(
-                        model="whisper-1",
-                        file=audio_file,
+    async def _get_thread(self, dialog_id: int) -> str:
+        """
+        Thread ассистента для диалога. Новые сообщения пользователя дописываются
+        в сохранённый thread, а если его нет или он истёк - thread собирается заново
+        из истории диалога.
+        """
+
+        dialog = await self.dialog_service.get_dialog(dialog_id)
+        messages = await self.dialog_service.get_context(dialog_id)
+        last_message_id = messages[-1].message_id if messages else None
+
+        if dialog and dialog.thread_id:
+            # Ответы ассистента уже лежат в thread, дописываем только запросы пользователя
+            new_messages = [
+                message
+                for message in messages
+                if message.message_id > (dialog.thread_message_id or 0)
+                and message.role == MessageRole.USER
+            ]
+            try:
+                for message in new_messages:
+                    await self.client.beta.threads.messages.create(
+                        thread_id=dialog.thread_id,
+                        role=message.role.value,
+                        content=message.message,
                     )
-                    return transcription.text
-        except Exception as e:
-            self.logger.error(f"Ошибка транскрипции: {e}")
-            return "Оповести пользователя о том, что произошла ошибка при транскрибации, предложи ему отправить снова его голосовое сообщение"
-
-    async def send_message_assistant(self, data):
-        try:
-            status = await self.energy_service.upload_energy(data, "remove")
-            if isinstance(status, dict):
-                data["energy_text"] = None
-                await self.message_client.answer_message(data)
-                return
-
-            self.logger.debug(data)
-            data["energy_text"] = status
-
-            message = data.get("message")
-            file = data.get("file")
-
-            if message and len(message) >= 1:
-                await self.dialog_service.add_message(
-                    role=MessageRole.USER,
-                    dialog_id=data["dialog_id"],
-                    message=data.get("message"),
+                await self.dialog_service.set_thread(
+                    dialog_id, dialog.thread_id, last_message_id
                 )
-
-            if file:
-                if file["type"] == "voice":
-                    content = await self.transcribe_audio(path_to_file=file["url"])
-                if file["type"] == "document":
-                    content = await self._file_generate(path_to_file=file["url"])
-
-                await self.dialog_service.add_message(
-                    role=MessageRole.USER,
-                    dialog_id=data["dialog_id"],
-                    message=content,
+                return dialog.thread_id
+            except NotFoundError:
+                self.logger.warning(
+                    f"Thread {dialog.thread_id} of dialog {dialog_id} not found, rebuilding"
                 )
 
-            messages = await self.dialog_service.get_messages(data["dialog_id"])
-            import_messages = []
-            for message in messages:
-                message_data = {
-                    "role": message.role.value,
-                    "content": message.message,
-                }
-
-                import_messages.append(message_data)
-
-            thread = await self._create_thread_with_messages(import_messages)
-            run = await self.client.beta.threads.runs.create(
-                thread_id=thread.id,
-                assistant_id=data["version"],
-                max_prompt_tokens=25000,
-                max_completion_tokens=8000,
+        thread = await self._create_thread_with_messages(
+            [
+                {"role": message.role.value, "content": message.message}
+                for message in messages
+            ]
+        )
+        await self.dialog_service.set_thread(dialog_id, thread.id, last_message_id)
+        return thread.id
+
+    async def _run_assistant(
+        self, data: Dict[str, Any], thread_id: str, streamed: bool
+    ) -> str:
+        """Выполняет run ассистента с жёстким ограничением по времени"""
+
+        run = {}
+        try:
+            async with asyncio.timeout(
+                request_timeout(data, settings.ASSISTANT_RUN_TIMEOUT)
+            ):
+                async with rate_limiter.slot("openai", priority=data.get("priority", 0)):
+                    if streamed:
+                        return await self.message_client.answer_stream(
+                            data, self._stream_run(thread_id, data["version"], run)
+                        )
+                    return await self._poll_run(thread_id, data["version"], run)
+        except BaseException:
+            # Незавершённый run держит thread: новые сообщения в него не добавить
+            if run.get("id") and not run.get("finished"):
+                await self._cancel_run(thread_id, run["id"])
+            raise
+
+    async def _stream_run(
+        self, thread_id: str, assistant_id: str, run: Dict[str, Any]
+    ) -> AsyncIterator[str]:
+        """Ответ ассистента по событиям run"""
+
+        async with self.client.beta.threads.runs.stream(
+            thread_id=thread_id,
+            assistant_id=assistant_id,
+            max_prompt_tokens=25000,
+            max_completion_tokens=8000,
+        ) as stream:
+            async for event in stream:
+                if event.event == "thread.run.created":
+                    run["id"] = event.data.id
+                elif event.event == "thread.message.delta":
+                    for block in event.data.delta.content or []:
+                        if block.type == "text" and block.text and block.text.value:
+                            yield block.text.value
+                elif event.event == "thread.run.completed":
+                    run["finished"] = True
+                elif event.event in RUN_FAILED_EVENTS:
+                    run["finished"] = event.event != "thread.run.requires_action"
+                    raise self._run_error(event.data)
+
+    async def _poll_run(
+        self, thread_id: str, assistant_id: str, run: Dict[str, Any]
+    ) -> str:
+        """Запуск без стрима: опрос статуса с растущим интервалом"""
+
+        result = await self.client.beta.threads.runs.create(
+            thread_id=thread_id,
+            assistant_id=assistant_id,
+            max_prompt_tokens=25000,
+            max_completion_tokens=8000,
+        )
+        run["id"] = result.id
+
+        delay = RUN_POLL_MIN_DELAY
+        while result.status in RUN_ACTIVE_STATUSES:
+            await asyncio.sleep(delay)
+            delay = min(delay * 1.5, RUN_POLL_MAX_DELAY)
+            result = await self.client.beta.threads.runs.retrieve(
+                thread_id=thread_id, run_id=result.id
             )
 
-            while run.status != "completed":
-                run = await self.client.beta.threads.runs.retrieve(
-                    thread_id=thread.id, run_id=run.id
-                )
-                await asyncio.sleep(2.5)
-            else:
-                message_response = await self.client.beta.threads.messages.list(
-                    thread_id=thread.id
-                )
-                text_only = message_response.data[0].content[0].text.value
-                await self.dialog_service.add_message(
-                    role=MessageRole.ASSISTANT,
-                    dialog_id=data["dialog_id"],
-                    message=text_only,
-                )
-                
-            data["text"] = text_only
-            await self.message_client.answer_message(data)
+        if result.status != "completed":
+            run["finished"] = result.status != "requires_action"
+            raise self._run_error(result)
 
-        except Exception as e:
-            self.logger.debug(e)
-            data["text"] = f"Произошла ошибка, обратитесь в поддержку с данной ошибкой"
-            await self.message_client.answer_message(data)
-            raise
+        run["finished"] = True
+        message_response = await self.client.beta.threads.messages.list(
+            thread_id=thread_id, run_id=result.id
+        )
+        return message_response.data[0].content[0].text.value
 
-    async def send_message(self, data: Dict[str, Any]):
-        """Отправка сообщения и возврат текстового ответа."""
-        try:
-            status = await self.energy_service.upload_energy(data, "remove")
-            if isinstance(status, dict):
-                data["energy_text"] = None
-                await self.message_client.answer_message(data)
-                return
-
-            data["energy_text"] = status
-
-            message = data.get("message")
-            if message and len(message) >= 1:
-                await self.dialog_service.add_message(
-                    role=MessageRole.USER,
-                    dialog_id=data["dialog_id"],
-                    message=data.get("message"),
-                )
+    @staticmethod
+    def _run_error(run) -> Exception:
+        """Ошибка для run, завершившегося не ответом"""
 
-            file = data.get("file")
-            if file:
-                if file["type"] == "voice":
-                    content = await self.transcribe_audio(path_to_file=file["url"])
-                if file["type"] == "document":
-                    content = await self._file_generate(path_to_file=file["url"])
-
-                await self.dialog_service.add_message(
-                    role=MessageRole.USER,
-                    dialog_id=data["dialog_id"],
-                    message=content,
-                )
+        last_error = getattr(run, "last_error", None)
+        text = f"Assistant run {run.id} ended with status {run.status}"
+        if last_error:
+            text += f": {last_error.code} {last_error.message}"
+            if last_error.code in RETRYABLE_RUN_ERRORS:
+                return RetryableError(text)
 
-            messages = await self.dialog_service.get_messages(data["dialog_id"])
+        return AssistantRunError(text)
 
-            import_messages = []
-            for message in messages:
-                message_data = {
-                    "role": message.role.value,
-                    "content": message.message,
-                }
-
-                import_messages.append(message_data)
+    async def _cancel_run(self, thread_id: str, run_id: str) -> None:
+        try:
+            await self.client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run_id)
+        except Exception as e:
+            self.logger.warning(f"Failed to cancel assistant run {run_id}: {e}")
 
+    @staticmethod
+    def _build_messages(summary: Optional[str], messages: List[Message]) -> list:
+        import_messages = [
+            {"role": message.role.value, "content": message.message}
+            for message in messages
+        ]
+        if summary:
+            import_messages.insert(
+                0, {"role": "system", "content": summary_context(summary)}
+            )
+        return import_messages
+
+    async def complete(
+        self,
+        version: str,
+        summary: Optional[str],
+        messages: List[Message],
+        data: Dict[str, Any],
+    ) -> str:
+        import_messages = self._build_messages(summary, messages)
+        tokens = estimate_tokens((message["content"] for message in import_messages), 4096)
+
+        async with rate_limiter.slot("openai", version, tokens, data.get("priority", 0)):
             response = await self.client.chat.completions.create(
-                model=data["version"],
+                model=version,
                 messages=import_messages,
                 max_completion_tokens=4096,
+                timeout=request_timeout(data, settings.PROVIDER_TIMEOUT),
             )
-
-            text_only = response.choices[0].message.content
-            await self.dialog_service.add_message(
-                role=MessageRole.ASSISTANT,
-                dialog_id=data["dialog_id"],
-                message=text_only,
+        return response.choices[0].message.content
+
+    async def stream(
+        self,
+        version: str,
+        summary: Optional[str],
+        messages: List[Message],
+        data: Dict[str, Any],
+    ) -> AsyncIterator[str]:
+        import_messages = self._build_messages(summary, messages)
+        tokens = estimate_tokens((message["content"] for message in import_messages), 4096)
+
+        async with rate_limiter.slot("openai", version, tokens, data.get("priority", 0)):
+            stream = await self.client.chat.completions.create(
+                model=version,
+                messages=import_messages,
+                max_completion_tokens=4096,
+                stream=True,
+                timeout=request_timeout(data, settings.PROVIDER_TIMEOUT),
             )
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
 
-            data["text"] = text_only
-            await self.message_client.answer_message(data)
+    async def transcribe(self, file: Dict[str, Any], data: Dict[str, Any]) -> str:
+        return await self.transcriber.transcribe(file, data)
 
-        except Exception as e:
-            self.logger.error(f"Ошибка при отправке сообщения: {str(e)}")
-            data["text"] = (
-                f"Произошла ошибка, обратитесь в поддержку с данной ошибкой: \n\n{str(e)}"
-            )
-            await self.message_client.answer_message(data)
-            raise
+    async def run_assistant(self, data: Dict[str, Any], streamed: bool) -> str:
+        thread_id = await self._get_thread(data["dialog_id"])
+        return await self._run_assistant(data, thread_id, streamed)
@@ -0,0 +1,84 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import anthropic
+import openai
+
+from src.config.config import settings
+from src.scripts.answer_messages.answer_message import AnswerMessage
+from src.scripts.circuit_breaker.service import CircuitOpenError, circuit_breakers
+from src.scripts.providers.base import provider_name
+from src.utils.logger import setup_logger
+
+
+FALLBACK_TEXT = "ℹ️ {model} сейчас отвечает с перебоями, на этот запрос ответила {fallback}."
+
+
+class TextRouter:
+    """
+    Отправляет текстовую задачу модели с замкнутым выключателем.
+
+    Пока выключатель модели разомкнут, задачу выполняет её fallback из
+    settings.TEXT_GPT по своей цене, а пользователь узнаёт, какая модель
+    ответила. Если недоступны обе, задача сразу уходит на повтор, не занимая
+    воркер ожиданием.
+    """
+
+    def __init__(
+        self,
+        send_message: Callable[[Dict[str, Any]], Awaitable[None]],
+        message_client: Optional[AnswerMessage] = None,
+    ):
+        self._send_message = send_message
+        self.message_client = message_client or AnswerMessage()
+        self.logger = setup_logger(__name__)
+
+    async def send_message(self, data: Dict[str, Any]) -> None:
+        version = data["version"]
+        target = self._choose(version)
+        if target is None:
+            raise CircuitOpenError(f"{version} and its fallback are unavailable")
+
+        if target != version:
+            self.logger.warning(f"Circuit for {version} is open, answering with {target}")
+            data["version"] = target
+            # Бесплатный запрос (premium_free) остаётся бесплатным: модель сменили не по
+            # выбору пользователя. Энергия, списанная прошлой попыткой, возвращается по прежней цене
+            if data.get("energy_cost") and not data.get("energy_charged"):
+                data["energy_cost"] = settings.TEXT_GPT[target]["energy_cost"]
+
+        provider = provider_name(target)
+        started_at = time.monotonic()
+        try:
+            await self._send_message(data)
+        except (openai.APIConnectionError, anthropic.APIConnectionError, asyncio.TimeoutError):
+            # Ответа не было, хуки клиента этот вызов не учли
+            await circuit_breakers.record(
+                provider, target, failed=True, duration=time.monotonic() - started_at
+            )
+            raise
+
+        if target != version:
+            await self._notify(data, version, target)
+
+    @staticmethod
+    def _choose(version: str) -> Optional[str]:
+        if circuit_breakers.get(provider_name(version), version).allow():
+            return version
+
+        fallback = settings.TEXT_GPT.get(version, {}).get("fallback")
+        if fallback and circuit_breakers.get(provider_name(fallback), fallback).allow():
+            return fallback
+        return None
+
+    async def _notify(self, data: Dict[str, Any], version: str, fallback: str) -> None:
+        models = settings.TEXT_GPT
+        text = FALLBACK_TEXT.format(
+            model=models.get(version, {}).get("select_model", version),
+            fallback=models.get(fallback, {}).get("select_model", fallback),
+        )
+        try:
+            await self.message_client.bot.send_message(chat_id=data["user_id"], text=text)
+        except Exception as e:
+            self.logger.error(f"Failed to send fallback notice: {e}")
@@ -0,0 +1,179 @@
+import json
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from src.config.config import settings
+from src.scripts.queue.retry import RetryableError
+from src.utils.logger import setup_logger
+from src.utils.redis_cache.redis_cache import redis_manager
+
+
+logger = setup_logger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Состояние выключателей всех процессов воркера для админки
+METRICS_KEY = "metrics:circuit_breakers"
+METRICS_INTERVAL = 5
+
+
+class CircuitOpenError(RetryableError):
+    """Модель и её запасная недоступны, запрос не отправлялся - задача уходит на повтор"""
+
+
+class CircuitBreaker:
+    """
+    Выключатель для одной модели провайдера.
+
+    Считает ошибки (5xx, обрывы соединения) и медленные ответы за последние
+    window секунд. Если их доля выше failure_rate при хотя бы min_calls
+    вызовах, выключатель размыкается на open_for секунд: запросы к модели не
+    отправляются. Затем пропускается один пробный запрос - его успех замыкает
+    выключатель, ошибка снова размыкает.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: float = 60,
+        min_calls: int = 10,
+        failure_rate: float = 0.5,
+        slow_call: float = 30,
+        open_for: float = 30,
+    ):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call = slow_call
+        self.open_for = open_for
+
+        self.state = CLOSED
+        # (время, ошибка, длительность)
+        self._calls: Deque[Tuple[float, bool, float]] = deque()
+        self._opened_at = 0.0
+        self._probe_at = 0.0
+
+    def allow(self) -> bool:
+        """Можно ли отправить запрос сейчас"""
+
+        now = time.monotonic()
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and now - self._opened_at >= self.open_for:
+            self.state = HALF_OPEN
+            self._probe_at = 0
+        if self.state == HALF_OPEN and now - self._probe_at >= self.open_for:
+            # Один пробный запрос; если ответ на него потерялся, через open_for - следующий
+            self._probe_at = now
+            return True
+        return False
+
+    def record(self, failed: bool, duration: float = 0) -> None:
+        now = time.monotonic()
+        failed = failed or duration > self.slow_call
+
+        if self.state == HALF_OPEN:
+            if failed:
+                self._open(now)
+            else:
+                self.state = CLOSED
+                self._calls.clear()
+                logger.info(f"Circuit {self.name} closed")
+            return
+
+        self._calls.append((now, failed, duration))
+        while self._calls and now - self._calls[0][0] > self.window:
+            self._calls.popleft()
+
+        if self.state == CLOSED and len(self._calls) >= self.min_calls:
+            if self.current_failure_rate >= self.failure_rate:
+                self._open(now)
+
+    def _open(self, now: float) -> None:
+        self.state = OPEN
+        self._opened_at = now
+        logger.warning(
+            f"Circuit {self.name} opened, failure rate {self.current_failure_rate:.0%}"
+        )
+
+    @property
+    def current_failure_rate(self) -> float:
+        if not self._calls:
+            return 0
+        return sum(1 for _, failed, _ in self._calls if failed) / len(self._calls)
+
+    def snapshot(self) -> Dict[str, Any]:
+        durations = sorted(duration for *_, duration in self._calls)
+        p95 = durations[int(len(durations) * 0.95)] if durations else 0
+        return {
+            "state": self.state,
+            "calls": len(self._calls),
+            "failure_rate": round(self.current_failure_rate, 3),
+            "p95_latency": round(p95, 3),
+            "updated_at": time.time(),
+        }
+
+
+class CircuitBreakers:
+    """Выключатели по провайдеру и модели с настройками из settings.CIRCUIT_BREAKER"""
+
+    def __init__(self):
+        self._breakers: Dict[Tuple[str, Optional[str]], CircuitBreaker] = {}
+        self._published_at = 0.0
+
+    def get(self, provider: str, model: Optional[str] = None) -> CircuitBreaker:
+        key = (provider, model)
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            config = dict(settings.CIRCUIT_BREAKER)
+            slow_call = settings.TEXT_GPT.get(model, {}).get("slow_call")
+            if slow_call:
+                config["slow_call"] = slow_call
+            breaker = CircuitBreaker(name=f"{provider}:{model or 'default'}", **config)
+            self._breakers[key] = breaker
+        return breaker
+
+    async def record(
+        self,
+        provider: str,
+        model: Optional[str],
+        failed: bool,
+        duration: float = 0,
+    ) -> None:
+        breaker = self.get(provider, model)
+        state = breaker.state
+        breaker.record(failed, duration)
+        await self.publish(force=breaker.state != state)
+
+    async def publish(self, force: bool = False) -> None:
+        """Сохраняет состояние выключателей в Redis не чаще раза в METRICS_INTERVAL секунд"""
+
+        now = time.monotonic()
+        if not force and now - self._published_at < METRICS_INTERVAL:
+            return
+        self._published_at = now
+
+        await redis_manager.set_hset(
+            METRICS_KEY,
+            **{
+                breaker.name: json.dumps(breaker.snapshot())
+                for breaker in self._breakers.values()
+            },
+        )
+
+
+async def get_metrics() -> Dict[str, Any]:
+    """Последнее известное состояние выключателей"""
+
+    data = await redis_manager.get_hgetall(METRICS_KEY) or {}
+    return {
+        (name.decode() if isinstance(name, bytes) else name): json.loads(value)
+        for name, value in data.items()
+    }
+
+
+circuit_breakers = CircuitBreakers()
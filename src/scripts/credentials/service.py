@@ -0,0 +1,201 @@
+import hashlib
+import math
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Mapping, Optional, Tuple
+
+import httpx
+
+from src.config.config import settings
+from src.utils.logger import setup_logger
+
+
+logger = setup_logger(__name__)
+
+# Ключ недействителен, заблокирован или закончилась оплата
+CREDENTIAL_ERROR_STATUSES = {401, 402, 403}
+QUOTA_ERROR_MARKERS = ("insufficient_quota", "credit balance")
+
+# Заголовки остатка лимитов: (остаток запросов, остаток токенов)
+REMAINING_HEADERS = {
+    "openai": ("x-ratelimit-remaining-requests", "x-ratelimit-remaining-tokens"),
+    "anthropic": (
+        "anthropic-ratelimit-requests-remaining",
+        "anthropic-ratelimit-tokens-remaining",
+    ),
+}
+# Заголовок, в котором SDK передаёт ключ
+AUTH_HEADERS = {
+    "openai": "authorization",
+    "anthropic": "x-api-key",
+    "goapi": "x-api-key",
+}
+# Assistants, threads и файлы живут в проекте ключа, их запросы всегда идут с основным
+PINNED_PATHS = {
+    "openai": ("/v1/assistants", "/v1/threads", "/v1/files", "/v1/vector_stores"),
+}
+
+
+def _number(headers: Mapping[str, str], name: str) -> Optional[float]:
+    try:
+        return float(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+@dataclass
+class Credential:
+    """API-ключ провайдера и то, что о нём известно по последним ответам"""
+
+    provider: str
+    key: str
+    requests_remaining: Optional[float] = None
+    tokens_remaining: Optional[float] = None
+    quarantined_until: float = 0
+    last_used: float = 0
+
+    @property
+    def name(self) -> str:
+        """Имя ключа для логов и Redis (сам ключ никуда не пишется)"""
+
+        return f"{self.provider}:{hashlib.sha256(self.key.encode()).hexdigest()[:10]}"
+
+    def healthy(self, now: float) -> bool:
+        return self.quarantined_until <= now
+
+
+class CredentialPool:
+    """
+    Ключи одного провайдера.
+
+    Запрос получает ключ с наибольшим остатком лимита по заголовкам последнего
+    ответа; о ключах без ответов ещё ничего не известно, поэтому они выбираются
+    первыми. Ключ с ошибкой авторизации или закончившейся квотой уходит в карантин
+    на CREDENTIAL_QUARANTINE секунд, после 429 - на время retry-after.
+    """
+
+    def __init__(self, provider: str, keys: List[str]):
+        self.provider = provider
+        self.credentials = [Credential(provider, key) for key in keys]
+        self._by_key = {credential.key: credential for credential in self.credentials}
+        self._by_name = {credential.name: credential for credential in self.credentials}
+
+    def __len__(self) -> int:
+        return len(self.credentials)
+
+    @property
+    def primary(self) -> Optional[Credential]:
+        return self.credentials[0] if self.credentials else None
+
+    @property
+    def available(self) -> bool:
+        """Есть ли ключ не в карантине"""
+
+        now = time.monotonic()
+        return any(credential.healthy(now) for credential in self.credentials)
+
+    def healthy_count(self) -> int:
+        now = time.monotonic()
+        return sum(1 for credential in self.credentials if credential.healthy(now)) or 1
+
+    def choose(self) -> Credential:
+        if not self.credentials:
+            raise LookupError(f"No API keys configured for {self.provider}")
+
+        now = time.monotonic()
+        healthy = [credential for credential in self.credentials if credential.healthy(now)]
+        if not healthy:
+            # Все в карантине - пробуем тот, что выйдет из него раньше остальных
+            return min(self.credentials, key=lambda credential: credential.quarantined_until)
+
+        credential = max(healthy, key=self._score)
+        credential.last_used = now
+        return credential
+
+    @staticmethod
+    def _score(credential: Credential) -> Tuple[float, float, float]:
+        unknown = math.inf
+        return (
+            unknown if credential.tokens_remaining is None else credential.tokens_remaining,
+            unknown if credential.requests_remaining is None else credential.requests_remaining,
+            -credential.last_used,
+        )
+
+    def get(self, name: Optional[str]) -> Optional[Credential]:
+        return self._by_name.get(name) if name else None
+
+    def by_key(self, key: Optional[str]) -> Optional[Credential]:
+        return self._by_key.get(key) if key else None
+
+    def report(
+        self,
+        credential: Credential,
+        status: int,
+        headers: Mapping[str, str],
+        body: str = "",
+    ) -> None:
+        """Учитывает ответ, полученный с этим ключом"""
+
+        names = REMAINING_HEADERS.get(self.provider)
+        if names:
+            requests = _number(headers, names[0])
+            tokens = _number(headers, names[1])
+            if requests is not None:
+                credential.requests_remaining = requests
+            if tokens is not None:
+                credential.tokens_remaining = tokens
+
+        now = time.monotonic()
+        body = body.lower()
+        if status in CREDENTIAL_ERROR_STATUSES or any(
+            marker in body for marker in QUOTA_ERROR_MARKERS
+        ):
+            credential.quarantined_until = now + settings.CREDENTIAL_QUARANTINE
+            logger.error(f"API key {credential.name} quarantined after {status} response")
+        elif status == 429:
+            retry_after = _number(headers, "retry-after") or 1
+            credential.quarantined_until = max(credential.quarantined_until, now + retry_after)
+
+    def httpx_hooks(self) -> Dict[str, list]:
+        """Хуки httpx для клиентов SDK: подставляют ключ из пула и учитывают ответ"""
+
+        header = AUTH_HEADERS[self.provider]
+        pinned = PINNED_PATHS.get(self.provider, ())
+
+        async def on_request(request: httpx.Request) -> None:
+            if len(self) < 2 or request.url.path.startswith(pinned):
+                return
+            key = self.choose().key
+            request.headers[header] = f"Bearer {key}" if header == "authorization" else key
+
+        async def on_response(response: httpx.Response) -> None:
+            key = response.request.headers.get(header, "").removeprefix("Bearer ")
+            credential = self.by_key(key)
+            if credential is None:
+                return
+
+            body = ""
+            if response.status_code >= 400:
+                # Тело ошибки небольшое, SDK прочитает его из кэша ответа
+                await response.aread()
+                body = response.text
+            self.report(credential, response.status_code, response.headers, body)
+
+        return {"request": [on_request], "response": [on_response]}
+
+
+class CredentialPools:
+    """Пулы ключей по провайдерам из settings.API_KEYS"""
+
+    def __init__(self):
+        self._pools: Dict[str, CredentialPool] = {}
+
+    def get(self, provider: str) -> CredentialPool:
+        pool = self._pools.get(provider)
+        if pool is None:
+            pool = CredentialPool(provider, settings.API_KEYS.get(provider, []))
+            self._pools[provider] = pool
+        return pool
+
+
+credential_pools = CredentialPools()
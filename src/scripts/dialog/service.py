@@ -1,20 +1,71 @@
+from src.config.config import settings
 from src.db.enums_class import MessageRole
-from src.db.models import Message
+from src.db.models import Dialog, Message
 from src.db.orm.dialog_orm import DialogORM
+from src.utils.token_counter import count_tokens
+
+
+# Бюджет истории для моделей без context_tokens в settings.TEXT_GPT (например, ассистентов)
+DEFAULT_CONTEXT_TOKENS = 16000
+
+
+def context_tokens(version: str = None) -> int:
+    """Бюджет истории диалога для модели"""
+
+    return settings.TEXT_GPT.get(version, {}).get(
+        "context_tokens", DEFAULT_CONTEXT_TOKENS
+    )
 
 
 class DialogService:
     async def add_message(self, role: MessageRole, dialog_id: int, message: str):
         """Добавление сообщения в диалог"""
 
+        message = message[:25000]
         await DialogORM.add_message_to_dialog(
             dialog_id,
             role,
-            message[:25000],
+            message,
+            token_count=count_tokens(message),
+        )
+
+    async def get_context(
+        self, dialog_id, version: str = None, after_message_id: int = None
+    ) -> list[Message]:
+        """Последние сообщения диалога в пределах бюджета токенов модели"""
+
+        messages = await DialogORM.get_dialog_context(
+            int(dialog_id), context_tokens(version), after_message_id
         )
 
-    async def get_messages(self, dialog_id) -> list[Message]:
-        """Получение сообщений из диалога"""
+        # История должна начинаться с сообщения пользователя (обязательно для Claude)
+        while len(messages) > 1 and messages[0].role != MessageRole.USER:
+            messages.pop(0)
 
-        messages = await DialogORM.get_dialog_messages(dialog_id)
         return messages
+
+    async def get_prompt_context(
+        self, dialog_id, version: str = None
+    ) -> tuple[str | None, list[Message]]:
+        """Краткое содержание старой части диалога и сообщения после него"""
+
+        dialog = await DialogORM.get_dialog(int(dialog_id))
+        if not dialog or not dialog.summary:
+            return None, await self.get_context(dialog_id, version)
+
+        messages = await self.get_context(
+            dialog_id, version, after_message_id=dialog.summary_message_id
+        )
+        return dialog.summary, messages
+
+    async def get_dialog(self, dialog_id) -> Dialog | None:
+        """Получение диалога"""
+
+        return await DialogORM.get_dialog(int(dialog_id))
+
+    async def set_thread(
+        self, dialog_id, thread_id: str, thread_message_id: int | None
+    ) -> None:
+        """Привязка thread ассистента к диалогу"""
+
+        await DialogORM.set_thread(int(dialog_id), thread_id, thread_message_id)
@@ -0,0 +1,347 @@
+import asyncio
+import codecs
+import csv
+import io
+import re
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+from src.config.config import settings
+from src.scripts.queue.deadline import client_timeout, request_timeout
+from src.scripts.rate_limiter.service import estimate_tokens, rate_limiter
+from src.utils.http_client import http_client
+from src.utils.logger import setup_logger
+from src.utils.token_counter import BYTES_PER_TOKEN
+
+
+READ_CHUNK_SIZE = 64 * 1024
+# По этому началу файла определяется кодировка и разделитель CSV
+SAMPLE_SIZE = 64 * 1024
+# Однобайтовые кодировки декодируют любые байты, выбирается та, где текст похож на русский
+SINGLE_BYTE_ENCODINGS = ("cp1251", "koi8-r")
+FREQUENT_LETTERS = set("оеаинтсрвлкмдпу")
+CSV_DELIMITERS = ",;\t|"
+HTML_SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "head"}
+HTML_BLOCK_TAGS = {
+    "p", "div", "br", "li", "tr", "table", "section", "article", "header",
+    "footer", "h1", "h2", "h3", "h4", "h5", "h6", "pre", "blockquote", "title",
+}
+MAP_MAX_TOKENS = 1000
+# Предел раундов свёртки: после каждого текст сокращается в разы
+MAX_REDUCE_ROUNDS = 3
+
+MAP_PROMPT = (
+    "Ниже фрагмент {index} из {total} документа «{name}». Перескажи его сжато, "
+    "сохранив факты, числа, имена, определения и структуру таблиц. Пиши на языке "
+    "документа, без вступлений."
+)
+REDUCE_PROMPT = (
+    "Ниже пересказы частей документа «{name}» по порядку. Объедини их в одно "
+    "сжатое содержание документа, ничего важного не теряя. Пиши без вступлений."
+)
+QUESTION_PROMPT = "\nОсобенно подробно сохрани то, что относится к запросу пользователя: {question}"
+SUMMARY_HEADER = "Файл «{name}» слишком большой, ниже его сжатое содержание:\n\n"
+TRUNCATED_NOTE = "\n\n(файл прочитан не полностью: обработаны первые {megabytes:g} МБ)"
+
+
+def detect_encoding(sample: bytes) -> str:
+    """Кодировка текста по его началу"""
+
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+
+    try:
+        # Образец может обрываться посреди многобайтового символа
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+
+    return max(
+        SINGLE_BYTE_ENCODINGS,
+        key=lambda encoding: sum(
+            char in FREQUENT_LETTERS for char in sample.decode(encoding, errors="replace")
+        ),
+    )
+
+
+class PlainText:
+    def feed(self, text: str) -> str:
+        return text
+
+    def close(self) -> str:
+        return ""
+
+
+class HtmlText(HTMLParser):
+    """Видимый текст HTML-страницы, подаётся частями"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._parts: List[str] = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in HTML_SKIP_TAGS:
+            self._skip += 1
+        elif tag in HTML_BLOCK_TAGS:
+            self._parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in HTML_SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+        elif tag in HTML_BLOCK_TAGS:
+            self._parts.append("\n")
+        elif tag in ("td", "th"):
+            self._parts.append(" | ")
+
+    def handle_data(self, data):
+        if not self._skip:
+            self._parts.append(data)
+
+    def feed(self, text: str) -> str:
+        super().feed(text)
+        return self._take()
+
+    def close(self) -> str:
+        super().close()
+        return self._take()
+
+    def _take(self) -> str:
+        text = "".join(self._parts)
+        self._parts.clear()
+        return text
+
+
+class CsvText:
+    """
+    Строки CSV в виде «ячейка | ячейка». В памяти держится только незаконченная
+    запись: поле в кавычках может занимать несколько строк.
+    """
+
+    def __init__(self, sample: str):
+        try:
+            self.dialect = csv.Sniffer().sniff(sample, delimiters=CSV_DELIMITERS)
+        except csv.Error:
+            self.dialect = csv.excel
+        self._pending = ""
+        self._record = ""
+
+    def feed(self, text: str) -> str:
+        *lines, self._pending = (self._pending + text).split("\n")
+        rows = []
+        for line in lines:
+            self._record += line + "\n"
+            # Нечётное число кавычек - запись продолжается на следующей строке
+            if self._record.count('"') % 2 == 0:
+                rows.append(self._flush())
+        return "".join(rows)
+
+    def close(self) -> str:
+        self._record += self._pending
+        self._pending = ""
+        return self._flush()
+
+    def _flush(self) -> str:
+        record, self._record = self._record, ""
+        rows = csv.reader(io.StringIO(record), self.dialect)
+        return "".join(
+            " | ".join(cell.strip() for cell in row) + "\n"
+            for row in rows
+            if any(cell.strip() for cell in row)
+        )
+
+
+def _normalizer(name: str, sample: str):
+    name = name.lower()
+    if name.endswith((".html", ".htm")):
+        return HtmlText()
+    if name.endswith(".csv"):
+        return CsvText(sample)
+    return PlainText()
+
+
+def _clean(text: str) -> str:
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    text = re.sub(r"[ \t\xa0]+\n", "\n", text)
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+
+class DocumentReader:
+    """
+    Чтение документов пользователя (.txt, .csv, .html) для диалога.
+
+    Файл скачивается потоком не больше DOCUMENT_MAX_BYTES, кодировка
+    определяется по началу, HTML очищается от разметки, CSV приводится
+    к строкам «ячейка | ячейка» - всё по частям, без второй копии файла в памяти.
+    Текст длиннее DOCUMENT_INLINE_CHARS не обрезается, а делится на части,
+    которые параллельно пересказывает DOCUMENT_MODEL (map), после чего
+    пересказы сводятся в одно содержание (reduce).
+    """
+
+    def __init__(self):
+        self.client = AsyncOpenAI(
+            api_key=settings.GPT_KEY,
+            max_retries=2,
+            http_client=DefaultAsyncHttpxClient(
+                event_hooks=rate_limiter.event_hooks("openai")
+            ),
+        )
+        self.logger = setup_logger(__name__)
+
+    async def read_document(
+        self, file: Dict[str, Any], data: Dict[str, Any], question: Optional[str] = None
+    ) -> str:
+        """Текст документа для добавления в диалог"""
+
+        name = file.get("name") or "document.txt"
+        try:
+            text, truncated = await self.download(file["url"], name, client_timeout(data))
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.logger.error(f"Failed to download document {name}: {e}")
+            return ""
+
+        if len(text) > settings.DOCUMENT_INLINE_CHARS:
+            text = SUMMARY_HEADER.format(name=name) + await self._map_reduce(
+                text, name, question, data
+            )
+        if truncated:
+            text += TRUNCATED_NOTE.format(megabytes=settings.DOCUMENT_MAX_BYTES / 1_000_000)
+        return text
+
+    async def download(
+        self, url: str, name: str, timeout: aiohttp.ClientTimeout
+    ) -> Tuple[str, bool]:
+        """Текст файла и признак того, что файл прочитан не целиком"""
+
+        limit = settings.DOCUMENT_MAX_BYTES
+        size = 0
+        sample = b""
+        decoder = normalizer = None
+        parts: List[str] = []
+        truncated = False
+
+        async with http_client.session() as session:
+            async with session.get(url, timeout=timeout) as response:
+                if response.status != 200:
+                    self.logger.error(f"Ошибка загрузки: {response.status}")
+                    return "", False
+
+                async for chunk in response.content.iter_chunked(READ_CHUNK_SIZE):
+                    if size + len(chunk) > limit:
+                        chunk = chunk[: limit - size]
+                        truncated = True
+                    size += len(chunk)
+
+                    if decoder is None:
+                        sample += chunk
+                        if len(sample) < SAMPLE_SIZE and not truncated:
+                            continue
+                        decoder, normalizer = self._start(sample, name)
+                        chunk = sample
+
+                    parts.append(normalizer.feed(decoder.decode(chunk)))
+                    if truncated:
+                        break
+
+        if decoder is None:
+            # Файл меньше образца
+            decoder, normalizer = self._start(sample, name)
+            parts.append(normalizer.feed(decoder.decode(sample)))
+
+        parts.append(normalizer.feed(decoder.decode(b"", final=True)))
+        parts.append(normalizer.close())
+        return _clean("".join(parts)), truncated
+
+    @staticmethod
+    def _start(sample: bytes, name: str):
+        encoding = detect_encoding(sample)
+        decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        text_sample = sample[:SAMPLE_SIZE].decode(encoding, errors="replace")
+        return decoder, _normalizer(name, text_sample)
+
+    @staticmethod
+    def split(text: str, chunk_tokens: int) -> List[str]:
+        """Части текста не больше chunk_tokens, по возможности по границам строк"""
+
+        limit = chunk_tokens * BYTES_PER_TOKEN
+        chunks: List[str] = []
+        current: List[str] = []
+        used = 0
+
+        for line in text.splitlines(keepends=True):
+            size = len(line.encode("utf-8"))
+            if current and used + size > limit:
+                chunks.append("".join(current))
+                current, used = [], 0
+            while size > limit:
+                # Строка длиннее части (например, текст без переносов)
+                piece = line.encode("utf-8")[:limit].decode("utf-8", errors="ignore")
+                chunks.append(piece)
+                line = line[len(piece) :]
+                size = len(line.encode("utf-8"))
+            current.append(line)
+            used += size
+
+        if current:
+            chunks.append("".join(current))
+        return [chunk for chunk in chunks if chunk.strip()]
+
+    async def _map_reduce(
+        self, text: str, name: str, question: Optional[str], data: Dict[str, Any]
+    ) -> str:
+        semaphore = asyncio.Semaphore(settings.DOCUMENT_MAP_CONCURRENCY)
+
+        async def summarize(prompt: str, part: str) -> str:
+            async with semaphore:
+                return await self._complete(prompt, part, data)
+
+        parts = self.split(text, settings.DOCUMENT_CHUNK_TOKENS)
+        self.logger.info(f"Summarizing document {name} in {len(parts)} parts")
+
+        question_prompt = QUESTION_PROMPT.format(question=question) if question else ""
+        notes = await asyncio.gather(
+            *(
+                summarize(
+                    MAP_PROMPT.format(index=index, total=len(parts), name=name)
+                    + question_prompt,
+                    part,
+                )
+                for index, part in enumerate(parts, start=1)
+            )
+        )
+        combined = "\n\n".join(notes)
+
+        rounds = 0
+        while len(combined) > settings.DOCUMENT_INLINE_CHARS and rounds < MAX_REDUCE_ROUNDS:
+            notes = await asyncio.gather(
+                *(
+                    summarize(REDUCE_PROMPT.format(name=name) + question_prompt, part)
+                    for part in self.split(combined, settings.DOCUMENT_CHUNK_TOKENS)
+                )
+            )
+            combined = "\n\n".join(notes)
+            rounds += 1
+
+        return combined[: settings.DOCUMENT_INLINE_CHARS]
+
+    async def _complete(self, prompt: str, text: str, data: Dict[str, Any]) -> str:
+        tokens = estimate_tokens([prompt, text], MAP_MAX_TOKENS)
+        async with rate_limiter.slot(
+            "openai", settings.DOCUMENT_MODEL, tokens, priority=data.get("priority", 0)
+        ):
+            response = await self.client.chat.completions.create(
+                model=settings.DOCUMENT_MODEL,
+                messages=[
+                    {"role": "system", "content": prompt},
+                    {"role": "user", "content": text},
+                ],
+                max_completion_tokens=MAP_MAX_TOKENS,
+                timeout=request_timeout(data, settings.PROVIDER_TIMEOUT),
+            )
+        return response.choices[0].message.content or ""
@@ -1,5 +1,6 @@
 from typing import Dict, Any, Literal
 from src.db.orm.user_orm import UserORM
+from src.scripts.queue.job_store import job_store
 
 
 class EnergyService:
@@ -12,15 +13,33 @@ class EnergyService:
             if data["energy_cost"] == 0:
                 text = None
                 return text
+            if action == "remove" and data.get("energy_charged"):
+                # Повторная доставка задачи: энергия уже списана прошлой попыткой
+                return None
             if action == "remove":
                 text = await UserORM.remove_energy(data["user_id"], data["energy_cost"])
             else:
                 text = await UserORM.add_energy(data["user_id"], data["energy_cost"])
 
-            if text.get("error"):
-                return {"error": text["error"], "text": text["text"]}
+            # remove_energy ловит свои исключения и отвечает без ключа error:
+            # списанной считается только энергия с явным error=False
+            if text.get("error") or (action == "remove" and text.get("error") is not False):
+                return {"error": True, "text": text["text"]}
+
+            if action == "remove":
+                await job_store.checkpoint(data, energy_charged=True)
 
             return text["text"]
 
         except Exception as e:
             return {"text": "Возникла ошибка"}
+
+    async def refund(self, data: Dict[str, Any]) -> None:
+        """Возврат списанной за задачу энергии (повторный вызов ничего не делает)"""
+
+        if not data.get("energy_charged"):
+            return
+
+        data["energy_charged"] = False
+        await UserORM.add_energy(data["user_id"], data["energy_cost"])
+        await job_store.checkpoint(data, energy_charged=False)
@@ -9,13 +9,23 @@ from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
 from gpytranslate import Translator
 from src.config.config import settings
+from src.scripts.credentials.service import Credential, credential_pools
+from src.utils.http_client import http_client
 from src.utils.logger import setup_logger
 from src.scripts.answer_messages.answer_message import AnswerMessage
+from src.scripts.queue.deadline import client_timeout
+from src.scripts.queue.retry import RETRYABLE_STATUS_CODES, RetryableError
+from src.scripts.rate_limiter.service import rate_limiter
 from src.db.orm.user_orm import ImageORM
+from src.utils.redis_cache.redis_cache import redis_manager
 
 
 logger = setup_logger(__name__)
 
+# Задача goapi доступна только ключу, которым создана, в том числе для upscale/variation
+TASK_CREDENTIAL_KEY = "goapi:task:{task_id}:credential"
+TASK_CREDENTIAL_TTL = 60 * 60 * 24 * 30
+
 
 class TranslateService:
     def __init__(self):
@@ -69,21 +79,51 @@ class TranslateService:
 
 class MidjourneyService:
     def __init__(self):
-        self.API_KEY = settings.MJ_KEY
         self.BASE_URL = "https://api.goapi.ai"
         self.message_handler = AnswerMessage()
         self.translator = TranslateService()
+        self.credentials = credential_pools.get("goapi")
 
-        self.HEADER = {
+    @staticmethod
+    def _headers(credential: Credential) -> Dict[str, str]:
+        return {
             "Content-Type": "application/json",
-            "x-api-key": self.API_KEY,
+            "x-api-key": credential.key,
         }
 
+    async def _credential(
+        self, body: Dict[str, Any], origin_task_id: str | None = None
+    ) -> Credential:
+        """Ключ для задачи: для действий над готовой картинкой - тот, которым она создана"""
+
+        credential = self.credentials.get(body.get("credential"))
+        if credential is None and origin_task_id:
+            name = await redis_manager.get(
+                TASK_CREDENTIAL_KEY.format(task_id=origin_task_id)
+            )
+            credential = self.credentials.get(name) or self.credentials.primary
+        if credential is None:
+            credential = self.credentials.choose()
+
+        body["credential"] = credential.name
+        return credential
+
+    async def _task_created(
+        self, body: Dict[str, Any], credential: Credential, task_id: str
+    ) -> None:
+        body["hash"] = task_id
+        await redis_manager.set(
+            TASK_CREDENTIAL_KEY.format(task_id=task_id),
+            credential.name,
+            ttl=TASK_CREDENTIAL_TTL,
+        )
+
     async def generate_photo(self, body: Dict[str, Any]):
         generate_url = self.BASE_URL + "/api/v1/task"
 
-        async with aiohttp.ClientSession() as session:
+        async with http_client.session() as session:
             try:
+                credential = await self._credential(body)
                 translate_message = await self.translator.translate(body["message"])
                 logger.debug(translate_message)
                 body["message"] = translate_message
@@ -105,14 +145,27 @@ class MidjourneyService:
                     }
                 ).encode()
 
-                result = await session.post(
-                    generate_url, headers=self.HEADER, data=data
-                )
+                async with rate_limiter.slot("goapi", priority=body.get("priority", 0)):
+                    result = await session.post(
+                        generate_url,
+                        headers=self._headers(credential),
+                        data=data,
+                        timeout=client_timeout(body),
+                    )
+                    # Тело читается сразу, чтобы соединение вернулось в общий пул
+                    await result.read()
+                rate_limiter.observe("goapi", None, result.status, result.headers)
+                self.credentials.report(credential, result.status, result.headers)
+
+                if result.status in RETRYABLE_STATUS_CODES:
+                    raise RetryableError(f"goapi responded with {result.status}")
 
                 if result.status == 200:
                     response = await result.json()
                     if response.get("code") == 200:
-                        body["hash"] = response["data"]["task_id"]
+                        await self._task_created(
+                            body, credential, response["data"]["task_id"]
+                        )
                         logger.debug(body)
 
                         await self._check_status(body=body, session=session)
@@ -144,11 +197,16 @@ class MidjourneyService:
         """
         retry_count = 0
         current_delay = initial_delay
+        credential = self.credentials.get(body.get("credential")) or self.credentials.primary
 
         while retry_count < max_retries:
             try:
                 check_url = f"{self.BASE_URL}/api/v1/task/{body['hash']}"
-                result = await session.get(check_url, headers=self.HEADER)
+                result = await session.get(
+                    check_url,
+                    headers=self._headers(credential),
+                    timeout=client_timeout(body),
+                )
                 response = await result.json()
                 status = response.get("data", {}).get("status")
 
@@ -163,7 +221,9 @@ class MidjourneyService:
 
                 if status == "completed":
                     body["original_link"] = response["data"]["output"]["image_url"]
-                    body["photo"] = await self._resize_image(body["original_link"])
+                    body["photo"] = await self._resize_image(
+                        body["original_link"], timeout=client_timeout(body)
+                    )
 
                     if not body.get("image_id"):
                         image = await ImageORM.create_image(
@@ -180,7 +240,6 @@ class MidjourneyService:
                         )
 
                     await self.message_handler.answer_photo(data=body)
-                    await session.close()
                     return
 
                 elif status == "failed":
@@ -193,7 +252,7 @@ class MidjourneyService:
                     retry_count += 1
                     current_delay *= backoff_factor
 
-            except aiohttp.ClientError as e:
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
                 logger.warning(
                     f"Network error: {e}, retrying... (attempt {retry_count + 1})"
                 )
@@ -202,8 +261,6 @@ class MidjourneyService:
                 current_delay *= backoff_factor
 
             except Exception as e:
-                await session.close()
-
                 logger.error(f"Unexpected error: {e}")
                 await self.message_handler.answer_message(data=body)
                 return
@@ -214,8 +271,9 @@ class MidjourneyService:
         reroll_url = self.BASE_URL + "/api/v1/task"
         image_data = await ImageORM.get_image(id=body["image_id"])
         body["message"] = image_data.prompt
+        credential = await self._credential(body, image_data.first_hash)
 
-        async with aiohttp.ClientSession() as session:
+        async with http_client.session() as session:
             try:
                 data = json.dumps(
                     {
@@ -233,18 +291,28 @@ class MidjourneyService:
                     },
                 ).encode()
 
-                result = await session.post(
-                    reroll_url,
-                    headers=self.HEADER,
-                    data=data,
-                )
+                async with rate_limiter.slot("goapi", priority=body.get("priority", 0)):
+                    result = await session.post(
+                        reroll_url,
+                        headers=self._headers(credential),
+                        data=data,
+                        timeout=client_timeout(body),
+                    )
+                    await result.read()
+                rate_limiter.observe("goapi", None, result.status, result.headers)
+                self.credentials.report(credential, result.status, result.headers)
+
+                if result.status in RETRYABLE_STATUS_CODES:
+                    raise RetryableError(f"goapi responded with {result.status}")
 
                 logger.debug(result.status)
 
                 if result.status == 200:
                     response = await result.json()
                     if response.get("code") == 200:
-                        body["hash"] = response["data"]["task_id"]
+                        await self._task_created(
+                            body, credential, response["data"]["task_id"]
+                        )
                         logger.debug(body)
 
                         await self._check_status(body=body, session=session)
@@ -262,8 +330,9 @@ class MidjourneyService:
         upscale_url = self.BASE_URL + "/api/v1/task"
         image_data = await ImageORM.get_image(id=body["image_id"])
         body["message"] = image_data.prompt
+        credential = await self._credential(body, image_data.hash)
 
-        async with aiohttp.ClientSession() as session:
+        async with http_client.session() as session:
             try:
                 data = json.dumps(
                     {
@@ -280,18 +349,28 @@ class MidjourneyService:
                     }
                 ).encode()
 
-                result = await session.post(
-                    upscale_url,
-                    headers=self.HEADER,
-                    data=data,
-                )
+                async with rate_limiter.slot("goapi", priority=body.get("priority", 0)):
+                    result = await session.post(
+                        upscale_url,
+                        headers=self._headers(credential),
+                        data=data,
+                        timeout=client_timeout(body),
+                    )
+                    await result.read()
+                rate_limiter.observe("goapi", None, result.status, result.headers)
+                self.credentials.report(credential, result.status, result.headers)
+
+                if result.status in RETRYABLE_STATUS_CODES:
+                    raise RetryableError(f"goapi responded with {result.status}")
 
                 logger.debug(result.status)
 
                 if result.status == 200:
                     response = await result.json()
                     if response.get("code") == 200:
-                        body["hash"] = response["data"]["task_id"]
+                        await self._task_created(
+                            body, credential, response["data"]["task_id"]
+                        )
 
                         body["keyboard"] = InlineKeyboardMarkup(
                             inline_keyboard=[
@@ -323,8 +402,9 @@ class MidjourneyService:
         upscale_url = self.BASE_URL + "/api/v1/task"
         image_data = await ImageORM.get_image(id=body["image_id"])
         body["message"] = image_data.prompt
+        credential = await self._credential(body, image_data.hash)
 
-        async with aiohttp.ClientSession() as session:
+        async with http_client.session() as session:
             try:
                 data = json.dumps(
                     {
@@ -343,18 +423,28 @@ class MidjourneyService:
                     }
                 ).encode()
 
-                result = await session.post(
-                    upscale_url,
-                    headers=self.HEADER,
-                    data=data,
-                )
+                async with rate_limiter.slot("goapi", priority=body.get("priority", 0)):
+                    result = await session.post(
+                        upscale_url,
+                        headers=self._headers(credential),
+                        data=data,
+                        timeout=client_timeout(body),
+                    )
+                    await result.read()
+                rate_limiter.observe("goapi", None, result.status, result.headers)
+                self.credentials.report(credential, result.status, result.headers)
+
+                if result.status in RETRYABLE_STATUS_CODES:
+                    raise RetryableError(f"goapi responded with {result.status}")
 
                 logger.debug(result.status)
 
                 if result.status == 200:
                     response = await result.json()
                     if response.get("code") == 200:
-                        body["hash"] = response["data"]["task_id"]
+                        await self._task_created(
+                            body, credential, response["data"]["task_id"]
+                        )
 
                         await self._check_status(body=body, session=session)
                 else:
@@ -365,11 +455,15 @@ class MidjourneyService:
                 raise
 
     async def _resize_image(
-        self, url: str, max_size: int = 5500000, target_width: int = 800
+        self,
+        url: str,
+        timeout: aiohttp.ClientTimeout,
+        max_size: int = 5500000,
+        target_width: int = 800,
     ):
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url) as response:
+            async with http_client.session() as session:
+                async with session.get(url, timeout=timeout) as response:
                     if response.status == 200:
                         data = await response.read()
                         image = Image.open(io.BytesIO(data))
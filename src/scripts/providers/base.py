@@ -0,0 +1,63 @@
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from src.config.config import settings
+from src.db.models import Message
+
+
+def provider_name(version: str) -> str:
+    """Провайдер модели: TEXT_PROVIDER_OVERRIDE, ключ provider в settings.TEXT_GPT или по названию"""
+
+    if settings.TEXT_PROVIDER_OVERRIDE:
+        return settings.TEXT_PROVIDER_OVERRIDE
+
+    provider = settings.TEXT_GPT.get(version, {}).get("provider")
+    if provider:
+        return provider
+    return "anthropic" if version.startswith("claude") else "openai"
+
+
+class LLMProvider:
+    """
+    Текстовый провайдер: только вызов модели.
+
+    Энергию, диалог, кэш ответов, контрольные точки и ответ пользователю
+    ведёт TextService, поэтому провайдер получает готовый контекст
+    (краткое содержание и сообщения) и задачу - из неё берутся приоритет
+    для лимитера и срок ответа.
+    """
+
+    name: str = ""
+    supports_transcription: bool = False
+    supports_assistants: bool = False
+
+    async def complete(
+        self,
+        version: str,
+        summary: Optional[str],
+        messages: List[Message],
+        data: Dict[str, Any],
+    ) -> str:
+        """Ответ модели целиком"""
+
+        raise NotImplementedError
+
+    def stream(
+        self,
+        version: str,
+        summary: Optional[str],
+        messages: List[Message],
+        data: Dict[str, Any],
+    ) -> AsyncIterator[str]:
+        """Ответ модели по фрагментам"""
+
+        raise NotImplementedError
+
+    async def transcribe(self, file: Dict[str, Any], data: Dict[str, Any]) -> str:
+        """Текст голосового сообщения"""
+
+        raise NotImplementedError(f"{self.name} does not transcribe audio")
+
+    async def run_assistant(self, data: Dict[str, Any], streamed: bool) -> str:
+        """Ответ ассистента data["version"]; при streamed он выводится пользователю по мере генерации"""
+
+        raise NotImplementedError(f"{self.name} does not run assistants")
@@ -0,0 +1,188 @@
+"""
+Нагрузочный прогон текстового конвейера на заглушке модели:
+
+    python -m src.scripts.providers.benchmark --jobs 2000 --concurrency 200
+
+Задачи проходят TextRouter и TextService как в воркере, модель отвечает
+MockProvider, а диалоги, энергия, контрольные точки и Telegram заменены
+хранилищами в памяти - измеряется сам конвейер без RabbitMQ, Postgres и Redis.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from collections import Counter
+from typing import Any, AsyncIterator, Dict, List
+
+from src.config.config import settings
+from src.db.enums_class import MessageRole
+from src.db.models import Message
+from src.scripts.circuit_breaker.router import TextRouter
+from src.scripts.providers.mock import MockProvider
+from src.scripts.providers.service import ProviderRegistry, TextService
+
+
+VERSION = "gpt-4o-mini"
+
+
+class MemoryDialogs:
+    def __init__(self, context_messages: int = 10):
+        self.dialogs: Dict[int, List[Message]] = {}
+        self.context_messages = context_messages
+
+    async def add_message(self, role: MessageRole, dialog_id: int, message: str) -> None:
+        self.dialogs.setdefault(dialog_id, []).append(
+            Message(dialog_id=dialog_id, role=role, message=message)
+        )
+
+    async def get_prompt_context(self, dialog_id: int, version: str):
+        return None, self.dialogs.get(dialog_id, [])[-self.context_messages:]
+
+
+class MemoryEnergy:
+    async def upload_energy(self, data: Dict[str, Any], action: str = None):
+        data["energy_charged"] = True
+        return "⚡ -10"
+
+    async def refund(self, data: Dict[str, Any]) -> None:
+        data["energy_charged"] = False
+
+
+class MemoryJobStore:
+    async def checkpoint(self, data: Dict[str, Any], **fields: Any) -> None:
+        data.update(fields)
+
+
+class NoCache:
+    async def lookup(self, version, summary, messages):
+        return None
+
+    async def store(self, version, summary, messages, text):
+        return None
+
+
+class NoSummarizer:
+    async def schedule(self, dialog_id: int, version: str) -> None:
+        return None
+
+
+class MemoryMessages:
+    """Вместо Telegram запоминает время до первого фрагмента ответа"""
+
+    async def answer_message(self, data: Dict[str, Any]) -> None:
+        data.setdefault("first_chunk_at", time.monotonic())
+
+    async def answer_stream(self, data: Dict[str, Any], chunks: AsyncIterator[str]) -> str:
+        parts = []
+        async for chunk in chunks:
+            data.setdefault("first_chunk_at", time.monotonic())
+            parts.append(chunk)
+        return "".join(parts)
+
+
+def build_service(config: Dict[str, Any], seed: int) -> TextService:
+    messages = MemoryMessages()
+    providers = ProviderRegistry(
+        {"mock": lambda: MockProvider(config, message_client=messages, seed=seed)}
+    )
+    service = TextService(providers)
+    service.message_client = messages
+    service.energy_service = MemoryEnergy()
+    service.dialog_service = MemoryDialogs()
+    service.job_store = MemoryJobStore()
+    service.response_cache = NoCache()
+    service.summarizer = NoSummarizer()
+    return service
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if len(values) < 2:
+        value = values[0] if values else 0
+        return {"p50": value, "p95": value, "p99": value}
+
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return {"p50": cuts[49], "p95": cuts[94], "p99": cuts[98]}
+
+
+async def run(jobs: int, concurrency: int, config: Dict[str, Any], seed: int) -> Dict[str, Any]:
+    service = build_service(config, seed)
+    router = TextRouter(service.send_message, service.message_client)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, first_chunks, errors = [], [], Counter()
+
+    async def job(index: int) -> None:
+        data = {
+            "user_id": index,
+            "dialog_id": index % max(concurrency, 1),
+            "version": VERSION,
+            "energy_cost": 10,
+            "message": f"Запрос {index}",
+        }
+        async with semaphore:
+            started_at = time.monotonic()
+            try:
+                await router.send_message(data)
+            except Exception as e:
+                errors[type(e).__name__] += 1
+                return
+            latencies.append(time.monotonic() - started_at)
+            if data.get("first_chunk_at"):
+                first_chunks.append(data["first_chunk_at"] - started_at)
+
+    started_at = time.monotonic()
+    await asyncio.gather(*(job(index) for index in range(jobs)))
+    elapsed = time.monotonic() - started_at
+
+    return {
+        "jobs": jobs,
+        "completed": len(latencies),
+        "elapsed": elapsed,
+        "jobs_per_second": len(latencies) / elapsed if elapsed else 0,
+        "latency": percentiles(latencies),
+        "first_chunk": percentiles(first_chunks),
+        "errors": dict(errors),
+    }
+
+
+def main() -> None:
+    defaults = settings.MOCK_PROVIDER
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон текстовых задач на заглушке модели")
+    parser.add_argument("--jobs", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=defaults["latency_median"])
+    parser.add_argument("--sigma", type=float, default=defaults["latency_sigma"])
+    parser.add_argument("--tokens-per-second", type=float, default=defaults["tokens_per_second"])
+    parser.add_argument("--response-tokens", type=int, default=defaults["response_tokens"])
+    parser.add_argument("--error-rate", type=float, default=defaults["error_rate"])
+    parser.add_argument("--fatal-error-rate", type=float, default=defaults["fatal_error_rate"])
+    parser.add_argument("--no-stream", action="store_true", help="Ответ целиком, без стрима")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    settings.TEXT_PROVIDER_OVERRIDE = "mock"
+    settings.STREAM_ANSWERS = not args.no_stream
+    config = {
+        "latency_median": args.latency,
+        "latency_sigma": args.sigma,
+        "tokens_per_second": args.tokens_per_second,
+        "response_tokens": args.response_tokens,
+        "error_rate": args.error_rate,
+        "fatal_error_rate": args.fatal_error_rate,
+    }
+
+    result = asyncio.run(run(args.jobs, args.concurrency, config, args.seed))
+
+    print(f"jobs: {result['completed']}/{result['jobs']} in {result['elapsed']:.2f}s")
+    print(f"throughput: {result['jobs_per_second']:.1f} jobs/s")
+    for name in ("latency", "first_chunk"):
+        stats = result[name]
+        print(
+            f"{name}: p50 {stats['p50'] * 1000:.0f}ms, "
+            f"p95 {stats['p95'] * 1000:.0f}ms, p99 {stats['p99'] * 1000:.0f}ms"
+        )
+    print(f"errors: {result['errors'] or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
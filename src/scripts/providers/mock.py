@@ -0,0 +1,107 @@
+import asyncio
+import math
+import random
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from src.config.config import settings
+from src.db.models import Message
+from src.scripts.answer_messages.answer_message import AnswerMessage
+from src.scripts.providers.base import LLMProvider
+from src.scripts.queue.retry import RetryableError
+from src.scripts.rate_limiter.service import estimate_tokens, rate_limiter
+
+
+MOCK_WORD = "мок"
+# Фрагмент стрима: столько токенов модель «генерирует» между паузами
+STREAM_CHUNK_TOKENS = 20
+MOCK_TRANSCRIPT = "Тестовая расшифровка голосового сообщения"
+
+
+class MockProviderError(Exception):
+    """Постоянная ошибка, которую подмешивает заглушка"""
+
+
+class MockProvider(LLMProvider):
+    """
+    Локальная заглушка модели для нагрузочных тестов без обращения к API.
+
+    Задержка до первого токена распределена логнормально (медиана и sigma),
+    дальше ответ идёт со скоростью tokens_per_second. С вероятностью
+    error_rate вызов падает временной ошибкой (как 429), с вероятностью
+    fatal_error_rate - постоянной. Параметры по умолчанию - settings.MOCK_PROVIDER.
+    """
+
+    name = "mock"
+    supports_transcription = True
+    supports_assistants = True
+
+    def __init__(
+        self,
+        config: Optional[Dict[str, Any]] = None,
+        message_client=None,
+        seed: Optional[int] = None,
+    ):
+        self.config = {**settings.MOCK_PROVIDER, **(config or {})}
+        # Стрим ассистента провайдер выводит сам, как ChatGPT
+        self.message_client = message_client or AnswerMessage()
+        self.random = random.Random(seed)
+
+    def _latency(self) -> float:
+        median = self.config["latency_median"]
+        if median <= 0:
+            return 0
+        return median * math.exp(self.random.gauss(0, self.config["latency_sigma"]))
+
+    async def _first_token(self) -> None:
+        await asyncio.sleep(self._latency())
+
+        roll = self.random.random()
+        if roll < self.config["error_rate"]:
+            raise RetryableError("mock provider is rate limited")
+        if roll < self.config["error_rate"] + self.config["fatal_error_rate"]:
+            raise MockProviderError("mock provider failed")
+
+    async def _generate(self, tokens: int) -> AsyncIterator[str]:
+        rate = self.config["tokens_per_second"]
+        while tokens > 0:
+            chunk = min(tokens, STREAM_CHUNK_TOKENS)
+            if rate:
+                await asyncio.sleep(chunk / rate)
+            tokens -= chunk
+            yield " ".join([MOCK_WORD] * chunk) + " "
+
+    async def complete(
+        self,
+        version: str,
+        summary: Optional[str],
+        messages: List[Message],
+        data: Dict[str, Any],
+    ) -> str:
+        parts = [part async for part in self.stream(version, summary, messages, data)]
+        return "".join(parts).strip()
+
+    async def stream(
+        self,
+        version: str,
+        summary: Optional[str],
+        messages: List[Message],
+        data: Dict[str, Any],
+    ) -> AsyncIterator[str]:
+        tokens = estimate_tokens(
+            [summary, *(message.message for message in messages)],
+            self.config["response_tokens"],
+        )
+        async with rate_limiter.slot("mock", version, tokens, data.get("priority", 0)):
+            await self._first_token()
+            async for part in self._generate(self.config["response_tokens"]):
+                yield part
+
+    async def transcribe(self, file: Dict[str, Any], data: Dict[str, Any]) -> str:
+        await self._first_token()
+        return MOCK_TRANSCRIPT
+
+    async def run_assistant(self, data: Dict[str, Any], streamed: bool) -> str:
+        answer = self.stream(data["version"], None, [], data)
+        if streamed:
+            return await self.message_client.answer_stream(data, answer)
+        return "".join([part async for part in answer]).strip()
@@ -0,0 +1,212 @@
+from typing import Any, Callable, Dict, Optional
+
+from src.config.config import settings
+from src.db.enums_class import MessageRole
+from src.scripts.answer_messages.answer_message import AnswerMessage
+from src.scripts.answer_messages.stream import stream_enabled
+from src.scripts.antropic.claude_gpt import ClaudeGPT
+from src.scripts.chat_gpt.chat_gpt import ChatGPT
+from src.scripts.dialog.service import DialogService
+from src.scripts.documents.service import DocumentReader
+from src.scripts.energy_remover.service import EnergyService
+from src.scripts.providers.base import LLMProvider, provider_name
+from src.scripts.providers.mock import MockProvider
+from src.scripts.queue.job_store import job_store
+from src.scripts.queue.retry import is_retryable
+from src.scripts.response_cache.service import response_cache
+from src.scripts.summarizer.service import DialogSummarizer
+from src.utils.logger import setup_logger
+
+
+DEFAULT_PROVIDERS: Dict[str, Callable[[], LLMProvider]] = {
+    "openai": ChatGPT,
+    "anthropic": ClaudeGPT,
+    "mock": MockProvider,
+}
+
+
+class ProviderRegistry:
+    """
+    Провайдеры по имени. Экземпляр создаётся при первом обращении, поэтому
+    воркер без ключа Anthropic не падает, пока задачи Claude не пришли.
+    """
+
+    def __init__(self, factories: Optional[Dict[str, Callable[[], LLMProvider]]] = None):
+        self.factories = factories or DEFAULT_PROVIDERS
+        self._providers: Dict[str, LLMProvider] = {}
+
+    def get(self, name: str) -> LLMProvider:
+        if name not in self._providers:
+            if name not in self.factories:
+                raise KeyError(f"Unknown text provider {name}")
+            self._providers[name] = self.factories[name]()
+        return self._providers[name]
+
+    def for_model(self, version: str) -> LLMProvider:
+        return self.get(provider_name(version))
+
+    def transcriber(self, version: str) -> LLMProvider:
+        """Провайдер модели, если он распознаёт голос, иначе OpenAI (Whisper)"""
+
+        provider = self.for_model(version)
+        return provider if provider.supports_transcription else self.get("openai")
+
+    def assistant(self) -> LLMProvider:
+        return self.get(settings.TEXT_PROVIDER_OVERRIDE or "openai")
+
+
+class TextService:
+    """
+    Текстовый запрос независимо от провайдера: энергия, сохранение запроса,
+    контекст диалога, кэш ответов, стрим, контрольные точки и ответ пользователю.
+    От провайдера нужен только вызов модели.
+    """
+
+    def __init__(
+        self,
+        providers: Optional[ProviderRegistry] = None,
+        summarizer: Optional[DialogSummarizer] = None,
+    ):
+        self.providers = providers or ProviderRegistry()
+        self.message_client = AnswerMessage()
+        self.energy_service = EnergyService()
+        self.dialog_service = DialogService()
+        self.summarizer = summarizer or DialogSummarizer()
+        self.document_reader = DocumentReader()
+        self.job_store = job_store
+        self.response_cache = response_cache
+        self.logger = setup_logger(__name__)
+
+    async def _save_prompt(self, data: Dict[str, Any]) -> None:
+        """Сохраняет запрос пользователя в диалог (один раз на задачу)"""
+
+        if data.get("prompt_saved"):
+            return
+
+        message = data.get("message")
+        if message:
+            await self.dialog_service.add_message(
+                role=MessageRole.USER,
+                dialog_id=data["dialog_id"],
+                message=message,
+            )
+
+        file = data.get("file")
+        if file:
+            if file["type"] == "voice":
+                content = await self.providers.transcriber(data["version"]).transcribe(
+                    file, data
+                )
+            else:
+                content = await self.document_reader.read_document(
+                    file, data, question=message
+                )
+
+            await self.dialog_service.add_message(
+                role=MessageRole.USER,
+                dialog_id=data["dialog_id"],
+                message=content,
+            )
+
+        await self.job_store.checkpoint(data, prompt_saved=True)
+
+    async def _answer_saved_result(self, data: Dict[str, Any]) -> bool:
+        """Отправляет ответ, уже полученный прошлой попыткой задачи"""
+
+        if not data.get("result"):
+            return False
+
+        data["text"] = data["result"]
+        await self.message_client.answer_message(data)
+        return True
+
+    async def _remove_energy(self, data: Dict[str, Any]) -> bool:
+        status = await self.energy_service.upload_energy(data, "remove")
+        if isinstance(status, dict):
+            # Энергии не хватает: сообщение об этом уже в data
+            data["energy_text"] = None
+            await self.message_client.answer_message(data)
+            return False
+
+        data["energy_text"] = status
+        return True
+
+    async def _generate(self, data: Dict[str, Any]) -> None:
+        version = data["version"]
+        provider = self.providers.for_model(version)
+        summary, messages = await self.dialog_service.get_prompt_context(
+            data["dialog_id"], version
+        )
+
+        cached = await self.response_cache.lookup(version, summary, messages)
+        streamed = cached is None and stream_enabled(version)
+        if cached is not None:
+            text_only = cached
+        elif streamed:
+            text_only = await self.message_client.answer_stream(
+                data, provider.stream(version, summary, messages, data)
+            )
+        else:
+            text_only = await provider.complete(version, summary, messages, data)
+
+        if cached is None:
+            await self.response_cache.store(version, summary, messages, text_only)
+
+        await self.dialog_service.add_message(
+            role=MessageRole.ASSISTANT,
+            dialog_id=data["dialog_id"],
+            message=text_only,
+        )
+        await self.job_store.checkpoint(data, result=text_only)
+        await self.summarizer.schedule(data["dialog_id"], version)
+
+        if not streamed:
+            data["text"] = text_only
+            await self.message_client.answer_message(data)
+
+    async def _run_assistant(self, data: Dict[str, Any]) -> None:
+        streamed = stream_enabled(data["version"])
+        text_only = await self.providers.assistant().run_assistant(data, streamed)
+
+        await self.dialog_service.add_message(
+            role=MessageRole.ASSISTANT,
+            dialog_id=data["dialog_id"],
+            message=text_only,
+        )
+        await self.job_store.checkpoint(data, result=text_only)
+
+        if not streamed:
+            data["text"] = text_only
+            await self.message_client.answer_message(data)
+
+    async def send_message(self, data: Dict[str, Any]) -> None:
+        """Ответ текстовой модели из settings.TEXT_GPT"""
+
+        await self._handle(data, self._generate)
+
+    async def send_message_assistant(self, data: Dict[str, Any]) -> None:
+        """Ответ ассистента OpenAI"""
+
+        await self._handle(data, self._run_assistant)
+
+    async def _handle(self, data: Dict[str, Any], answer) -> None:
+        try:
+            if not await self._remove_energy(data):
+                return
+            if await self._answer_saved_result(data):
+                return
+
+            await self._save_prompt(data)
+            await answer(data)
+
+        except Exception as e:
+            await self.energy_service.refund(data)
+            self.logger.error(f"Failed to send message: {e}")
+            if is_retryable(e):
+                # Временную ошибку обработает очередь повторов
+                raise
+            data["text"] = (
+                f"Произошла ошибка, обратитесь в поддержку с данной ошибкой: \n\n{str(e)}"
+            )
+            await self.message_client.answer_message(data)
+            raise
@@ -0,0 +1,122 @@
+import asyncio
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Any, Optional, Set
+
+from aio_pika.abc import AbstractChannel, AbstractQueue, ConsumerTag
+
+from src.scripts.queue.fair_scheduler import DEFAULT_AGING_INTERVAL, FairScheduler
+
+
+DEFAULT_PREFETCH_COUNT = 10
+DEFAULT_CONCURRENCY = 10
+
+
+class PoolDrainingError(Exception):
+    """Пул останавливается и больше не берёт задачи в работу"""
+
+
+class ConsumerPool:
+    """
+    Пул потребителя одной очереди: свой канал, свой prefetch и свой лимит параллельности.
+    Сообщения из окна prefetch получают слоты через FairScheduler.
+    """
+
+    def __init__(
+        self,
+        queue_name: str,
+        channel: AbstractChannel,
+        prefetch_count: int = DEFAULT_PREFETCH_COUNT,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        aging_interval: float = DEFAULT_AGING_INTERVAL,
+    ):
+        self.queue_name = queue_name
+        self.channel = channel
+        self.prefetch_count = prefetch_count
+        self.concurrency = concurrency
+
+        self.queue: Optional[AbstractQueue] = None
+        self.consumer_tag: Optional[ConsumerTag] = None
+
+        self._scheduler = FairScheduler(concurrency, aging_interval=aging_interval)
+        self._tasks: Set[asyncio.Task] = set()
+        self.draining = False
+        self.in_flight = 0
+        self.waiting = 0
+        self.processed = 0
+        self.failed = 0
+
+    @contextmanager
+    def track(self):
+        """Учитывает текущую задачу до полного завершения обработки сообщения"""
+
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        try:
+            yield
+        finally:
+            self._tasks.discard(task)
+
+    @asynccontextmanager
+    async def slot(self, user_id: Any = None, priority: int = 0):
+        """Занимает слот обработки в порядке справедливой очереди пользователей"""
+
+        self.waiting += 1
+        try:
+            await self._scheduler.acquire(user_id, priority)
+        finally:
+            self.waiting -= 1
+
+        try:
+            # Пока задача ждала слот, пул мог начать остановку
+            if self.draining:
+                raise PoolDrainingError(self.queue_name)
+
+            self.in_flight += 1
+            try:
+                yield
+            except Exception:
+                self.failed += 1
+                raise
+            finally:
+                self.in_flight -= 1
+                self.processed += 1
+        finally:
+            self._scheduler.release()
+
+    async def stop_consuming(self) -> None:
+        """Перестаёт получать новые сообщения, текущие задачи продолжают работу"""
+
+        self.draining = True
+        if self.queue and self.consumer_tag:
+            await self.queue.cancel(self.consumer_tag)
+            self.consumer_tag = None
+
+    @property
+    def tasks(self) -> Set[asyncio.Task]:
+        """Задачи, которые ждут слот или уже обрабатываются"""
+
+        return set(self._tasks)
+
+    async def close(self) -> None:
+        """Отменяет потребителя и закрывает канал пула"""
+
+        if self.queue and self.consumer_tag:
+            await self.queue.cancel(self.consumer_tag)
+            self.consumer_tag = None
+
+        if self.channel and not self.channel.is_closed:
+            await self.channel.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Статистика пула"""
+
+        return {
+            "name": self.queue_name,
+            "prefetch_count": self.prefetch_count,
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "processed": self.processed,
+            "failed": self.failed,
+            "draining": self.draining,
+        }
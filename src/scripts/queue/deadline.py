@@ -0,0 +1,66 @@
+import math
+import time
+from typing import Any, Dict, Optional
+
+import aiohttp
+
+from src.config.config import settings
+
+
+# С меньшим остатком провайдер всё равно не успеет ответить
+MIN_REQUEST_TIMEOUT = 1
+# Блокировка генерации живёт чуть дольше срока задачи: обычно её снимает воркер
+LOCK_MARGIN = 30
+# Для очередей без ttl
+DEFAULT_LOCK_TTL = 120
+
+
+def new_deadline(queue_name: str) -> Optional[float]:
+    """Срок ответа для новой задачи очереди (ttl из settings.QUEUES)"""
+
+    ttl = settings.QUEUES.get(queue_name, {}).get("ttl")
+    return time.time() + ttl if ttl else None
+
+
+def job_deadline(data: Dict[str, Any], ttl: Optional[float] = None) -> Optional[float]:
+    """Момент, после которого ответ пользователю уже не нужен"""
+
+    if data.get("deadline"):
+        return data["deadline"]
+    # Задачи, опубликованные до появления deadline
+    if ttl and data.get("timestamp"):
+        return data["timestamp"] + ttl
+    return None
+
+
+def time_left(data: Dict[str, Any], ttl: Optional[float] = None) -> Optional[float]:
+    """Сколько секунд осталось до срока задачи, None - срока нет"""
+
+    deadline = job_deadline(data, ttl)
+    return deadline - time.time() if deadline is not None else None
+
+
+def request_timeout(data: Dict[str, Any], default: float) -> float:
+    """Таймаут одного запроса к провайдеру: не дольше остатка срока задачи"""
+
+    left = time_left(data)
+    if left is None:
+        return default
+    return max(MIN_REQUEST_TIMEOUT, min(default, left))
+
+
+def client_timeout(data: Dict[str, Any]) -> aiohttp.ClientTimeout:
+    """Таймаут aiohttp-запроса (скачивание файлов, goapi) в рамках срока задачи"""
+
+    return aiohttp.ClientTimeout(
+        total=request_timeout(data, settings.HTTP_TIMEOUT),
+        connect=settings.HTTP_CONNECT_TIMEOUT,
+    )
+
+
+def lock_ttl(deadline: Optional[float]) -> int:
+    """Время жизни ключа :generate для задачи с таким сроком"""
+
+    if deadline is None:
+        return DEFAULT_LOCK_TTL
+    return max(1, math.ceil(deadline - time.time())) + LOCK_MARGIN
@@ -0,0 +1,161 @@
+import json
+import time
+import uuid
+from dataclasses import dataclass, field, fields
+from datetime import datetime
+from typing import Any, ClassVar, Dict, Optional, Tuple, Type
+
+import msgpack
+
+
+# Версия схемы конверта. Новые поля добавляются со значениями по умолчанию,
+# неизвестные поля при чтении игнорируются - так старые и новые воркеры
+# могут работать одновременно во время выкладки.
+SCHEMA_VERSION = 1
+
+CONTENT_TYPE_MSGPACK = "application/x-msgpack"
+CONTENT_TYPE_JSON = "application/json"
+
+
+class EnvelopeError(ValueError):
+    """Сообщение очереди не соответствует схеме задачи"""
+
+
+@dataclass(slots=True)
+class Job:
+    """Общие поля задачи любой очереди"""
+
+    REQUIRED: ClassVar[Tuple[str, ...]] = ("user_id",)
+
+    type: str
+    # Идентификатор задачи, по нему воркер отличает повторную доставку
+    message_id: Optional[str] = None
+    user_id: Optional[int] = None
+    message: Optional[str] = None
+    answer_message: Optional[int] = None
+    key: Optional[str] = None
+    energy_cost: float = 0
+    retry_count: int = 0
+    timestamp: float = field(default_factory=time.time)
+    # Срок ответа (unix time): после него задача отменяется, энергия возвращается
+    deadline: Optional[float] = None
+
+    def validate(self) -> None:
+        for name in self.REQUIRED:
+            if getattr(self, name) is None:
+                raise EnvelopeError(f"{self.type}: field '{name}' is required")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Словарь для колбэков воркера"""
+
+        return {item.name: getattr(self, item.name) for item in fields(self)}
+
+
+@dataclass(slots=True)
+class TextJob(Job):
+    """Запрос к текстовой модели или ассистенту"""
+
+    REQUIRED: ClassVar[Tuple[str, ...]] = ("user_id", "dialog_id", "version")
+
+    dialog_id: Optional[int] = None
+    version: Optional[str] = None
+    file: Optional[Dict[str, Any]] = None
+
+
+@dataclass(slots=True)
+class ImageJob(Job):
+    """Генерация или изменение изображения в Midjourney"""
+
+    speed_mode: str = "relax"
+    image_id: Optional[int] = None
+    choice: Optional[int] = None
+
+
+@dataclass(slots=True)
+class ReferralJob(Job):
+    """Уведомление о новом реферале"""
+
+    text: Optional[str] = None
+
+
+@dataclass(slots=True)
+class SummaryJob(Job):
+    """Сжатие старой части диалога в краткое содержание"""
+
+    REQUIRED: ClassVar[Tuple[str, ...]] = ("dialog_id",)
+
+    dialog_id: Optional[int] = None
+    version: Optional[str] = None
+
+
+JOB_TYPES: Dict[str, Type[Job]] = {
+    "gpt_assistant": TextJob,
+    "chatgpt": TextJob,
+    "claude": TextJob,
+    "midjourney": ImageJob,
+    "refresh_midjourney": ImageJob,
+    "upscale_midjourney": ImageJob,
+    "variation_midjourney": ImageJob,
+    "referral": ReferralJob,
+    "dialog_summary": SummaryJob,
+}
+
+
+def build_job(queue_name: str, **kwargs) -> Job:
+    """Создаёт задачу нужного типа для очереди"""
+
+    job_class = JOB_TYPES.get(queue_name, Job)
+    kwargs.setdefault("message_id", uuid.uuid4().hex)
+    try:
+        job = job_class(type=queue_name, **kwargs)
+    except TypeError as e:
+        raise EnvelopeError(f"{queue_name}: {str(e)}") from e
+
+    job.validate()
+    return job
+
+
+def encode(job: Job, codec: str = "msgpack") -> Tuple[bytes, str]:
+    """Кодирует задачу, пустые поля не передаются"""
+
+    payload = {"v": SCHEMA_VERSION}
+    for item in fields(job):
+        value = getattr(job, item.name)
+        if value is not None:
+            payload[item.name] = value
+
+    if codec == "json":
+        return json.dumps(payload).encode(), CONTENT_TYPE_JSON
+
+    return msgpack.packb(payload, use_bin_type=True), CONTENT_TYPE_MSGPACK
+
+
+def decode(body: bytes, content_type: Optional[str] = None) -> Job:
+    """Декодирует и проверяет задачу; понимает и старые JSON-сообщения без версии"""
+
+    try:
+        if content_type == CONTENT_TYPE_MSGPACK:
+            payload = msgpack.unpackb(body, raw=False)
+        else:
+            payload = json.loads(body.decode())
+    except (ValueError, TypeError, msgpack.UnpackException) as e:
+        raise EnvelopeError(f"Invalid message body: {str(e)}") from e
+
+    if not isinstance(payload, dict) or "type" not in payload:
+        raise EnvelopeError("Message body is not a job envelope")
+
+    payload.pop("v", 0)
+
+    # До версии 1 timestamp передавался строкой ISO 8601
+    timestamp = payload.get("timestamp")
+    if isinstance(timestamp, str):
+        try:
+            payload["timestamp"] = datetime.fromisoformat(timestamp).timestamp()
+        except ValueError:
+            payload.pop("timestamp")
+
+    job_class = JOB_TYPES.get(payload["type"], Job)
+    known = {item.name for item in fields(job_class)}
+    job = job_class(**{name: value for name, value in payload.items() if name in known})
+    job.validate()
+    return job
@@ -0,0 +1,112 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Hashable, Optional, Tuple
+
+
+DEFAULT_AGING_INTERVAL = 10
+MAX_PRIORITY = 10
+
+
+class FairScheduler:
+    """
+    Раздаёт слоты обработки задачам из окна prefetch.
+
+    Внутри уровня приоритета пользователи обслуживаются по кругу, поэтому один
+    пользователь с пачкой задач не занимает все слоты. Приоритет ожидающих
+    задач растёт на 1 за каждые aging_interval секунд ожидания, так что
+    обычные задачи не голодают под постоянной нагрузкой от премиум-задач.
+    """
+
+    def __init__(
+        self,
+        concurrency: int,
+        aging_interval: float = DEFAULT_AGING_INTERVAL,
+        max_priority: int = MAX_PRIORITY,
+    ):
+        self.aging_interval = aging_interval
+        self.max_priority = max_priority
+        self._free = concurrency
+        # приоритет -> пользователь -> очередь (future, время постановки)
+        self._levels: Dict[int, "OrderedDict[Hashable, Deque[Tuple[asyncio.Future, float]]]"] = {}
+        self._waiting = 0
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    async def acquire(self, user_id: Any = None, priority: int = 0) -> None:
+        """Ждёт свой слот с учётом приоритета и очерёдности пользователей"""
+
+        if self._free > 0 and not self._waiting:
+            self._free -= 1
+            return
+
+        priority = max(0, min(priority or 0, self.max_priority))
+        future = asyncio.get_running_loop().create_future()
+        users = self._levels.setdefault(priority, OrderedDict())
+        users.setdefault(user_id, deque()).append((future, time.monotonic()))
+        self._waiting += 1
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Слот уже выдан, но задачу отменили - отдаём его следующей
+                self.release()
+            else:
+                self._discard(priority, user_id, future)
+            raise
+
+    def release(self) -> None:
+        self._free += 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._free > 0 and self._waiting:
+            future = self._pop_next()
+            self._waiting -= 1
+            if future.done():
+                continue
+            self._free -= 1
+            future.set_result(None)
+
+    def _pop_next(self) -> asyncio.Future:
+        now = time.monotonic()
+        best_level, best_score = None, None
+        for level, users in self._levels.items():
+            oldest = min(waiters[0][1] for waiters in users.values())
+            score = (min(level + int((now - oldest) / self.aging_interval), self.max_priority), level)
+            if best_score is None or score > best_score:
+                best_level, best_score = level, score
+
+        users = self._levels[best_level]
+        user_id, waiters = next(iter(users.items()))
+        future, _ = waiters.popleft()
+
+        # Обслуженный пользователь уходит в конец круга
+        if waiters:
+            users.move_to_end(user_id)
+        else:
+            del users[user_id]
+        if not users:
+            del self._levels[best_level]
+
+        return future
+
+    def _discard(self, priority: int, user_id: Any, future: asyncio.Future) -> None:
+        users = self._levels.get(priority)
+        waiters: Optional[Deque] = users.get(user_id) if users else None
+        if not waiters:
+            return
+
+        for item in waiters:
+            if item[0] is future:
+                waiters.remove(item)
+                self._waiting -= 1
+                break
+
+        if not waiters:
+            del users[user_id]
+        if not users:
+            del self._levels[priority]
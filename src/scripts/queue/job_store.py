@@ -0,0 +1,148 @@
+import asyncio
+import os
+import socket
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+from src.utils.logger import setup_logger
+from src.utils.redis_cache.redis_cache import redis_manager
+
+
+logger = setup_logger(__name__)
+
+# Статусы задачи в Redis
+STATUS_CLAIMED = "claimed"
+STATUS_RETRYING = "retrying"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+
+# Результат попытки взять задачу
+CLAIMED = "claimed"
+IN_PROGRESS = "in_progress"
+DONE = "done"
+
+# Захват задачи живёт CLAIM_TTL секунд и продлевается, пока воркер работает
+CLAIM_TTL = 60
+HEARTBEAT_INTERVAL = CLAIM_TTL / 3
+RECORD_TTL = 24 * 3600
+
+# Поля, которые сохраняются между попытками выполнить задачу
+CHECKPOINT_FIELDS = ("energy_charged", "prompt_saved", "result")
+
+
+class JobStore:
+    """
+    Дедупликация доставок по message_id задачи.
+
+    Запись job:<id> хранит статус и контрольные точки (списана ли энергия,
+    сохранён ли запрос в диалог, ответ модели), а ключ job:<id>:claim - кто
+    сейчас выполняет задачу. Повторная доставка завершённой задачи пропускается,
+    а задача упавшего воркера продолжается с последней контрольной точки.
+    Если Redis недоступен, задачи выполняются как раньше, без дедупликации.
+    """
+
+    def __init__(self):
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+
+    @staticmethod
+    def _record_key(message_id: str) -> str:
+        return f"job:{message_id}"
+
+    @staticmethod
+    def _claim_key(message_id: str) -> str:
+        return f"job:{message_id}:claim"
+
+    async def claim(self, data: Dict[str, Any]) -> str:
+        """Пытается взять задачу в работу, дописывая в data сохранённые контрольные точки"""
+
+        message_id = data.get("message_id")
+        if not message_id:
+            return CLAIMED
+
+        try:
+            record = await redis_manager.get(self._record_key(message_id)) or {}
+            if record.get("status") in (STATUS_COMPLETED, STATUS_FAILED):
+                return DONE
+
+            if not await redis_manager.set_nx(
+                self._claim_key(message_id), self.owner, ttl=CLAIM_TTL
+            ):
+                return IN_PROGRESS
+
+            if record:
+                logger.info(f"Resuming job {message_id} after {record.get('status')}")
+                data.update(
+                    {name: record[name] for name in CHECKPOINT_FIELDS if name in record}
+                )
+
+            record.update(status=STATUS_CLAIMED, owner=self.owner)
+            await redis_manager.set(self._record_key(message_id), record, ttl=RECORD_TTL)
+        except Exception as e:
+            logger.error(f"Job store unavailable, running {message_id} without dedup: {e}")
+            data["message_id"] = None
+
+        return CLAIMED
+
+    @asynccontextmanager
+    async def hold(self, data: Dict[str, Any]):
+        """Продлевает захват задачи, пока выполняется колбэк"""
+
+        message_id = data.get("message_id")
+        if not message_id:
+            yield
+            return
+
+        async def heartbeat():
+            while True:
+                await asyncio.sleep(HEARTBEAT_INTERVAL)
+                try:
+                    await redis_manager.expire(self._claim_key(message_id), CLAIM_TTL)
+                except Exception as e:
+                    logger.warning(f"Failed to extend claim of job {message_id}: {e}")
+
+        task = asyncio.create_task(heartbeat())
+        try:
+            yield
+        finally:
+            task.cancel()
+
+    async def checkpoint(self, data: Dict[str, Any], **fields) -> None:
+        """Сохраняет контрольную точку, с которой продолжится повторная доставка"""
+
+        data.update(fields)
+        await self._update(data, **fields)
+
+    async def complete(self, data: Dict[str, Any]) -> None:
+        await self._update(data, status=STATUS_COMPLETED, result=None)
+        await self._release_claim(data)
+
+    async def fail(self, data: Dict[str, Any], error: Exception) -> None:
+        await self._update(data, status=STATUS_FAILED, error=str(error))
+        await self._release_claim(data)
+
+    async def release(self, data: Dict[str, Any]) -> None:
+        """Отпускает задачу, чтобы следующая доставка выполнила её сразу"""
+
+        await self._update(data, status=STATUS_RETRYING)
+        await self._release_claim(data)
+
+    async def _update(self, data: Dict[str, Any], **fields) -> None:
+        message_id = data.get("message_id")
+        if not message_id:
+            return
+
+        try:
+            key = self._record_key(message_id)
+            record = await redis_manager.get(key) or {}
+            record.update(fields)
+            await redis_manager.set(key, record, ttl=RECORD_TTL)
+        except Exception as e:
+            logger.error(f"Failed to update job {message_id}: {e}")
+
+    async def _release_claim(self, data: Dict[str, Any]) -> None:
+        message_id: Optional[str] = data.get("message_id")
+        if message_id:
+            await redis_manager.delete(self._claim_key(message_id))
+
+
+job_store = JobStore()
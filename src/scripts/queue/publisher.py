@@ -0,0 +1,284 @@
+import asyncio
+import base64
+import itertools
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set
+
+import aio_pika
+from aio_pika.abc import AbstractChannel
+
+from src.utils.logger import setup_logger
+from src.utils.redis_cache.redis_cache import redis_manager
+
+
+OUTBOX_KEY = "rabbit:outbox"
+
+
+class Publisher:
+    """
+    Публикация сообщений в RabbitMQ через локальный outbox.
+
+    Хэндлер только кладёт сообщение в outbox и сразу получает управление,
+    фоновая задача отправляет пачки сообщений через пул каналов с подтверждениями,
+    ожидая подтверждения всей пачки разом. Очереди объявляются один раз.
+    Пока брокер недоступен, сообщения копятся в памяти, а излишек уходит в Redis.
+    """
+
+    def __init__(
+        self,
+        queue_service,
+        queue_arguments: Dict[str, Any],
+        channels_count: int = 4,
+        batch_size: int = 100,
+        max_outbox: int = 10000,
+    ):
+        self.queue_service = queue_service
+        self.queue_arguments = queue_arguments
+        self.channels_count = channels_count
+        self.batch_size = batch_size
+        self.max_outbox = max_outbox
+        self.logger = setup_logger(__name__)
+
+        self._channels: List[AbstractChannel] = []
+        self._channel_cycle = None
+        self._declared: Set[str] = set()
+        # Пачка публикуется параллельно: очередь объявляет только первая публикация
+        self._declare_locks: Dict[str, asyncio.Lock] = {}
+
+        self._outbox: Deque[Dict[str, Any]] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+        # При старте проверяем, не оставил ли прошлый процесс сообщений в Redis
+        self._has_spilled = True
+
+    def publish(
+        self,
+        queue_name: str,
+        body: bytes,
+        priority: int = 0,
+        content_type: Optional[str] = None,
+        expiration: Optional[float] = None,
+    ) -> None:
+        """Кладёт сообщение в outbox без ожидания брокера"""
+
+        self._outbox.append(
+            {
+                "queue_name": queue_name,
+                "body": base64.b64encode(body).decode(),
+                "priority": priority,
+                "content_type": content_type,
+                "expiration": expiration,
+            }
+        )
+        self._ensure_flusher()
+
+    @property
+    def pending(self) -> int:
+        """Количество сообщений, ещё не подтверждённых брокером"""
+
+        return len(self._outbox)
+
+    def _ensure_flusher(self) -> None:
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+        self._wakeup.set()
+
+    async def _flush_loop(self) -> None:
+        """Фоновая отправка outbox с переподключением и экспоненциальной задержкой"""
+
+        retry_delay = 1
+        await self._restore_spilled()
+
+        while True:
+            if not self._outbox:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+
+            try:
+                await self._open_channels()
+                await self._flush_batch()
+                await self._restore_spilled()
+                retry_delay = 1
+
+            except asyncio.CancelledError:
+                raise
+
+            except Exception as e:
+                self.logger.warning(
+                    f"Publish failed, {len(self._outbox)} messages kept in outbox: {str(e)}"
+                )
+                await self._close_channels()
+                await self._spill_overflow()
+                await asyncio.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, 30)
+
+    async def _open_channels(self) -> None:
+        """Открывает пул каналов с подтверждениями публикации"""
+
+        if self._channels and not any(channel.is_closed for channel in self._channels):
+            return
+
+        connection, _ = await self.queue_service.connect()
+        self._channels = [
+            await connection.channel(publisher_confirms=True)
+            for _ in range(self.channels_count)
+        ]
+        self._channel_cycle = itertools.cycle(self._channels)
+
+    async def _flush_batch(self) -> None:
+        """Отправляет пачку сообщений и ждёт подтверждения всех сразу"""
+
+        batch = [
+            self._outbox.popleft()
+            for _ in range(min(self.batch_size, len(self._outbox)))
+        ]
+        results = await asyncio.gather(
+            *(self._publish_item(item) for item in batch),
+            return_exceptions=True,
+        )
+
+        failed = [
+            item
+            for item, result in zip(batch, results)
+            if isinstance(result, BaseException)
+        ]
+        if failed:
+            self._outbox.extendleft(reversed(failed))
+            raise next(
+                result for result in results if isinstance(result, BaseException)
+            )
+
+        self.logger.debug(f"Published batch of {len(batch)} messages")
+
+    async def publish_confirmed(
+        self,
+        queue_name: str,
+        body: bytes,
+        priority: int = 0,
+        arguments: Optional[Dict[str, Any]] = None,
+        expiration: Optional[float] = None,
+        content_type: Optional[str] = None,
+    ) -> None:
+        """Публикует сообщение напрямую и дожидается подтверждения брокера"""
+
+        await self._open_channels()
+        await self._publish_one(
+            queue_name,
+            body,
+            priority=priority,
+            arguments=arguments,
+            expiration=expiration,
+            content_type=content_type,
+        )
+
+    async def _publish_item(self, item: Dict[str, Any]) -> None:
+        await self._publish_one(
+            item["queue_name"],
+            base64.b64decode(item["body"]),
+            priority=item["priority"],
+            content_type=item.get("content_type"),
+            expiration=item.get("expiration"),
+        )
+
+    async def _publish_one(
+        self,
+        queue_name: str,
+        body: bytes,
+        priority: int = 0,
+        arguments: Optional[Dict[str, Any]] = None,
+        expiration: Optional[float] = None,
+        content_type: Optional[str] = None,
+    ) -> None:
+        channel = next(self._channel_cycle)
+
+        if queue_name not in self._declared:
+            lock = self._declare_locks.setdefault(queue_name, asyncio.Lock())
+            async with lock:
+                if queue_name not in self._declared:
+                    await channel.declare_queue(
+                        queue_name,
+                        arguments=arguments if arguments is not None else self.queue_arguments,
+                    )
+                    self._declared.add(queue_name)
+
+        await channel.default_exchange.publish(
+            aio_pika.Message(
+                body=body,
+                priority=priority,
+                delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+                expiration=expiration,
+                content_type=content_type,
+            ),
+            routing_key=queue_name,
+            timeout=10,
+        )
+
+    async def _spill_overflow(self) -> None:
+        """Переносит излишек outbox в Redis, чтобы не держать его в памяти"""
+
+        if len(self._outbox) <= self.max_outbox:
+            return
+
+        overflow = []
+        while len(self._outbox) > self.max_outbox:
+            overflow.append(self._outbox.pop())
+        overflow.reverse()
+
+        if await redis_manager.push_list(OUTBOX_KEY, *overflow):
+            self._has_spilled = True
+        else:
+            self._outbox.extend(overflow)
+
+    async def _restore_spilled(self) -> None:
+        """Возвращает сообщения, отложенные в Redis, обратно в outbox"""
+
+        free_space = self.max_outbox - len(self._outbox)
+        if not self._has_spilled or free_space <= 0:
+            return
+
+        count = min(free_space, self.batch_size)
+        restored = await redis_manager.pop_list(OUTBOX_KEY, count)
+        self._outbox.extend(restored)
+        self._has_spilled = len(restored) == count
+
+    def reset(self) -> None:
+        """Сбрасывает каналы и кэш объявленных очередей после обрыва соединения"""
+
+        self._channels = []
+        self._channel_cycle = None
+        self._declared.clear()
+
+    async def close(self, timeout: float = 5) -> None:
+        """Дожидается отправки outbox, остаток откладывает в Redis"""
+
+        try:
+            async with asyncio.timeout(timeout):
+                while self._outbox and self._flusher and not self._flusher.done():
+                    await asyncio.sleep(0.05)
+        except TimeoutError:
+            self.logger.warning(f"Outbox not flushed in {timeout}s, spilling to Redis")
+
+        if self._flusher:
+            self._flusher.cancel()
+            self._flusher = None
+
+        if self._outbox:
+            pending = list(self._outbox)
+            self._outbox.clear()
+            if not await redis_manager.push_list(OUTBOX_KEY, *pending):
+                self.logger.error(f"Lost {len(pending)} unpublished messages")
+
+        await self._close_channels()
+
+    async def _close_channels(self) -> None:
+        for channel in self._channels:
+            try:
+                if not channel.is_closed:
+                    await channel.close()
+            except Exception as e:
+                self.logger.warning(f"Error closing publisher channel: {str(e)}")
+        self.reset()
@@ -1,6 +1,6 @@
 import asyncio
 import json
-from datetime import datetime, timezone
+import time
 from typing import Dict, Any, Callable, Optional, Tuple
 
 import aio_pika
@@ -8,19 +8,56 @@ from aio_pika.abc import AbstractIncomingMessage, AbstractChannel, AbstractConne
 
 from src.config.config import settings
 from src.scripts.answer_messages.answer_message import AnswerMessage
+from src.scripts.queue.consumer_pool import (
+    ConsumerPool,
+    DEFAULT_CONCURRENCY,
+    DEFAULT_PREFETCH_COUNT,
+    PoolDrainingError,
+)
+from src.scripts.energy_remover.service import EnergyService
+from src.scripts.queue.deadline import job_deadline, new_deadline, time_left
+from src.scripts.queue.fair_scheduler import DEFAULT_AGING_INTERVAL
+from src.scripts.queue.envelope import (
+    CONTENT_TYPE_JSON,
+    EnvelopeError,
+    build_job,
+    decode,
+    encode,
+)
+from src.scripts.queue.job_store import CLAIMED, DONE, IN_PROGRESS, job_store
+from src.scripts.queue.publisher import Publisher
+from src.scripts.queue.retry import RetryPolicy, is_retryable
 from src.utils.logger import setup_logger
 from src.utils.redis_cache.redis_cache import redis_manager
 
 
+QUEUE_ARGUMENTS = {"x-max-priority": 10}
+RETRY_TEXT = "⏳ Сервис временно перегружен, повторим ваш запрос через несколько секунд..."
+REQUEUE_TEXT = "⏳ Сервис перезапускается, ваш запрос будет выполнен через несколько секунд..."
+EXPIRED_TEXT = "⌛ Запрос ждал слишком долго и был отменён, энергия не списана. Отправьте его ещё раз."
+DEADLINE_TEXT = "⌛ Не удалось получить ответ вовремя, запрос отменён и энергия возвращена. Отправьте его ещё раз."
+# Брокер удаляет задачу сам только с запасом: обычно устаревшую задачу снимает воркер
+# и сообщает об этом пользователю
+BROKER_EXPIRATION_FACTOR = 2
+# Счётчик завершённых задач очереди, по нему бот оценивает скорость разбора очереди
+COMPLETED_KEY = "queue:{queue_name}:completed"
+
+
 class RabbitQueue:
     def __init__(self):
         self.logger = setup_logger(__name__)
         self.message_client = AnswerMessage()
+        self.energy_service = EnergyService()
         self.connection: Optional[AbstractConnection] = None
         self.channel: Optional[AbstractChannel] = None
         self._is_connected = False
-        self._consumers = set()
+        self._pools: Dict[str, ConsumerPool] = {}
         self._initialized = False  # Флаг инициализации очередей
+        self.publisher = Publisher(
+            self,
+            queue_arguments=QUEUE_ARGUMENTS,
+            channels_count=settings.RABBIT_PUBLISH_CHANNELS,
+        )
 
     async def connect(self, retry_count: int = 3, retry_delay: int = 5) -> Tuple[AbstractConnection, AbstractChannel]:
         """Устанавливает соединение с RabbitMQ с возможностью повторных попыток."""
@@ -57,14 +94,15 @@ class RabbitQueue:
             return
 
         try:
-            # Отменяем всех потребителей
-            for consumer_tag in self._consumers:
+            # Отменяем всех потребителей и закрываем их каналы
+            for queue_name, pool in self._pools.items():
                 try:
-                    await self.channel.basic_cancel(consumer_tag)
+                    await pool.close()
                 except Exception as e:
-                    self.logger.warning(f"Error canceling consumer {consumer_tag}: {str(e)}")
+                    self.logger.warning(f"Error closing consumer pool {queue_name}: {str(e)}")
 
-            self._consumers.clear()
+            self._pools.clear()
+            self.publisher.reset()
 
             if self.channel and not self.channel.is_closed:
                 await self.channel.close()
@@ -119,7 +157,7 @@ class RabbitQueue:
 
             queue = await self.channel.declare_queue(
                 queue_name,
-                arguments={"x-max-priority": 10}
+                arguments=QUEUE_ARGUMENTS
             )
             return queue
         except Exception as e:
@@ -134,112 +172,320 @@ class RabbitQueue:
         user_id: int = None,
         answer_message: int = None,
         priority: int = 0,
-        retry_count: int = 3,
+        deadline: Optional[float] = None,
         **kwargs,
-    ) -> None:
-        """Публикует сообщение в очередь с обработкой ошибок и повторными попытками."""
-        attempt = 0
-        last_exception = None
-
-        while attempt < retry_count:
-            attempt += 1
-            try:
-                if not self._is_connected:
-                    await self.connect()
-
-                message_body = json.dumps({
-                    "retry_count": 0,
-                    "type": queue_name,
-                    "message": message,
-                    "answer_message": answer_message,
-                    "user_id": user_id,
-                    "timestamp": datetime.now(timezone.utc).isoformat(),
-                    **kwargs,
-                }).encode()
-
-                queue = await self.declare_queue(queue_name)
-
-                await self.channel.default_exchange.publish(
-                    aio_pika.Message(
-                        body=message_body,
-                        priority=priority,
-                        delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
-                    ),
-                    routing_key=queue_name,
-                    timeout=10
-                )
-
-                self.logger.debug(f"Published message to queue {queue_name}")
-                return
-
-            except Exception as e:
-                last_exception = e
-                self.logger.warning(f"Publish attempt {attempt} failed for queue {queue_name}: {str(e)}")
-                if attempt < retry_count:
-                    await asyncio.sleep(1)
-                    await self.stop()  # Переподключаемся
-
-        error_msg = f"Failed to publish message after {retry_count} attempts"
-        self.logger.error(error_msg)
-        raise RuntimeError(error_msg) from last_exception
+    ) -> Optional[float]:
+        """
+        Ставит сообщение в outbox публикатора, не дожидаясь подтверждения брокера.
+        Возвращает срок ответа задачи: по умолчанию ttl очереди от текущего момента.
+        """
+        job = build_job(
+            queue_name,
+            message=message,
+            user_id=user_id,
+            answer_message=answer_message,
+            deadline=deadline or new_deadline(queue_name),
+            **kwargs,
+        )
+        body, content_type = encode(job, codec=settings.QUEUE_CODEC)
+        ttl = settings.QUEUES.get(queue_name, {}).get("ttl")
+
+        self.publisher.publish(
+            queue_name,
+            body,
+            priority=priority,
+            content_type=content_type,
+            expiration=ttl * BROKER_EXPIRATION_FACTOR if ttl else None,
+        )
+        self.logger.debug(f"Queued message for {queue_name}")
+        return job.deadline
 
     async def consume_messages(
         self,
         queue_name: str,
         callback: Callable,
-        prefetch_count: int = 100,
+        prefetch_count: Optional[int] = None,
+        concurrency: Optional[int] = None,
     ) -> None:
-        """Запускает потребителя для очереди с обработкой ошибок."""
+        """Запускает потребителя очереди на отдельном канале со своим prefetch и лимитом параллельности."""
         try:
             if not self._is_connected:
                 await self.connect()
 
-            await self.channel.set_qos(prefetch_count=prefetch_count)
-            queue = await self.declare_queue(queue_name)
+            queue_config = settings.QUEUES.get(queue_name, {})
+            if prefetch_count is None:
+                prefetch_count = queue_config.get("prefetch_count", DEFAULT_PREFETCH_COUNT)
+            if concurrency is None:
+                concurrency = queue_config.get("concurrency", DEFAULT_CONCURRENCY)
+
+            channel = await self.connection.channel()
+            await channel.set_qos(prefetch_count=prefetch_count)
+            queue = await channel.declare_queue(
+                queue_name,
+                arguments=QUEUE_ARGUMENTS
+            )
+
+            pool = ConsumerPool(
+                queue_name=queue_name,
+                channel=channel,
+                prefetch_count=prefetch_count,
+                concurrency=concurrency,
+                aging_interval=queue_config.get("aging_interval", DEFAULT_AGING_INTERVAL),
+            )
+            retry_policy = RetryPolicy.for_queue(queue_name)
+            job_ttl = queue_config.get("ttl")
 
             async def process_message(message: AbstractIncomingMessage) -> None:
-                try:
-                    body = json.loads(message.body.decode())
+                with pool.track():
                     try:
-                        await callback(body)
-                        await message.ack()
-                        
-                        await self._key_delete_or_remove(
-                            body.get("key", f"{body.get('user_id')}:generate")
-                        )
+                        # Схема проверяется один раз здесь, колбэк получает готовый словарь
+                        body = decode(message.body, message.content_type).to_dict()
+                        # Приоритет нужен колбэкам для очереди к лимитеру провайдера
+                        body["priority"] = message.priority or 0
+                        try:
+                            async with pool.slot(body.get("user_id"), message.priority or 0):
+                                status = await job_store.claim(body)
+                                if status == CLAIMED and self._is_expired(body, job_ttl):
+                                    await self._expire(queue_name, body)
+                                elif status == CLAIMED:
+                                    await self._run_until_deadline(
+                                        queue_name, body, callback, job_ttl
+                                    )
+
+                            if status == IN_PROGRESS:
+                                await self._defer(queue_name, message, retry_policy)
+                                return
+
+                            await message.ack()
+                            if status == DONE:
+                                self.logger.info(
+                                    f"Skipped duplicate delivery of {body['message_id']} from {queue_name}"
+                                )
+                                return
+
+                            await redis_manager.incr(COMPLETED_KEY.format(queue_name=queue_name))
+
+                            await self._key_delete_or_remove(
+                                body.get("key", f"{body.get('user_id')}:generate")
+                            )
+                        except (asyncio.CancelledError, PoolDrainingError):
+                            await self._requeue(message, body)
+                        except Exception as e:
+                            await self._handle_failure(queue_name, message, body, e, retry_policy)
+                    except EnvelopeError as e:
+                        await message.reject(requeue=False)
+                        self.logger.error(f"Invalid message in {queue_name}: {str(e)}")
                     except Exception as e:
-                        await message.nack(requeue=False)
-                        self.logger.error(f"Error processing message: {str(e)}")
-                        
-                        body["text"] = "Ошибка при отправке запроса"
-                        await self.message_client.answer_message(body)
-                        
-                        await self.publish_message(
-                            f"{queue_name}_errors",
-                            message=body["message"],
-                            answer_message=body["answer_message"],
-                            user_id=body["user_id"],
-                        )
-                        
-                        await self._key_delete_or_remove(
-                            body.get("key", f"{body.get('user_id')}:generate")
-                        )
-                except json.JSONDecodeError as e:
-                    await message.reject(requeue=False)
-                    self.logger.error(f"Invalid JSON in message: {str(e)}")
-                except Exception as e:
-                    await message.reject(requeue=False)
-                    self.logger.error(f"Unexpected error in message processing: {str(e)}")
-
-            consumer_tag = await queue.consume(process_message)
-            self._consumers.add(consumer_tag)
-            self.logger.info(f"Started consuming messages from {queue_name}")
+                        await message.reject(requeue=False)
+                        self.logger.error(f"Unexpected error in message processing: {str(e)}")
+
+            pool.queue = queue
+            pool.consumer_tag = await queue.consume(process_message)
+            self._pools[queue_name] = pool
+            self.logger.info(
+                f"Started consuming messages from {queue_name} "
+                f"(prefetch={prefetch_count}, concurrency={concurrency})"
+            )
 
         except Exception as e:
             self.logger.error(f"Error setting up consumer for {queue_name}: {str(e)}")
             await self.stop()
             raise
 
+    async def _requeue(
+        self, message: AbstractIncomingMessage, body: Dict[str, Any]
+    ) -> None:
+        """Возвращает прерванную при остановке задачу в очередь, не списывая энергию дважды."""
+        await self.energy_service.refund(body)
+        await job_store.release(body)
+
+        try:
+            await message.nack(requeue=True)
+        except Exception as e:
+            # При закрытии канала брокер сам вернёт неподтверждённое сообщение
+            self.logger.warning(f"Failed to requeue message: {str(e)}")
+
+        await self.message_client.edit_message(body, REQUEUE_TEXT)
+
+    @staticmethod
+    def _is_expired(body: Dict[str, Any], ttl: Optional[float]) -> bool:
+        """Срок задачи уже прошёл (готовый ответ прошлой попытки всё равно отправляем)"""
+        if body.get("result"):
+            return False
+        deadline = job_deadline(body, ttl)
+        return deadline is not None and time.time() > deadline
+
+    async def _run_until_deadline(
+        self,
+        queue_name: str,
+        body: Dict[str, Any],
+        callback: Callable,
+        ttl: Optional[float],
+    ) -> None:
+        """Выполняет задачу не дольше её срока, по истечении отменяет вместе с вызовом провайдера."""
+        timeout = asyncio.timeout(None if body.get("result") else time_left(body, ttl))
+        try:
+            async with job_store.hold(body):
+                async with timeout:
+                    await callback(body)
+        except TimeoutError:
+            if not timeout.expired():
+                raise
+            await self._expire(queue_name, body, DEADLINE_TEXT)
+            return
+
+        await job_store.complete(body)
+
+    async def _expire(
+        self, queue_name: str, body: Dict[str, Any], text: str = EXPIRED_TEXT
+    ) -> None:
+        """Снимает устаревшую задачу: возвращает энергию и сообщает пользователю."""
+        self.logger.warning(
+            f"Dropping expired message from {queue_name}, "
+            f"age {time.time() - body['timestamp']:.0f}s"
+        )
+        await self.energy_service.refund(body)
+        await job_store.fail(body, TimeoutError("job expired"))
+        await self.message_client.edit_message(body, text)
+
+    async def _defer(
+        self,
+        queue_name: str,
+        message: AbstractIncomingMessage,
+        retry_policy: RetryPolicy,
+    ) -> None:
+        """
+        Задачу ещё выполняет другой воркер (например, доставка повторилась после
+        переподключения к брокеру) - откладываем её на первую ступень повтора.
+        Если тот воркер умер, его захват истечёт и задача продолжится с контрольной точки.
+        """
+        self.logger.info(f"Message from {queue_name} is claimed by another worker, deferring")
+
+        if retry_policy.max_retries:
+            retry_queue, arguments = retry_policy.tier_queue(queue_name, 0)
+            try:
+                await self.publisher.publish_confirmed(
+                    retry_queue,
+                    message.body,
+                    priority=message.priority or 0,
+                    arguments=arguments,
+                    expiration=retry_policy.next_delay(0),
+                    content_type=message.content_type,
+                )
+                await message.ack()
+                return
+            except Exception as e:
+                self.logger.error(f"Failed to defer message from {queue_name}: {str(e)}")
+
+        await asyncio.sleep(1)
+        await message.nack(requeue=True)
+
+    async def drain(self, timeout: float) -> None:
+        """Плавная остановка: не берёт новые сообщения, ждёт текущие задачи, остальные возвращает в очередь."""
+        for queue_name, pool in self._pools.items():
+            try:
+                await pool.stop_consuming()
+            except Exception as e:
+                self.logger.warning(f"Error stopping consumer {queue_name}: {str(e)}")
+
+        tasks = set().union(*(pool.tasks for pool in self._pools.values()))
+        if tasks:
+            self.logger.info(f"Draining {len(tasks)} in-flight messages (timeout {timeout}s)")
+            _, pending = await asyncio.wait(tasks, timeout=timeout)
+
+            if pending:
+                self.logger.warning(f"Requeueing {len(pending)} unfinished messages")
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        await self.publisher.close()
+        await self.stop()
+
+    async def _handle_failure(
+        self,
+        queue_name: str,
+        message: AbstractIncomingMessage,
+        body: Dict[str, Any],
+        error: Exception,
+        retry_policy: RetryPolicy,
+    ) -> None:
+        """
+        Откладывает задачу на повтор, а исчерпавшую попытки отправляет в очередь ошибок.
+        Фоновые задачи без пользователя (сжатие диалога) только логируются, их блокировка снимается.
+        """
+        self.logger.error(f"Error processing message from {queue_name}: {str(error)}")
+
+        # Списанная энергия возвращается: повтор спишет её заново
+        await self.energy_service.refund(body)
+
+        retry_count = body.get("retry_count", 0)
+        delay = retry_policy.next_delay(retry_count) if is_retryable(error) else None
+        # Колбэки дописывают в body свои поля, поэтому дальше работаем с исходной задачей
+        original = decode(message.body, message.content_type)
+
+        if delay is not None:
+            original.retry_count = retry_count + 1
+            retry_body, content_type = encode(original, codec=settings.QUEUE_CODEC)
+            retry_queue, arguments = retry_policy.tier_queue(queue_name, retry_count)
+            try:
+                await self.publisher.publish_confirmed(
+                    retry_queue,
+                    retry_body,
+                    priority=message.priority or 0,
+                    arguments=arguments,
+                    expiration=delay,
+                    content_type=content_type,
+                )
+                await job_store.release(body)
+                await message.ack()
+                await self.message_client.edit_message(body, RETRY_TEXT)
+                self.logger.warning(
+                    f"Message from {queue_name} scheduled for retry "
+                    f"{retry_count + 1}/{retry_policy.max_retries} in {delay:.1f}s"
+                )
+                return
+            except Exception as e:
+                self.logger.error(f"Failed to schedule retry for {queue_name}: {str(e)}")
+
+        await job_store.fail(body, error)
+        await message.nack(requeue=False)
+        await redis_manager.incr(COMPLETED_KEY.format(queue_name=queue_name))
+
+        if body.get("user_id") is not None:
+            body["text"] = "Ошибка при отправке запроса"
+            await self.message_client.answer_message(body)
+
+        # В очереди ошибок JSON, чтобы сообщения было удобно читать в панели RabbitMQ
+        error_body = {**original.to_dict(), "error": str(error)}
+        self.publisher.publish(
+            f"{queue_name}_errors",
+            json.dumps(error_body).encode(),
+            content_type=CONTENT_TYPE_JSON,
+        )
+
+        await self._key_delete_or_remove(
+            body.get("key", f"{body.get('user_id')}:generate")
+        )
+
+    async def queue_depth(self, queue_name: str) -> Tuple[int, int]:
+        """Количество сообщений и потребителей очереди (пассивное объявление, очередь не создаётся)."""
+        if not self._is_connected:
+            await self.connect()
+
+        channel = await self.connection.channel()
+        try:
+            queue = await channel.declare_queue(queue_name, passive=True)
+            result = queue.declaration_result
+            return result.message_count, result.consumer_count
+        finally:
+            if not channel.is_closed:
+                await channel.close()
+
+    def get_pool_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Возвращает количество задач в работе по каждому пулу потребителей."""
+        return {queue_name: pool.stats() for queue_name, pool in self._pools.items()}
+
     async def _key_delete_or_remove(self, key: str) -> None:
         """Удаляет или обновляет ключ в Redis."""
         try:
@@ -293,6 +539,7 @@ class RabbitQueue:
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.publisher.close()
         await self.stop()
 
 
@@ -0,0 +1,88 @@
+import asyncio
+import random
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+import anthropic
+import openai
+
+from src.config.config import settings
+from src.scripts.credentials.service import CREDENTIAL_ERROR_STATUSES, credential_pools
+
+
+DEFAULT_RETRY_JITTER = 0.2
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+class RetryableError(Exception):
+    """Временная ошибка провайдера, запрос стоит повторить позже"""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Можно ли повторить задачу после этой ошибки"""
+
+    if isinstance(error, RetryableError):
+        return True
+
+    if isinstance(error, (openai.APIConnectionError, anthropic.APIConnectionError)):
+        return True
+
+    if isinstance(error, (openai.APIStatusError, anthropic.APIStatusError)):
+        if (
+            getattr(error, "code", None) == "insufficient_quota"
+            or error.status_code in CREDENTIAL_ERROR_STATUSES
+        ):
+            # Ключ уже в карантине: повтор поможет, только если есть другой ключ
+            provider = "openai" if isinstance(error, openai.APIStatusError) else "anthropic"
+            return credential_pools.get(provider).available
+        return error.status_code in RETRYABLE_STATUS_CODES
+
+    return isinstance(error, (aiohttp.ClientConnectionError, asyncio.TimeoutError))
+
+
+class RetryPolicy:
+    """
+    Отложенные повторы через очереди с TTL.
+
+    Задача публикуется в очередь ступени `{queue}_retry_{delay}s` без потребителей,
+    по истечении TTL RabbitMQ возвращает её в исходную очередь через dead-letter.
+    """
+
+    def __init__(self, delays: List[float], jitter: float = DEFAULT_RETRY_JITTER):
+        self.delays = delays
+        self.jitter = jitter
+
+    @classmethod
+    def for_queue(cls, queue_name: str) -> "RetryPolicy":
+        queue_config = settings.QUEUES.get(queue_name, {})
+        return cls(
+            delays=queue_config.get("retry_delays", []),
+            jitter=queue_config.get("retry_jitter", DEFAULT_RETRY_JITTER),
+        )
+
+    @property
+    def max_retries(self) -> int:
+        return len(self.delays)
+
+    def next_delay(self, retry_count: int) -> Optional[float]:
+        """Задержка перед следующей попыткой или None, если попытки исчерпаны"""
+
+        if retry_count >= self.max_retries:
+            return None
+
+        delay = self.delays[retry_count]
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def tier_queue(
+        self, queue_name: str, retry_count: int
+    ) -> Tuple[str, Dict[str, Any]]:
+        """Имя и аргументы очереди ступени повтора"""
+
+        delay = self.delays[retry_count]
+        arguments = {
+            # TTL очереди ограничивает задержку сверху, джиттер задаётся на сообщении
+            "x-message-ttl": int(delay * (1 + self.jitter) * 1000),
+            "x-dead-letter-exchange": "",
+            "x-dead-letter-routing-key": queue_name,
+        }
+        return f"{queue_name}_retry_{delay}s", arguments
@@ -0,0 +1,152 @@
+import asyncio
+import multiprocessing
+import signal
+import time
+from dataclasses import dataclass
+from typing import Iterable, List, Optional
+
+from src.config.config import settings
+from src.utils.logger import setup_logger
+
+
+logger = setup_logger(__name__)
+
+MAX_RESTART_DELAY = 60
+# Процесс, проработавший дольше, считается здоровым и сбрасывает задержку
+HEALTHY_UPTIME = 60
+
+
+def run_worker_process(group: str, queues: List[str], processes: int = 1) -> None:
+    """
+    Точка входа дочернего процесса: свой event loop и свой QueueWorker.
+    processes - размер группы, между ними делятся лимиты settings.RATE_LIMITS
+    """
+
+    settings.WORKER_GROUP_PROCESSES = processes
+    asyncio.run(_serve(group, queues))
+
+
+async def _serve(group: str, queues: List[str]) -> None:
+    from src.scripts.queue.worker import QueueWorker
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    worker = QueueWorker()
+    await worker.start(queues=queues)
+    logger.info(f"Worker process for group {group} started: {', '.join(queues)}")
+
+    await stop_event.wait()
+    await worker.stop()
+
+
+@dataclass
+class WorkerSlot:
+    """Слот супервизора: один дочерний процесс группы очередей"""
+
+    group: str
+    queues: List[str]
+    index: int
+    process: Optional[multiprocessing.Process] = None
+    started_at: float = 0
+    restart_at: float = 0
+    failures: int = 0
+
+    @property
+    def name(self) -> str:
+        return f"worker-{self.group}-{self.index}"
+
+
+class WorkerSupervisor:
+    """
+    Запускает воркеры очередей в отдельных процессах по группам из settings.WORKER_GROUPS
+    и перезапускает упавшие процессы с экспоненциальной задержкой.
+    """
+
+    def __init__(self, groups: Optional[Iterable[str]] = None, poll_interval: float = 1):
+        worker_groups = settings.WORKER_GROUPS
+        selected = list(groups) if groups else list(worker_groups)
+
+        self.poll_interval = poll_interval
+        self.context = multiprocessing.get_context("spawn")
+        self.slots: List[WorkerSlot] = [
+            WorkerSlot(group=group, queues=worker_groups[group]["queues"], index=index)
+            for group in selected
+            for index in range(worker_groups[group]["processes"])
+        ]
+        self._stopping = False
+
+    def run(self) -> None:
+        """Основной цикл супервизора, работает до SIGTERM/SIGINT"""
+
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+
+        logger.info(f"Supervisor starting {len(self.slots)} worker processes")
+
+        while not self._stopping:
+            now = time.monotonic()
+            for slot in self.slots:
+                self._check_slot(slot, now)
+            time.sleep(self.poll_interval)
+
+        self._shutdown()
+
+    def _request_stop(self, signum, frame) -> None:
+        self._stopping = True
+
+    def _check_slot(self, slot: WorkerSlot, now: float) -> None:
+        if slot.process is not None:
+            if slot.process.is_alive():
+                if slot.failures and now - slot.started_at > HEALTHY_UPTIME:
+                    slot.failures = 0
+                return
+
+            logger.error(
+                f"{slot.name} exited with code {slot.process.exitcode}, "
+                f"restart #{slot.failures + 1}"
+            )
+            slot.process.close()
+            slot.process = None
+            slot.restart_at = now + min(2**slot.failures, MAX_RESTART_DELAY)
+            slot.failures += 1
+
+        if now >= slot.restart_at:
+            self._start(slot, now)
+
+    def _start(self, slot: WorkerSlot, now: float) -> None:
+        slot.process = self.context.Process(
+            target=run_worker_process,
+            args=(slot.group, slot.queues, self._group_size(slot.group)),
+            name=slot.name,
+        )
+        slot.process.start()
+        slot.started_at = now
+        logger.info(f"{slot.name} started with pid {slot.process.pid}")
+
+    def _group_size(self, group: str) -> int:
+        return sum(1 for slot in self.slots if slot.group == group)
+
+    def _shutdown(self, timeout: float = None) -> None:
+        """Останавливает дочерние процессы, давая им время завершить задачи"""
+
+        if timeout is None:
+            timeout = settings.WORKER_SHUTDOWN_TIMEOUT
+
+        processes = [slot.process for slot in self.slots if slot.process]
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+        deadline = time.monotonic() + timeout
+        for process in processes:
+            process.join(max(0, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.warning(f"{process.name} did not stop in {timeout}s, killing")
+                process.kill()
+                process.join()
+
+        logger.info("Supervisor stopped")
+
@@ -1,30 +1,57 @@
+from typing import Iterable, Optional
+
+from src.config.config import settings
 from src.scripts.answer_messages.answer_message import AnswerMessage
-from src.scripts.antropic.claude_gpt import ClaudeGPT
-from src.scripts.chat_gpt.chat_gpt import ChatGPT
+from src.scripts.circuit_breaker.router import TextRouter
 from src.scripts.midjourney.service import MidjourneyService
+from src.scripts.providers.service import ProviderRegistry, TextService
 from src.utils.logger import setup_logger
 from src.scripts.queue.rabbit_queue import RabbitQueue
+from src.scripts.summarizer.service import DialogSummarizer
+from src.utils.http_client import http_client
 
 
 class QueueWorker:
     def __init__(self):
         self.queue_service = RabbitQueue()
 
-        self.claude = ClaudeGPT()
-        self.chat_gpt = ChatGPT()
+        # Сжатие диалогов публикуется через очередь воркера, чтобы drain отправил и его
+        self.summarizer = DialogSummarizer(self.queue_service)
+        # Провайдер модели выбирается по settings.TEXT_GPT
+        self.providers = ProviderRegistry()
+        self.text_service = TextService(self.providers, summarizer=self.summarizer)
         self.midjourney = MidjourneyService()
 
         self.message_service = AnswerMessage()
+        # Модели с разомкнутым выключателем подменяются запасными
+        self.text_router = TextRouter(self.text_service.send_message, self.message_service)
 
         self.logger = setup_logger(__name__)
 
-    async def start(self):
-        """Запуск воркера"""
+    @property
+    def handlers(self):
+        """Обработчики очередей"""
+
+        return {
+            "gpt_assistant": self.text_service.send_message_assistant,
+            "chatgpt": self.text_router.send_message,
+            "claude": self.text_router.send_message,
+            # Миджорни
+            "midjourney": self.midjourney.generate_photo,
+            "refresh_midjourney": self.midjourney.refresh_generate,
+            "upscale_midjourney": self.midjourney.upscale_photo,
+            "variation_midjourney": self.midjourney.vary_photo,
+            "referral": self.message_service.send_referral_message,
+            "dialog_summary": self.summarizer.compact,
+        }
+
+    async def start(self, queues: Optional[Iterable[str]] = None):
+        """Запуск воркера (по умолчанию на всех очередях)"""
 
         try:
             await self.queue_service.connect()
 
-            queues = [
+            declared = [
                 "gpt_assistant",
                 "chatgpt",
                 "claude",
@@ -34,50 +61,34 @@ class QueueWorker:
                 "select_midjourney",
                 "variation_midjourney",
                 "referral",
+                "dialog_summary",
             ]
-            for queue_name in queues:
+            for queue_name in declared:
                 await self.queue_service.declare_queue(queue_name)
                 await self.queue_service.declare_queue(f"{queue_name}_errors")
 
-            await self.queue_service.consume_messages(
-                "gpt_assistant",
-                self.chat_gpt.send_message_assistant
-            )
-
-            await self.queue_service.consume_messages(
-                "chatgpt",
-                self.chat_gpt.send_message,
-            )
-
-            await self.queue_service.consume_messages(
-                "claude",
-                self.claude.send_message,
-            )
-
-            await self.queue_service.consume_messages(
-                "midjourney",
-                self.midjourney.generate_photo,
-            )
-
-            await self.queue_service.consume_messages(
-                "referral",
-                self.message_service.send_referral_message,
-            )
-
-            await self.queue_service.consume_messages(
-                "refresh_midjourney", self.midjourney.refresh_generate
-            )
-
-            await self.queue_service.consume_messages(
-                "upscale_midjourney", self.midjourney.upscale_photo
-            )
-
-            await self.queue_service.consume_messages(
-                "variation_midjourney", self.midjourney.vary_photo
-            )
+            # Каждая очередь получает свой канал, prefetch и лимит параллельности
+            # из settings.QUEUES, поэтому медленный Midjourney не душит текстовые модели
+            selected = set(queues) if queues is not None else set(self.handlers)
+            for queue_name, callback in self.handlers.items():
+                if queue_name in selected:
+                    await self.queue_service.consume_messages(queue_name, callback)
 
             self.logger.info("queue worker started successfully")
 
         except Exception as e:
             self.logger.error(f"Error starting parsing worker: {e}")
             raise
+
+    async def stop(self):
+        """Остановка воркера: дожидается текущих задач, остальные возвращает в очередь"""
+
+        await self.queue_service.drain(timeout=settings.WORKER_DRAIN_TIMEOUT)
+        # Общие соединения закрываются после того, как текущие задачи доработали
+        await http_client.close()
+        self.logger.info("queue worker stopped")
+
+    def get_stats(self):
+        """Количество задач в работе по каждой очереди"""
+
+        return self.queue_service.get_pool_stats()
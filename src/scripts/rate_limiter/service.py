@@ -0,0 +1,368 @@
+import asyncio
+import heapq
+import itertools
+import json
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Iterable, List, Mapping, Optional, Tuple
+
+import httpx
+
+from src.config.config import settings
+from src.scripts.circuit_breaker.service import circuit_breakers
+from src.scripts.credentials.service import credential_pools
+from src.utils.logger import setup_logger
+from src.utils.token_counter import count_tokens
+
+
+logger = setup_logger(__name__)
+
+# После 429 лимит параллельности уменьшается не чаще раза в это время:
+# ответы запросов, ушедших до снижения, не должны снижать его повторно
+DECREASE_COOLDOWN = 2.0
+DECREASE_FACTOR = 0.5
+# 529 - перегрузка Anthropic, реагируем на неё так же, как на 429
+THROTTLE_STATUS_CODES = {429, 529}
+# Пауза после 429, если провайдер не прислал retry-after
+DEFAULT_RETRY_AFTER = 1.0
+
+# Заголовки лимитов: (лимит запросов, остаток запросов, лимит токенов, остаток токенов)
+RATE_LIMIT_HEADERS = {
+    "openai": (
+        "x-ratelimit-limit-requests",
+        "x-ratelimit-remaining-requests",
+        "x-ratelimit-limit-tokens",
+        "x-ratelimit-remaining-tokens",
+    ),
+    "anthropic": (
+        "anthropic-ratelimit-requests-limit",
+        "anthropic-ratelimit-requests-remaining",
+        "anthropic-ratelimit-tokens-limit",
+        "anthropic-ratelimit-tokens-remaining",
+    ),
+}
+
+
+def _number(headers: Mapping[str, str], name: Optional[str]) -> Optional[float]:
+    if not name:
+        return None
+    try:
+        return float(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def estimate_tokens(texts: Iterable[Optional[str]], max_tokens: int) -> int:
+    """Сколько токенов запрос займёт в минутном бюджете: провайдеры резервируют и max_tokens ответа"""
+
+    return sum(count_tokens(text) for text in texts) + max_tokens
+
+
+def retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """Пауза из retry-after-ms / retry-after (в секундах)"""
+
+    milliseconds = _number(headers, "retry-after-ms")
+    if milliseconds is not None:
+        return milliseconds / 1000
+    return _number(headers, "retry-after")
+
+
+class TokenBucket:
+    """Бюджет на минуту, пополняется равномерно; capacity None - без ограничения"""
+
+    def __init__(self, per_minute: Optional[float]):
+        self.capacity = per_minute
+        self.level = per_minute or 0
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        if self.capacity:
+            self.level = min(
+                self.capacity, self.level + (now - self.updated) * self.capacity / 60
+            )
+        self.updated = now
+
+    def delay(self, amount: float, now: float) -> float:
+        """Через сколько секунд в бюджете будет amount"""
+
+        if not self.capacity or not amount:
+            return 0
+        self._refill(now)
+        # Запрос больше всего бюджета ждёт полного бюджета, а не вечно
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) * 60 / self.capacity)
+
+    def take(self, amount: float, now: float) -> None:
+        if self.capacity:
+            self._refill(now)
+            self.level -= amount
+
+    def update(self, limit: Optional[float], remaining: Optional[float], now: float) -> None:
+        """Подстраивает бюджет под лимиты из ответа провайдера"""
+
+        if limit:
+            if not self.capacity:
+                self.level = limit
+            self.capacity = limit
+        if remaining is not None and self.capacity:
+            self._refill(now)
+            self.level = min(self.level, remaining)
+
+
+class RateLimiter:
+    """
+    Лимитер запросов к одной модели провайдера.
+
+    Запрос ждёт свободного места в бюджетах запросов и токенов на минуту и
+    в лимите параллельности. Лимит параллельности подбирается по AIMD: каждый
+    успешный ответ немного увеличивает его, 429 - уменьшает вдвое и ставит
+    паузу по retry-after. Бюджеты уточняются по заголовкам лимитов провайдера.
+    Ожидающие запросы получают место в порядке приоритета, внутри - по очереди.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rpm: Optional[float] = None,
+        tpm: Optional[float] = None,
+        max_concurrency: int = 10,
+        min_concurrency: int = 1,
+    ):
+        self.name = name
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+
+        # (-приоритет, порядковый номер, токены, future)
+        self._waiters: List[Tuple[int, int, float, asyncio.Future]] = []
+        self._counter = itertools.count()
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for *_, future in self._waiters if not future.done())
+
+    @asynccontextmanager
+    async def acquire(self, tokens: float = 0, priority: int = 0) -> AsyncIterator[None]:
+        """Место для одного запроса на время блока"""
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (-(priority or 0), next(self._counter), tokens, future))
+        self._dispatch()
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Место уже выдано, но запрос отменили - отдаём его следующему
+                self._release()
+            else:
+                future.cancel()
+            raise
+
+        try:
+            yield
+        finally:
+            self._release()
+
+    def observe(
+        self,
+        status: int,
+        headers: Mapping[str, str],
+        provider: str = None,
+        scale: float = 1,
+    ) -> None:
+        """
+        Учитывает ответ провайдера: код ответа и заголовки лимитов.
+        Заголовки описывают один ключ, scale - сколько ключей в работе на долю процесса.
+        """
+
+        now = time.monotonic()
+        if status in THROTTLE_STATUS_CODES:
+            self.on_rate_limited(retry_after(headers))
+        elif status < 400 and self._can_increase(now):
+            self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+
+        names = RATE_LIMIT_HEADERS.get(provider)
+        if names:
+            values = [_number(headers, name) for name in names]
+            values = [value * scale if value is not None else None for value in values]
+            self.requests.update(values[0], values[1], now)
+            self.tokens.update(values[2], values[3], now)
+
+        self._dispatch()
+
+    def _can_increase(self, now: float) -> bool:
+        """
+        Лимит растёт, только если в него упираются, и не сразу после 429: ответы
+        запросов, отправленных до снижения, ещё ничего не говорят о новом лимите
+        """
+
+        return (
+            self.in_flight >= int(self.limit)
+            and now - self._last_decrease >= DECREASE_COOLDOWN
+        )
+
+    def on_rate_limited(self, delay: Optional[float] = None) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease >= DECREASE_COOLDOWN:
+            self.limit = max(self.min_concurrency, self.limit * DECREASE_FACTOR)
+            self._last_decrease = now
+            logger.warning(f"{self.name}: rate limited, concurrency lowered to {self.limit:.1f}")
+
+        self._paused_until = max(self._paused_until, now + (delay or DEFAULT_RETRY_AFTER))
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        now = time.monotonic()
+        while self._waiters:
+            _, _, tokens, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+
+            if self.in_flight >= max(self.min_concurrency, int(self.limit)):
+                return
+
+            delay = max(
+                self._paused_until - now,
+                self.requests.delay(1, now),
+                self.tokens.delay(tokens, now),
+            )
+            if delay > 0:
+                self._schedule(delay)
+                return
+
+            heapq.heappop(self._waiters)
+            self.requests.take(1, now)
+            self.tokens.take(tokens, now)
+            self.in_flight += 1
+            future.set_result(None)
+
+    def _schedule(self, delay: float) -> None:
+        loop = asyncio.get_running_loop()
+        when = loop.time() + delay
+        if self._timer and not self._timer.cancelled() and self._timer.when() <= when:
+            return
+        if self._timer:
+            self._timer.cancel()
+        self._timer = loop.call_at(when, self._on_timer)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._dispatch()
+
+
+class RateLimiterRegistry:
+    """Лимитеры по провайдеру и модели с настройками из settings.RATE_LIMITS"""
+
+    def __init__(self):
+        self._limiters: Dict[Tuple[str, Optional[str]], RateLimiter] = {}
+
+    def get(self, provider: str, model: Optional[str] = None) -> RateLimiter:
+        key = (provider, model)
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            config = settings.RATE_LIMITS.get(provider, {})
+            # Лимиты в настройках - на один ключ и на всю группу процессов
+            share = max(len(credential_pools.get(provider)), 1) / _group_processes()
+            limiter = RateLimiter(
+                name=f"{provider}:{model or 'default'}",
+                rpm=config["rpm"] * share if config.get("rpm") else None,
+                tpm=config["tpm"] * share if config.get("tpm") else None,
+                max_concurrency=max(int(config.get("concurrency", 10) * share), 1),
+            )
+            self._limiters[key] = limiter
+        return limiter
+
+    def slot(
+        self,
+        provider: str,
+        model: Optional[str] = None,
+        tokens: float = 0,
+        priority: int = 0,
+    ):
+        """async with rate_limiter.slot(...) - место для одного запроса к модели"""
+
+        return self.get(provider, model).acquire(tokens=tokens, priority=priority)
+
+    def observe(
+        self,
+        provider: str,
+        model: Optional[str],
+        status: int,
+        headers: Mapping[str, str],
+    ) -> None:
+        self.get(provider, model).observe(
+            status,
+            headers,
+            provider=provider,
+            scale=credential_pools.get(provider).healthy_count() / _group_processes(),
+        )
+
+    def event_hooks(self, provider: str) -> Dict[str, list]:
+        """
+        Хуки httpx для клиентов SDK: ключ из пула на каждый запрос, а лимитер и
+        выключатели учатся на каждом ответе, включая повторы самого SDK
+        """
+
+        async def on_request(request: httpx.Request) -> None:
+            request.extensions["started_at"] = time.monotonic()
+
+        async def on_response(response: httpx.Response) -> None:
+            body = _request_json(response.request)
+            model = body.get("model")
+            self.observe(provider, model, response.status_code, response.headers)
+
+            # Время до заголовков ответа. Для стрима это время до первого токена,
+            # без стрима - вся генерация, и длинный ответ не значит, что модель тормозит
+            started_at = response.request.extensions.get("started_at")
+            streamed = bool(body.get("stream"))
+            await circuit_breakers.record(
+                provider,
+                model,
+                failed=response.status_code >= 500,
+                duration=time.monotonic() - started_at if started_at and streamed else 0,
+            )
+
+        hooks = credential_pools.get(provider).httpx_hooks()
+        hooks["request"].append(on_request)
+        hooks["response"].append(on_response)
+        return hooks
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            limiter.name: {
+                "limit": round(limiter.limit, 1),
+                "in_flight": limiter.in_flight,
+                "waiting": limiter.waiting,
+            }
+            for limiter in self._limiters.values()
+        }
+
+
+def _group_processes() -> int:
+    """Сколько процессов группы воркера делят лимиты провайдера"""
+
+    return max(settings.WORKER_GROUP_PROCESSES, 1)
+
+
+def _request_json(request: httpx.Request) -> Dict[str, Any]:
+    """JSON-тело запроса (у multipart и GET его нет)"""
+
+    try:
+        body = json.loads(request.content)
+    except Exception:
+        return {}
+    return body if isinstance(body, dict) else {}
+
+
+rate_limiter = RateLimiterRegistry()
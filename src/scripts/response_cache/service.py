@@ -0,0 +1,134 @@
+import hashlib
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+from src.config.config import settings
+from src.db.enums_class import MessageRole
+from src.db.models import Message
+from src.utils.logger import setup_logger
+from src.utils.redis_cache.redis_cache import redis_manager
+
+
+ENTRY_KEY = "response_cache:{version}:{digest}"
+# Время последнего обращения к записям модели, по нему вытесняются самые старые
+INDEX_KEY = "response_cache:{version}:index"
+METRICS_KEY = "metrics:response_cache"
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Запросы, отличающиеся только регистром и пробелами, считаются одинаковыми"""
+
+    return re.sub(r"\s+", " ", prompt).strip().casefold()
+
+
+class ResponseCache:
+    """
+    Кэш ответов на первое сообщение нового диалога.
+
+    Многие диалоги начинаются с одинаковых шаблонных запросов, ответ на них
+    берётся из Redis вместо вызова модели. Кэш включается для модели ключом
+    response_cache в settings.TEXT_GPT и работает только без истории: нет
+    краткого содержания и в диалоге одно сообщение пользователя. Запись живёт
+    RESPONSE_CACHE_TTL, на модель хранится не больше RESPONSE_CACHE_MAX_ENTRIES
+    записей - лишние вытесняются по давности последнего обращения.
+    Энергия списывается как обычно, попадания и сэкономленные байты ответа
+    считаются в metrics:response_cache.
+    """
+
+    def __init__(self):
+        self.logger = setup_logger(__name__)
+
+    @staticmethod
+    def enabled(version: str) -> bool:
+        return bool(settings.TEXT_GPT.get(version, {}).get("response_cache"))
+
+    def _digest(self, version: str, summary: Optional[str], messages: List[Message]) -> Optional[str]:
+        """Ключ запроса или None, если запрос не подходит для кэша"""
+
+        if not self.enabled(version) or summary or len(messages) != 1:
+            return None
+
+        message = messages[0]
+        if message.role != MessageRole.USER or not message.message:
+            return None
+        if len(message.message) > settings.RESPONSE_CACHE_MAX_PROMPT_CHARS:
+            return None
+
+        return hashlib.sha256(normalize_prompt(message.message).encode()).hexdigest()
+
+    async def lookup(
+        self, version: str, summary: Optional[str], messages: List[Message]
+    ) -> Optional[str]:
+        """Готовый ответ на первый запрос диалога"""
+
+        digest = self._digest(version, summary, messages)
+        if digest is None:
+            return None
+
+        try:
+            text = await redis_manager.get(ENTRY_KEY.format(version=version, digest=digest))
+        except Exception as e:
+            self.logger.warning(f"Response cache lookup failed: {e}")
+            return None
+
+        if text is None:
+            await redis_manager.hincrby(METRICS_KEY, **{f"{version}:misses": 1})
+            return None
+
+        await redis_manager.zadd(
+            INDEX_KEY.format(version=version),
+            {digest: time.time()},
+            ttl=settings.RESPONSE_CACHE_TTL,
+        )
+        await redis_manager.hincrby(
+            METRICS_KEY,
+            **{
+                f"{version}:hits": 1,
+                f"{version}:bytes_saved": len(text.encode("utf-8")),
+            },
+        )
+        return text
+
+    async def store(
+        self, version: str, summary: Optional[str], messages: List[Message], text: str
+    ) -> None:
+        digest = self._digest(version, summary, messages)
+        if digest is None or not text:
+            return
+
+        try:
+            index = INDEX_KEY.format(version=version)
+            await redis_manager.set(
+                ENTRY_KEY.format(version=version, digest=digest),
+                text,
+                ttl=settings.RESPONSE_CACHE_TTL,
+            )
+            await redis_manager.zadd(index, {digest: time.time()}, ttl=settings.RESPONSE_CACHE_TTL)
+
+            overflow = await redis_manager.zcard(index) - settings.RESPONSE_CACHE_MAX_ENTRIES
+            if overflow > 0:
+                for evicted in await redis_manager.zpopmin(index, overflow):
+                    await redis_manager.delete(ENTRY_KEY.format(version=version, digest=evicted))
+        except Exception as e:
+            # Кэш - оптимизация, ответ пользователю от него не зависит
+            self.logger.warning(f"Failed to store cached response: {e}")
+
+
+async def get_metrics() -> Dict[str, Dict[str, Any]]:
+    """Попадания, промахи и сэкономленные байты по моделям"""
+
+    data = await redis_manager.get_hgetall(METRICS_KEY) or {}
+    metrics: Dict[str, Dict[str, Any]] = {}
+    for field, value in data.items():
+        field = field.decode() if isinstance(field, bytes) else field
+        version, _, name = field.rpartition(":")
+        metrics.setdefault(version, {"hits": 0, "misses": 0, "bytes_saved": 0})[name] = int(value)
+
+    for stats in metrics.values():
+        total = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / total, 4) if total else 0
+    return metrics
+
+
+response_cache = ResponseCache()
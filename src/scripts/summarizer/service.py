@@ -0,0 +1,169 @@
+from typing import Any, Dict, List, Optional
+
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+from src.config.config import settings
+from src.db.enums_class import MessageRole
+from src.db.models import Message
+from src.db.orm.dialog_orm import DialogORM
+from src.scripts.dialog.service import context_tokens
+from src.scripts.queue.rabbit_queue import model
+from src.scripts.rate_limiter.service import estimate_tokens, rate_limiter
+from src.utils.logger import setup_logger
+from src.utils.redis_cache.redis_cache import redis_manager
+from src.utils.token_counter import count_tokens
+
+
+SUMMARY_QUEUE = "dialog_summary"
+# Пока задача сжатия в очереди, новые для того же диалога не ставятся
+SUMMARY_LOCK_KEY = "dialog:{dialog_id}:summary"
+SUMMARY_LOCK_TTL = 600
+# Сколько токенов старых сообщений сжимается за один запрос к модели
+SUMMARY_CHUNK_TOKENS = 24000
+SUMMARY_MAX_TOKENS = 1500
+# Фоновое сжатие уступает лимит провайдера запросам пользователей
+SUMMARY_PRIORITY = -1
+
+SUMMARY_PROMPT = (
+    "Ты ведёшь краткое содержание длинного диалога пользователя с ассистентом. "
+    "Дополни текущее краткое содержание новыми сообщениями. Сохрани факты о "
+    "пользователе, его цели, принятые решения, договорённости, важные числа, "
+    "имена и фрагменты кода, о которых шла речь. Пиши сжато, на языке диалога, "
+    "без вступлений."
+)
+SUMMARY_CONTEXT_TEXT = "Краткое содержание предыдущей части диалога:\n{summary}"
+
+ROLE_NAMES = {
+    MessageRole.USER: "Пользователь",
+    MessageRole.ASSISTANT: "Ассистент",
+}
+
+
+def summary_context(summary: Optional[str]) -> Optional[str]:
+    """Текст краткого содержания для system-промпта модели"""
+
+    return SUMMARY_CONTEXT_TEXT.format(summary=summary) if summary else None
+
+
+class DialogSummarizer:
+    """
+    Фоновое сжатие длинных диалогов.
+
+    Когда несжатая часть диалога превышает SUMMARY_TRIGGER от бюджета модели,
+    в очередь dialog_summary ставится задача. Воркер сворачивает всё, кроме
+    последних SUMMARY_KEEP от бюджета, в краткое содержание дешёвой моделью
+    и сохраняет его в Dialog. Модели получают краткое содержание и свежий хвост,
+    поэтому запрос не растёт вместе с диалогом.
+    """
+
+    def __init__(self, queue_service=None):
+        # В воркере задачи публикуются через его очередь: её outbox дожидается остановка воркера
+        self.queue_service = queue_service or model
+        self.client = AsyncOpenAI(
+            api_key=settings.GPT_KEY,
+            max_retries=2,
+            http_client=DefaultAsyncHttpxClient(
+                event_hooks=rate_limiter.event_hooks("openai")
+            ),
+        )
+        self.logger = setup_logger(__name__)
+
+    async def schedule(self, dialog_id: int, version: Optional[str]) -> None:
+        """Ставит сжатие диалога в очередь, если его история разрослась"""
+
+        try:
+            dialog = await DialogORM.get_dialog(int(dialog_id))
+            if not dialog:
+                return
+
+            tokens = await DialogORM.count_dialog_tokens(
+                dialog.id, dialog.summary_message_id
+            )
+            if tokens <= context_tokens(version) * settings.SUMMARY_TRIGGER:
+                return
+
+            key = SUMMARY_LOCK_KEY.format(dialog_id=dialog.id)
+            if not await redis_manager.set_nx(key, "summary", ttl=SUMMARY_LOCK_TTL):
+                return
+
+            await self.queue_service.publish_message(
+                queue_name=SUMMARY_QUEUE,
+                dialog_id=dialog.id,
+                version=version,
+                key=key,
+            )
+        except Exception as e:
+            # Сжатие - оптимизация, ответ пользователю от него не зависит
+            self.logger.warning(f"Failed to schedule summary for dialog {dialog_id}: {e}")
+
+    async def compact(self, data: Dict[str, Any]) -> None:
+        """Обработчик очереди dialog_summary"""
+
+        dialog = await DialogORM.get_dialog(int(data["dialog_id"]))
+        if not dialog:
+            return
+
+        keep = int(context_tokens(data.get("version")) * settings.SUMMARY_KEEP)
+        summary = dialog.summary
+        summary_message_id = dialog.summary_message_id
+
+        # Хвост, который модели получают дословно; он начинается с сообщения
+        # пользователя, как и контекст в DialogService.get_context
+        tail = await DialogORM.get_dialog_context(dialog.id, keep, summary_message_id)
+        while len(tail) > 1 and tail[0].role != MessageRole.USER:
+            tail.pop(0)
+        if not tail:
+            return
+        boundary = tail[0].message_id
+
+        while True:
+            messages = await DialogORM.get_messages_after(dialog.id, summary_message_id)
+            chunk = self._select_chunk(messages, boundary)
+            if not chunk:
+                break
+
+            summary = await self._summarize(summary, chunk)
+            summary_message_id = chunk[-1].message_id
+            # Сохраняем после каждой части, чтобы повтор задачи не сжимал её заново
+            await DialogORM.set_summary(dialog.id, summary, summary_message_id)
+
+        self.logger.info(f"Dialog {dialog.id} compacted up to message {summary_message_id}")
+
+    @staticmethod
+    def _select_chunk(messages: List[Message], boundary: int) -> List[Message]:
+        """Сообщения до boundary для очередного сжатия, не больше SUMMARY_CHUNK_TOKENS за раз"""
+
+        chunk, used = [], 0
+        for message in messages:
+            size = message.token_count or count_tokens(message.message)
+            if message.message_id >= boundary or (chunk and used + size > SUMMARY_CHUNK_TOKENS):
+                break
+            chunk.append(message)
+            used += size
+
+        return chunk
+
+    async def _summarize(self, summary: Optional[str], messages: List[Message]) -> str:
+        transcript = "\n\n".join(
+            f"{ROLE_NAMES.get(message.role, message.role.value)}: {message.message}"
+            for message in messages
+        )
+        tokens = estimate_tokens([summary, transcript], SUMMARY_MAX_TOKENS)
+        async with rate_limiter.slot(
+            "openai", settings.SUMMARY_MODEL, tokens, priority=SUMMARY_PRIORITY
+        ):
+            response = await self.client.chat.completions.create(
+                model=settings.SUMMARY_MODEL,
+                messages=[
+                    {"role": "system", "content": SUMMARY_PROMPT},
+                    {
+                        "role": "user",
+                        "content": (
+                            f"Текущее краткое содержание:\n{summary or '(пусто)'}\n\n"
+                            f"Новые сообщения:\n{transcript}"
+                        ),
+                    },
+                ],
+                max_completion_tokens=SUMMARY_MAX_TOKENS,
+            )
+        return response.choices[0].message.content or summary or ""
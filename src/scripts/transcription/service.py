@@ -0,0 +1,209 @@
+import asyncio
+import io
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+from openai import AsyncOpenAI
+
+from src.config.config import settings
+from src.scripts.queue.deadline import client_timeout, request_timeout
+from src.scripts.rate_limiter.service import rate_limiter
+from src.utils.http_client import http_client
+from src.utils.logger import setup_logger
+from src.utils.redis_cache.redis_cache import redis_manager
+
+
+WHISPER_MODEL = "whisper-1"
+TRANSCRIPT_KEY = "transcript:{unique_id}"
+TRANSCRIBE_ERROR_TEXT = (
+    "Оповести пользователя о том, что произошла ошибка при транскрибации, "
+    "предложи ему отправить снова его голосовое сообщение"
+)
+# Паузы тише SILENCE_NOISE длиной от SILENCE_DURATION секунд - места для разреза
+SILENCE_NOISE = "-30dB"
+SILENCE_DURATION = 0.4
+SILENCE_PATTERN = re.compile(r"silence_(start|end): (-?\d+(?:\.\d+)?)")
+
+
+class AudioSplitError(Exception):
+    """ffmpeg не смог разобрать запись"""
+
+
+def choose_cuts(silences: List[float], duration: float, target: float) -> List[float]:
+    """
+    Точки разреза записи: по паузе, ближайшей к очередным target секундам.
+    Если паузы рядом нет, запись режется ровно по target.
+    """
+
+    cuts: List[float] = []
+    last = 0.0
+    # Хвост до полутора target не режем, чтобы не получить обрывок в пару секунд
+    while duration - last > target * 1.5:
+        ideal = last + target
+        candidates = [
+            point for point in silences if last + target / 2 < point <= last + target * 1.5
+        ]
+        cut = min(candidates, key=lambda point: abs(point - ideal)) if candidates else ideal
+        cuts.append(cut)
+        last = cut
+    return cuts
+
+
+async def _ffmpeg(audio: bytes, *args: str) -> Tuple[bytes, bytes]:
+    process = await asyncio.create_subprocess_exec(
+        "ffmpeg",
+        "-hide_banner",
+        "-i",
+        "pipe:0",
+        *args,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        stdout, stderr = await process.communicate(audio)
+    except BaseException:
+        # Отмена задачи по сроку не должна оставлять процессы ffmpeg
+        if process.returncode is None:
+            process.kill()
+        raise
+
+    if process.returncode != 0:
+        raise AudioSplitError(stderr.decode(errors="replace")[-500:])
+    return stdout, stderr
+
+
+async def find_silences(audio: bytes) -> List[float]:
+    """Середины пауз в записи, в секундах"""
+
+    _, stderr = await _ffmpeg(
+        audio,
+        "-af",
+        f"silencedetect=noise={SILENCE_NOISE}:d={SILENCE_DURATION}",
+        "-f",
+        "null",
+        "-",
+    )
+
+    silences, start = [], None
+    for kind, value in SILENCE_PATTERN.findall(stderr.decode(errors="replace")):
+        if kind == "start":
+            start = float(value)
+        elif start is not None:
+            silences.append((start + float(value)) / 2)
+            start = None
+    return silences
+
+
+async def cut_segment(audio: bytes, start: float, end: Optional[float]) -> bytes:
+    """Фрагмент записи в ogg/opus, моно 16 кГц - этого Whisper достаточно"""
+
+    bounds = ["-ss", f"{start:.2f}"] + (["-to", f"{end:.2f}"] if end else [])
+    stdout, _ = await _ffmpeg(
+        audio,
+        "-loglevel",
+        "error",
+        *bounds,
+        "-ac",
+        "1",
+        "-ar",
+        "16000",
+        "-c:a",
+        "libopus",
+        "-b:a",
+        "24k",
+        "-f",
+        "ogg",
+        "pipe:1",
+    )
+    return stdout
+
+
+class Transcriber:
+    """
+    Распознавание голосовых сообщений через Whisper.
+
+    Текст кэшируется в Redis по file_unique_id Telegram, поэтому пересланное
+    голосовое не распознаётся повторно. Записи длиннее TRANSCRIBE_SEGMENT_SECONDS
+    режутся ffmpeg по паузам, фрагменты распознаются параллельно и склеиваются
+    по порядку - время ответа зависит от длины фрагмента, а не всей записи.
+    Без ffmpeg запись отправляется целиком, как раньше.
+    """
+
+    def __init__(self, client: AsyncOpenAI):
+        self.client = client
+        self.logger = setup_logger(__name__)
+
+    async def transcribe(self, file: Dict[str, Any], data: Dict[str, Any]) -> str:
+        key = None
+        if file.get("unique_id"):
+            key = TRANSCRIPT_KEY.format(unique_id=file["unique_id"])
+            cached = await self._cached(key)
+            if cached:
+                self.logger.debug(f"Transcript cache hit for {file['unique_id']}")
+                return cached
+
+        try:
+            audio = await self._download(file["url"], client_timeout(data))
+            if audio is None:
+                return TRANSCRIBE_ERROR_TEXT
+            text = await self._transcribe(audio, file.get("duration") or 0, data)
+        except Exception as e:
+            self.logger.error(f"Ошибка транскрипции: {e}")
+            return TRANSCRIBE_ERROR_TEXT
+
+        if key and text:
+            await redis_manager.set(key, text, ttl=settings.TRANSCRIPT_CACHE_TTL)
+        return text
+
+    async def _cached(self, key: str) -> Optional[str]:
+        try:
+            return await redis_manager.get(key)
+        except Exception as e:
+            self.logger.warning(f"Failed to read transcript cache: {e}")
+            return None
+
+    async def _download(self, url: str, timeout: aiohttp.ClientTimeout) -> Optional[bytes]:
+        async with http_client.session() as session:
+            async with session.get(url, timeout=timeout) as response:
+                if response.status != 200:
+                    self.logger.error(
+                        f"Ошибка загрузки файла для транскрипции: {response.status}"
+                    )
+                    return None
+                return await response.read()
+
+    async def _transcribe(self, audio: bytes, duration: float, data: Dict[str, Any]) -> str:
+        target = settings.TRANSCRIBE_SEGMENT_SECONDS
+        if duration <= target * 1.5:
+            return await self._whisper(audio, data)
+
+        try:
+            cuts = choose_cuts(await find_silences(audio), duration, target)
+        except (OSError, AudioSplitError) as e:
+            self.logger.warning(f"Failed to split voice message, sending it whole: {e}")
+            return await self._whisper(audio, data)
+
+        bounds = list(zip([0.0, *cuts], [*cuts, None]))
+        semaphore = asyncio.Semaphore(settings.TRANSCRIBE_CONCURRENCY)
+
+        async def segment(start: float, end: Optional[float]) -> str:
+            async with semaphore:
+                return await self._whisper(await cut_segment(audio, start, end), data)
+
+        texts = await asyncio.gather(*(segment(start, end) for start, end in bounds))
+        self.logger.info(f"Voice message of {duration}s transcribed in {len(bounds)} segments")
+        return " ".join(text.strip() for text in texts if text.strip())
+
+    async def _whisper(self, audio: bytes, data: Dict[str, Any]) -> str:
+        audio_file = io.BytesIO(audio)
+        audio_file.name = "voice.ogg"
+
+        async with rate_limiter.slot("openai", WHISPER_MODEL, priority=data.get("priority", 0)):
+            transcription = await self.client.audio.transcriptions.create(
+                model=WHISPER_MODEL,
+                file=audio_file,
+                timeout=request_timeout(data, settings.PROVIDER_TIMEOUT),
+            )
+        return transcription.text
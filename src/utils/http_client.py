@@ -0,0 +1,60 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import aiohttp
+
+from src.config.config import settings
+from src.utils.logger import setup_logger
+
+
+logger = setup_logger(__name__)
+
+
+class HttpClient:
+    """
+    Общий HTTP-клиент процесса для скачивания файлов и запросов к API.
+
+    Одна aiohttp-сессия держит keep-alive соединения по хостам и кэширует DNS,
+    поэтому задачи не тратят время на новый TCP/TLS handshake. Сессия создаётся
+    при первом запросе и закрывается воркером при остановке.
+    """
+
+    def __init__(self):
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=settings.HTTP_LIMIT,
+                limit_per_host=settings.HTTP_LIMIT_PER_HOST,
+                ttl_dns_cache=settings.HTTP_DNS_TTL,
+                keepalive_timeout=settings.HTTP_KEEPALIVE_TIMEOUT,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(
+                    total=settings.HTTP_TIMEOUT,
+                    connect=settings.HTTP_CONNECT_TIMEOUT,
+                ),
+            )
+            self._loop = loop
+        return self._session
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[aiohttp.ClientSession]:
+        """Общая сессия вместо aiohttp.ClientSession() (выход из блока её не закрывает)"""
+
+        yield await self.get_session()
+
+    async def close(self) -> None:
+        if self._session and not self._session.closed:
+            await self._session.close()
+            logger.info("HTTP client closed")
+        self._session = None
+        self._loop = None
+
+
+http_client = HttpClient()
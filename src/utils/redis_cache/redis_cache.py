@@ -75,6 +75,33 @@ class RedisCache:
             )
             return False
 
+    async def set_nx(self, key: str, value, ttl: int) -> bool:
+        """Записывает ключ, только если его ещё нет."""
+        await self.connect()
+        return bool(
+            await self.redis.set(name=key, value=json.dumps(value), ex=ttl, nx=True)
+        )
+
+    async def expire(self, key: str, ttl: int) -> bool:
+        """Продлевает время жизни ключа."""
+        await self.connect()
+        return bool(await self.redis.expire(key, ttl))
+
+    async def incr(self, key: str) -> int:
+        """Увеличивает счётчик на 1."""
+        try:
+            await self.connect()
+            return await self.redis.incr(key) if self.redis else 0
+        except Exception as e:
+            logger.error(e)
+            return 0
+
+    async def get_int(self, key: str) -> int:
+        """Читает значение счётчика."""
+        await self.connect()
+        data = await self.redis.get(key) if self.redis else None
+        return int(data) if data else 0
+
     async def set_hset(self, key: str, **kwargs):
         """Установка hset."""
         try:
@@ -84,10 +111,77 @@ class RedisCache:
         except Exception as e:
             logger.error(e)
 
+    async def hincrby(self, key: str, ttl: int = None, **amounts: int) -> None:
+        """Увеличивает поля hash на заданные значения."""
+        try:
+            await self.connect()
+            if self.redis:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for field, amount in amounts.items():
+                        pipe.hincrby(key, field, amount)
+                    if ttl:
+                        pipe.expire(key, ttl)
+                    await pipe.execute()
+        except Exception as e:
+            logger.error(e)
+
+    async def zadd(self, key: str, mapping: dict, ttl: int = None) -> None:
+        """Добавление элементов в sorted set (или обновление их score)."""
+        try:
+            await self.connect()
+            if self.redis:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    pipe.zadd(key, mapping)
+                    if ttl:
+                        pipe.expire(key, ttl)
+                    await pipe.execute()
+        except Exception as e:
+            logger.error(e)
+
+    async def zcard(self, key: str) -> int:
+        """Количество элементов sorted set."""
+        await self.connect()
+        return await self.redis.zcard(key) if self.redis else 0
+
+    async def zpopmin(self, key: str, count: int = 1) -> list[str]:
+        """Забирает элементы с наименьшим score."""
+        try:
+            await self.connect()
+            data = await self.redis.zpopmin(key, count) if self.redis else []
+            return [
+                member.decode() if isinstance(member, bytes) else member
+                for member, _ in data
+            ]
+        except Exception as e:
+            logger.error(e)
+            return []
+
     async def get_hgetall(self, key: str):
         await self.connect()
         return await self.redis.hgetall(key) if self.redis else None
 
+    async def push_list(self, key: str, *values: dict) -> bool:
+        """Добавление элементов в конец списка."""
+        try:
+            await self.connect()
+            if self.redis:
+                await self.redis.rpush(key, *[json.dumps(value) for value in values])
+                return True
+            return False
+        except Exception as e:
+            logger.error(e)
+            return False
+
+    async def pop_list(self, key: str, count: int = 1) -> list[dict]:
+        """Забирает элементы из начала списка."""
+        try:
+            await self.connect()
+            data = await self.redis.lpop(key, count) if self.redis else None
+            return [json.loads(item) for item in data] if data else []
+        except Exception as e:
+            logger.error(e)
+            return []
+
     async def delete(self, key: str):
         try:
             await self.connect()
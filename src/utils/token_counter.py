@@ -0,0 +1,17 @@
+import math
+
+
+# Служебные токены роли и разметки, которые модель тратит на каждое сообщение
+MESSAGE_OVERHEAD_TOKENS = 4
+# Средняя длина токена в байтах UTF-8: для латиницы близко к правде,
+# для кириллицы (2 байта на символ) оценка получается с запасом
+BYTES_PER_TOKEN = 4
+
+
+def count_tokens(text: str) -> int:
+    """Оценка количества токенов сообщения без привязки к токенизатору конкретной модели"""
+
+    if not text:
+        return MESSAGE_OVERHEAD_TOKENS
+
+    return math.ceil(len(text.encode("utf-8")) / BYTES_PER_TOKEN) + MESSAGE_OVERHEAD_TOKENS
@@ -0,0 +1,40 @@
+import datetime
+from typing import Any
+
+from src.utils.logger import setup_logger
+from src.utils.redis_cache.redis_cache import redis_manager
+
+
+logger = setup_logger(__name__)
+
+# Расход токенов по провайдеру и модели за сутки
+USAGE_KEY = "usage:{provider}:{model}:{day}"
+USAGE_TTL = 60 * 60 * 24 * 30
+
+USAGE_FIELDS = (
+    "input_tokens",
+    "output_tokens",
+    "cache_creation_input_tokens",
+    "cache_read_input_tokens",
+)
+
+
+async def record_usage(provider: str, model: str, usage: Any) -> None:
+    """Сохраняет расход токенов одного запроса к модели (объект usage из ответа API)"""
+
+    if usage is None:
+        return
+
+    amounts = {field: getattr(usage, field, None) or 0 for field in USAGE_FIELDS}
+    logger.info(
+        f"{provider} {model} usage: "
+        + ", ".join(f"{field}={amount}" for field, amount in amounts.items())
+    )
+
+    day = datetime.date.today().isoformat()
+    await redis_manager.hincrby(
+        USAGE_KEY.format(provider=provider, model=model, day=day),
+        ttl=USAGE_TTL,
+        requests=1,
+        **{field: amount for field, amount in amounts.items() if amount},
+    )
@@ -0,0 +1,73 @@
+import pytest
+
+from src.scripts.admission import service as admission_module
+from src.scripts.admission.service import ACCEPT, DELAY, SHED, AdmissionController
+
+
+class FakeQueue:
+    def __init__(self, depth: int, consumers: int = 1):
+        self.depth = depth
+        self.consumers = consumers
+        self.calls = 0
+
+    async def queue_depth(self, queue_name):
+        self.calls += 1
+        return self.depth, self.consumers
+
+
+class FakeRedis:
+    def __init__(self):
+        self.storage = {}
+
+    async def get(self, key):
+        return self.storage.get(key)
+
+    async def set(self, key, value, ttl=None):
+        self.storage[key] = value
+
+    async def get_int(self, key):
+        return self.storage.get(key, 0)
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    fake = FakeQueue(depth=0)
+    monkeypatch.setattr(admission_module, "model", fake)
+    monkeypatch.setattr(admission_module, "redis_manager", FakeRedis())
+    return fake
+
+
+@pytest.mark.asyncio
+async def test_thresholds_depend_on_tier(monkeypatch, queue):
+    # chatgpt: 30 задач параллельно по ~15 секунд -> 2 задачи в секунду
+    queue.depth = 100
+
+    assert (await AdmissionController().check("chatgpt", priority=0)).action == DELAY
+    assert (await AdmissionController().check("chatgpt", priority=5)).action == ACCEPT
+
+    queue.depth = 1000
+    monkeypatch.setattr(admission_module, "redis_manager", FakeRedis())
+    admission = await AdmissionController().check("chatgpt", priority=0)
+
+    assert admission.action == SHED
+    assert admission.text
+
+
+@pytest.mark.asyncio
+async def test_depth_is_cached_between_checks(queue):
+    controller = AdmissionController()
+
+    for _ in range(10):
+        await controller.check("claude")
+
+    assert queue.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_broker_errors_do_not_block_requests(monkeypatch, queue):
+    async def broken(queue_name):
+        raise ConnectionError("broker is down")
+
+    monkeypatch.setattr(queue, "queue_depth", broken)
+
+    assert (await AdmissionController().check("midjourney")).action == ACCEPT
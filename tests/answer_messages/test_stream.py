@@ -0,0 +1,74 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.scripts.answer_messages.answer_message import AnswerMessage
+from src.scripts.answer_messages.stream import StreamingMessage
+from src.scripts.queue.retry import RetryableError
+
+
+class FakeBot:
+    def __init__(self):
+        self.messages = {}
+        self.edits = 0
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        message_id = len(self.messages) + 1
+        self.messages[message_id] = text
+        return SimpleNamespace(message_id=message_id)
+
+    async def edit_message_text(self, chat_id, message_id, text, parse_mode=None):
+        self.edits += 1
+        self.messages[message_id] = text
+
+
+@pytest.mark.asyncio
+async def test_edits_are_throttled():
+    bot = FakeBot()
+    stream = StreamingMessage(bot, chat_id=1, message_id=None, edit_interval=60)
+
+    for word in ["Привет", ", ", "как", " ", "дела?"]:
+        await stream.push(word)
+    text = await stream.finish()
+
+    assert text == "Привет, как дела?"
+    # Первый фрагмент отправлен сразу, дальше - только итоговая правка
+    assert bot.edits == 1
+    assert bot.messages == {1: "Привет, как дела?"}
+
+
+@pytest.mark.asyncio
+async def test_long_answer_rolls_over_into_new_messages():
+    bot = FakeBot()
+    bot.messages[1] = "⏳"
+    stream = StreamingMessage(bot, chat_id=1, message_id=1, chunk_size=10, edit_interval=0)
+
+    for _ in range(5):
+        await stream.push("abcde")
+    await stream.finish()
+
+    assert list(bot.messages.values()) == ["abcdeabcde", "abcdeabcde", "abcde"]
+
+
+@pytest.mark.asyncio
+async def test_status_edit_after_rollover_keeps_first_chunk():
+    bot = FakeBot()
+    bot.messages[1] = "⏳"
+    client = AnswerMessage.__new__(AnswerMessage)
+    client.bot = bot
+    client.logger = MagicMock()
+    data = {"user_id": 1, "answer_message": 1}
+
+    async def chunks():
+        for _ in range(3):
+            yield "abcde"
+        raise RetryableError("rate limited")
+
+    with pytest.raises(RetryableError):
+        await client.answer_stream(data, chunks(), chunk_size=10)
+
+    # Повтор задачи сообщает о себе в текущем сообщении, первый чанк ответа остаётся
+    assert data["answer_message"] == 2
+    await client.edit_message(data, "⏳ повтор")
+    assert bot.messages == {1: "abcdeabcde", 2: "⏳ повтор"}
@@ -0,0 +1,81 @@
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import httpx
+import pytest
+from anthropic import AsyncAnthropic
+
+from src.db.enums_class import MessageRole
+from src.scripts.antropic import claude_gpt as claude_module
+from src.scripts.antropic.claude_gpt import ClaudeGPT, build_request
+
+
+VERSION = "claude-3-7-sonnet-20250219"
+
+
+def make_history():
+    roles = [MessageRole.USER, MessageRole.ASSISTANT] * 3
+    return [
+        SimpleNamespace(role=role, message=f"сообщение {index}")
+        for index, role in enumerate(roles[:-1])
+    ]
+
+
+def test_breakpoints_cover_summary_and_last_two_user_turns():
+    request = build_request("о чём говорили", make_history())
+
+    marked = [
+        index
+        for index, message in enumerate(request["messages"])
+        if "cache_control" in message["content"][-1]
+    ]
+    assert marked == [2, 4]
+    assert request["system"][0]["cache_control"] == {"type": "ephemeral"}
+
+    assert "system" not in build_request(None, make_history())
+
+
+@pytest.mark.asyncio
+async def test_complete_records_cache_usage(monkeypatch):
+    requests = []
+
+    def messages_api(request: httpx.Request) -> httpx.Response:
+        requests.append(json.loads(request.content))
+        return httpx.Response(
+            200,
+            json={
+                "id": "msg_1",
+                "type": "message",
+                "role": "assistant",
+                "model": VERSION,
+                "content": [{"type": "text", "text": "ответ"}],
+                "stop_reason": "end_turn",
+                "stop_sequence": None,
+                "usage": {
+                    "input_tokens": 12,
+                    "output_tokens": 5,
+                    "cache_creation_input_tokens": 40,
+                    "cache_read_input_tokens": 2000,
+                },
+            },
+        )
+
+    claude = ClaudeGPT()
+    claude.client = AsyncAnthropic(
+        api_key="test",
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(messages_api)),
+    )
+    usage = AsyncMock()
+    monkeypatch.setattr(claude_module, "record_usage", usage)
+
+    text = await claude.complete(VERSION, "о чём говорили", make_history(), {})
+
+    assert text == "ответ"
+    assert requests[0]["system"][0]["cache_control"] == {"type": "ephemeral"}
+    assert requests[0]["messages"][-1]["content"][-1]["cache_control"] == {"type": "ephemeral"}
+
+    provider, model, recorded = usage.await_args.args
+    assert (provider, model) == ("anthropic", VERSION)
+    assert recorded.cache_read_input_tokens == 2000
+    assert recorded.cache_creation_input_tokens == 40
@@ -0,0 +1,72 @@
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from src.scripts.chat_gpt import chat_gpt as chat_gpt_module
+from src.scripts.chat_gpt.chat_gpt import AssistantRunError, ChatGPT
+from src.scripts.queue.retry import RetryableError
+
+
+def _run(status, error_code=None):
+    last_error = SimpleNamespace(code=error_code, message="boom") if error_code else None
+    return SimpleNamespace(id="run_1", status=status, last_error=last_error)
+
+
+def _chat_gpt(statuses) -> ChatGPT:
+    chat_gpt = ChatGPT()
+    chat_gpt.client = MagicMock()
+    runs = chat_gpt.client.beta.threads.runs
+    runs.create = AsyncMock(return_value=statuses[0])
+    runs.retrieve = AsyncMock(side_effect=statuses[1:])
+    runs.cancel = AsyncMock()
+    text = SimpleNamespace(value="ответ")
+    chat_gpt.client.beta.threads.messages.list = AsyncMock(
+        return_value=SimpleNamespace(data=[SimpleNamespace(content=[SimpleNamespace(text=text)])])
+    )
+    return chat_gpt
+
+
+@pytest.fixture(autouse=True)
+def fast_polling(monkeypatch):
+    monkeypatch.setattr(chat_gpt_module, "RUN_POLL_MIN_DELAY", 0)
+
+
+@pytest.mark.asyncio
+async def test_polling_returns_answer_of_completed_run():
+    chat_gpt = _chat_gpt([_run("queued"), _run("in_progress"), _run("completed")])
+
+    text = await chat_gpt._run_assistant({"version": "asst_1"}, "thread_1", streamed=False)
+
+    assert text == "ответ"
+    chat_gpt.client.beta.threads.runs.cancel.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_failed_run_stops_polling():
+    chat_gpt = _chat_gpt([_run("queued"), _run("failed", "invalid_prompt")])
+
+    with pytest.raises(AssistantRunError):
+        await chat_gpt._run_assistant({"version": "asst_1"}, "thread_1", streamed=False)
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_run_is_retryable():
+    chat_gpt = _chat_gpt([_run("failed", "rate_limit_exceeded")])
+
+    with pytest.raises(RetryableError):
+        await chat_gpt._run_assistant({"version": "asst_1"}, "thread_1", streamed=False)
+
+
+@pytest.mark.asyncio
+async def test_run_is_cancelled_after_deadline(monkeypatch):
+    monkeypatch.setattr(chat_gpt_module.settings, "ASSISTANT_RUN_TIMEOUT", 0.05)
+    monkeypatch.setattr(chat_gpt_module, "RUN_POLL_MIN_DELAY", 0.01)
+    chat_gpt = _chat_gpt([_run("queued")] + [_run("in_progress")] * 1000)
+
+    with pytest.raises(TimeoutError):
+        await chat_gpt._run_assistant({"version": "asst_1"}, "thread_1", streamed=False)
+
+    chat_gpt.client.beta.threads.runs.cancel.assert_awaited_once_with(
+        thread_id="thread_1", run_id="run_1"
+    )
@@ -0,0 +1,64 @@
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import httpx
+import openai
+import pytest
+
+from src.db.enums_class import MessageRole
+from src.scripts.chat_gpt.chat_gpt import ChatGPT
+
+
+def _message(message_id, role, text):
+    return SimpleNamespace(message_id=message_id, role=role, message=text)
+
+
+def _chat_gpt(dialog, messages) -> ChatGPT:
+    chat_gpt = ChatGPT()
+    chat_gpt.dialog_service = MagicMock()
+    chat_gpt.dialog_service.get_dialog = AsyncMock(return_value=dialog)
+    chat_gpt.dialog_service.get_context = AsyncMock(return_value=messages)
+    chat_gpt.dialog_service.set_thread = AsyncMock()
+    chat_gpt.client = MagicMock()
+    chat_gpt.client.beta.threads.messages.create = AsyncMock()
+    chat_gpt.client.beta.threads.create = AsyncMock(
+        return_value=SimpleNamespace(id="thread_new")
+    )
+    return chat_gpt
+
+
+HISTORY = [
+    _message(1, MessageRole.USER, "привет"),
+    _message(2, MessageRole.ASSISTANT, "здравствуйте"),
+    _message(3, MessageRole.USER, "как дела?"),
+]
+
+
+@pytest.mark.asyncio
+async def test_existing_thread_gets_only_new_user_messages():
+    dialog = SimpleNamespace(thread_id="thread_1", thread_message_id=1)
+    chat_gpt = _chat_gpt(dialog, HISTORY)
+
+    assert await chat_gpt._get_thread(7) == "thread_1"
+
+    chat_gpt.client.beta.threads.messages.create.assert_awaited_once_with(
+        thread_id="thread_1", role="user", content="как дела?"
+    )
+    chat_gpt.client.beta.threads.create.assert_not_awaited()
+    chat_gpt.dialog_service.set_thread.assert_awaited_once_with(7, "thread_1", 3)
+
+
+@pytest.mark.asyncio
+async def test_expired_thread_is_rebuilt_from_history():
+    dialog = SimpleNamespace(thread_id="thread_old", thread_message_id=1)
+    chat_gpt = _chat_gpt(dialog, HISTORY)
+    request = httpx.Request("POST", "https://api.openai.com/v1/threads/thread_old/messages")
+    chat_gpt.client.beta.threads.messages.create.side_effect = openai.NotFoundError(
+        "not found", response=httpx.Response(404, request=request), body=None
+    )
+
+    assert await chat_gpt._get_thread(7) == "thread_new"
+
+    messages = chat_gpt.client.beta.threads.create.await_args.kwargs["messages"]
+    assert len(messages) == 3
+    chat_gpt.dialog_service.set_thread.assert_awaited_once_with(7, "thread_new", 3)
@@ -0,0 +1,136 @@
+import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import httpx
+import pytest
+
+from src.config.config import settings
+from src.scripts.circuit_breaker import service as breaker_module
+from src.scripts.circuit_breaker.router import TextRouter
+from src.scripts.circuit_breaker.service import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitBreakers,
+    CircuitOpenError,
+)
+from src.scripts.queue.retry import is_retryable
+from src.scripts.rate_limiter import service as limiter_module
+from src.scripts.rate_limiter.service import RateLimiterRegistry
+
+
+def test_breaker_opens_on_errors_and_slow_calls_and_recovers():
+    breaker = CircuitBreaker("test", min_calls=4, failure_rate=0.5, slow_call=10, open_for=0)
+
+    breaker.record(failed=False, duration=1)
+    breaker.record(failed=False, duration=1)
+    breaker.record(failed=True)
+    assert breaker.state == CLOSED
+
+    breaker.record(failed=False, duration=25)
+    assert breaker.state == OPEN
+
+    # open_for истёк: пропускается один пробный запрос
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    breaker.record(failed=False, duration=1)
+    assert breaker.state == CLOSED and breaker.allow()
+
+
+def test_open_breaker_rejects_requests():
+    breaker = CircuitBreaker("test", min_calls=1, open_for=60)
+    breaker.record(failed=True)
+
+    assert not breaker.allow()
+
+
+@pytest.fixture
+def breakers(monkeypatch):
+    registry = CircuitBreakers()
+    monkeypatch.setattr(registry, "publish", AsyncMock())
+    monkeypatch.setattr(breaker_module, "circuit_breakers", registry)
+    monkeypatch.setattr("src.scripts.circuit_breaker.router.circuit_breakers", registry)
+    return registry
+
+
+def make_router():
+    send_message = AsyncMock()
+    bot = SimpleNamespace(send_message=AsyncMock())
+    return TextRouter(send_message, SimpleNamespace(bot=bot)), send_message, bot
+
+
+@pytest.mark.asyncio
+async def test_open_model_is_answered_by_fallback(breakers):
+    breakers.get("anthropic", "claude-3-5-haiku-20241022")._open(now=1e12)
+    router, send_message, bot = make_router()
+
+    data = {"version": "claude-3-5-haiku-20241022", "user_id": 1, "energy_cost": 25}
+    await router.send_message(data)
+
+    send_message.assert_awaited_once_with(data)
+    assert data["version"] == "gpt-4o-mini"
+    assert data["energy_cost"] == settings.TEXT_GPT["gpt-4o-mini"]["energy_cost"]
+    assert "ChatGPT 4o-mini" in bot.send_message.await_args.kwargs["text"]
+
+
+@pytest.mark.asyncio
+async def test_fallback_keeps_price_already_charged(breakers):
+    breakers.get("anthropic", "claude-3-5-haiku-20241022")._open(now=1e12)
+    router, _, _ = make_router()
+
+    data = {
+        "version": "claude-3-5-haiku-20241022",
+        "user_id": 1,
+        "energy_cost": 25,
+        "energy_charged": True,
+    }
+    await router.send_message(data)
+
+    assert data["energy_cost"] == 25
+
+
+@pytest.mark.asyncio
+async def test_fallback_keeps_premium_job_free(breakers):
+    breakers.get("anthropic", "claude-3-5-haiku-20241022")._open(now=1e12)
+    router, send_message, _ = make_router()
+
+    data = {"version": "claude-3-5-haiku-20241022", "user_id": 1, "energy_cost": 0, "priority": 5}
+    await router.send_message(data)
+
+    assert data["version"] == "gpt-4o-mini"
+    assert data["energy_cost"] == 0
+    send_message.assert_awaited_once_with(data)
+
+
+@pytest.mark.asyncio
+async def test_job_is_retried_when_fallback_is_down_too(breakers):
+    breakers.get("anthropic", "claude-3-5-haiku-20241022")._open(now=1e12)
+    breakers.get("openai", "gpt-4o-mini")._open(now=1e12)
+    router, send_message, _ = make_router()
+
+    with pytest.raises(CircuitOpenError) as error:
+        await router.send_message({"version": "claude-3-5-haiku-20241022", "user_id": 1})
+
+    assert is_retryable(error.value)
+    send_message.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("stream", [True, False])
+async def test_only_streams_are_timed(monkeypatch, stream):
+    record = AsyncMock()
+    monkeypatch.setattr(limiter_module, "circuit_breakers", SimpleNamespace(record=record))
+    on_response = RateLimiterRegistry().event_hooks("openai")["response"][-1]
+
+    request = httpx.Request(
+        "POST",
+        "https://api.openai.com/v1/chat/completions",
+        json={"model": "gpt-4o", "stream": stream},
+        extensions={"started_at": time.monotonic() - 90},
+    )
+    await on_response(httpx.Response(200, request=request))
+
+    # Без стрима 90 секунд - это длинный ответ, а не медленная модель
+    assert (record.await_args.kwargs["duration"] >= 90) is stream
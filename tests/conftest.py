@@ -0,0 +1,17 @@
+import os
+
+os.environ.setdefault("BOT_API", "123456:test-token")
+os.environ.setdefault("DEBUG", "True")
+
+for key in (
+    "GPT_KEY",
+    "CLAUDE_KEY",
+    "GPT_ASSIS_KEY",
+    "MJ_KEY",
+    "FLUX_KEY",
+    "DALL_KEY",
+    "YOOMONEY_API",
+    "SHOP_ID",
+    "ADMIN_TOKEN",
+):
+    os.environ.setdefault(key, "")
@@ -0,0 +1,53 @@
+import httpx
+import pytest
+
+from src.scripts.credentials.service import CredentialPool
+
+
+def test_keys_are_chosen_by_remaining_quota():
+    pool = CredentialPool("openai", ["key-a", "key-b"])
+    key_a, key_b = pool.credentials
+
+    pool.report(key_a, 200, {"x-ratelimit-remaining-tokens": "5000"})
+    # О втором ключе ещё ничего не известно - он выбирается, чтобы узнать его остаток
+    assert pool.choose() is key_b
+
+    pool.report(key_b, 200, {"x-ratelimit-remaining-tokens": "1000"})
+    assert pool.choose() is key_a
+
+
+def test_failing_keys_are_quarantined():
+    pool = CredentialPool("openai", ["key-a", "key-b"])
+    key_a, key_b = pool.credentials
+
+    pool.report(key_a, 429, {}, body='{"error": {"code": "insufficient_quota"}}')
+    assert [pool.choose() for _ in range(3)] == [key_b] * 3
+
+    pool.report(key_b, 401, {})
+    assert not pool.available
+    # Если в карантине все, берём тот, что освободится раньше
+    assert pool.choose() is key_a
+
+
+@pytest.mark.asyncio
+async def test_sdk_requests_fail_over_to_healthy_key():
+    pool = CredentialPool("anthropic", ["key-a", "key-b"])
+    used = []
+
+    def messages_api(request: httpx.Request) -> httpx.Response:
+        key = request.headers["x-api-key"]
+        used.append(key)
+        if key == "key-a":
+            return httpx.Response(401, json={"error": {"type": "authentication_error"}})
+        return httpx.Response(200, json={"ok": True})
+
+    async with httpx.AsyncClient(
+        transport=httpx.MockTransport(messages_api),
+        event_hooks=pool.httpx_hooks(),
+        headers={"x-api-key": "key-a"},
+    ) as client:
+        for _ in range(4):
+            await client.post("https://api.anthropic.com/v1/messages", json={})
+
+    assert used.count("key-a") == 1
+    assert used[-3:] == ["key-b"] * 3
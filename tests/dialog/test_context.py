@@ -0,0 +1,50 @@
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from src.db.enums_class import MessageRole
+from src.scripts.dialog import service as dialog_module
+from src.scripts.dialog.service import DEFAULT_CONTEXT_TOKENS, DialogService
+from src.utils.token_counter import count_tokens
+
+
+def test_token_estimate_grows_with_text_and_is_conservative_for_cyrillic():
+    assert count_tokens("") < count_tokens("hello world")
+    assert count_tokens("привет мир") > count_tokens("hello world")
+    assert count_tokens("a" * 4000) == 1004
+
+
+@pytest.mark.asyncio
+async def test_context_uses_model_budget_and_starts_with_user(monkeypatch):
+    messages = [
+        SimpleNamespace(role=MessageRole.ASSISTANT, message="хвост прошлого ответа"),
+        SimpleNamespace(role=MessageRole.USER, message="вопрос"),
+    ]
+    get_dialog_context = AsyncMock(return_value=list(messages))
+    monkeypatch.setattr(dialog_module.DialogORM, "get_dialog_context", get_dialog_context)
+
+    context = await DialogService().get_context("5", "gpt-4o")
+
+    assert context == messages[1:]
+    get_dialog_context.assert_awaited_once_with(
+        5, dialog_module.settings.TEXT_GPT["gpt-4o"]["context_tokens"], None
+    )
+
+    await DialogService().get_context(5, "asst_123")
+    assert get_dialog_context.await_args.args == (5, DEFAULT_CONTEXT_TOKENS, None)
+
+
+@pytest.mark.asyncio
+async def test_prompt_context_starts_after_summary(monkeypatch):
+    dialog = SimpleNamespace(summary="пользователь пишет бота", summary_message_id=40)
+    monkeypatch.setattr(
+        dialog_module.DialogORM, "get_dialog", AsyncMock(return_value=dialog)
+    )
+    get_dialog_context = AsyncMock(return_value=[])
+    monkeypatch.setattr(dialog_module.DialogORM, "get_dialog_context", get_dialog_context)
+
+    summary, messages = await DialogService().get_prompt_context(5, "gpt-4o")
+
+    assert summary == dialog.summary
+    assert get_dialog_context.await_args.args[2] == 40
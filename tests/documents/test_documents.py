@@ -0,0 +1,89 @@
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from src.config.config import settings
+from src.scripts.documents.service import (
+    CsvText,
+    DocumentReader,
+    HtmlText,
+    detect_encoding,
+)
+from src.utils.http_client import http_client
+
+
+def test_encoding_is_detected_from_sample():
+    text = "Привет, это проверка кодировки документа"
+
+    assert detect_encoding(text.encode("utf-8")) == "utf-8"
+    # Образец оборван посреди двухбайтового символа
+    assert detect_encoding(text.encode("utf-8")[:7]) == "utf-8"
+    assert detect_encoding(text.encode("cp1251")) == "cp1251"
+    assert detect_encoding(text.encode("koi8-r")) == "koi8-r"
+
+
+def test_html_and_csv_are_normalized_in_parts():
+    html = HtmlText()
+    parts = [
+        html.feed("<html><head><title>x</title></head><body><p>Пер"),
+        html.feed("вый абзац</p><script>var a = 1;</script><p>Второй</p>"),
+        html.close(),
+    ]
+    assert "".join(parts).split() == ["Первый", "абзац", "Второй"]
+
+    rows = CsvText("name;comment\nАнна;ok\n")
+    parts = [
+        rows.feed('name;comment\nАнна;"много\n'),
+        rows.feed('строк"\nБорис;;\n;\n'),
+        rows.close(),
+    ]
+    assert "".join(parts) == "name | comment\nАнна | много\nстрок\nБорис |  | \n"
+
+
+@pytest.mark.asyncio
+async def test_download_stops_at_byte_cap(monkeypatch):
+    monkeypatch.setattr(settings, "DOCUMENT_MAX_BYTES", 100_000)
+    body = ("строка документа\n" * 20_000).encode("cp1251")
+
+    async def handler(request: web.Request) -> web.StreamResponse:
+        return web.Response(body=body)
+
+    app = web.Application()
+    app.router.add_get("/file.txt", handler)
+    server = TestServer(app)
+    await server.start_server()
+
+    try:
+        text, truncated = await DocumentReader().download(
+            str(server.make_url("/file.txt")), "file.txt", timeout=None
+        )
+    finally:
+        await http_client.close()
+        await server.close()
+
+    assert truncated
+    assert text.startswith("строка документа\nстрока документа")
+    assert len(text.encode("cp1251")) <= 100_000
+
+
+@pytest.mark.asyncio
+async def test_large_document_is_summarized_in_order(monkeypatch):
+    monkeypatch.setattr(settings, "DOCUMENT_INLINE_CHARS", 500)
+    monkeypatch.setattr(settings, "DOCUMENT_CHUNK_TOKENS", 100)
+    reader = DocumentReader()
+    calls = []
+
+    async def complete(prompt, text, data):
+        calls.append(prompt)
+        return f"[{len(calls)}]"
+
+    monkeypatch.setattr(reader, "_complete", complete)
+    text = "\n".join(f"строка {index}" for index in range(300))
+
+    parts = reader.split(text, settings.DOCUMENT_CHUNK_TOKENS)
+    summary = await reader._map_reduce(text, "file.txt", "что в строке 7?", {})
+
+    assert all(len(part.encode()) <= 400 for part in parts)
+    assert "".join(parts) == text
+    assert summary == "\n\n".join(f"[{index}]" for index in range(1, len(parts) + 1))
+    assert all("строке 7" in prompt for prompt in calls)
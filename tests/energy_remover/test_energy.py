@@ -0,0 +1,50 @@
+from unittest.mock import AsyncMock
+
+import pytest
+
+from src.scripts.energy_remover import service as energy_module
+from src.scripts.energy_remover.service import EnergyService
+
+
+@pytest.fixture
+def checkpoint(monkeypatch):
+    checkpoint = AsyncMock()
+    monkeypatch.setattr(energy_module.job_store, "checkpoint", checkpoint)
+    return checkpoint
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "result",
+    [
+        {"error": True, "text": "⚡ Недостаточно энергии"},
+        # Исключение внутри remove_energy: ответ без ключа error
+        {"text": "Ошибка, попробуйте еще раз"},
+    ],
+)
+async def test_failed_debit_is_not_marked_charged(monkeypatch, checkpoint, result):
+    monkeypatch.setattr(energy_module.UserORM, "remove_energy", AsyncMock(return_value=result))
+    add_energy = AsyncMock()
+    monkeypatch.setattr(energy_module.UserORM, "add_energy", add_energy)
+    service = EnergyService()
+    data = {"user_id": 1, "energy_cost": 10}
+
+    status = await service.upload_energy(data, "remove")
+    await service.refund(data)
+
+    assert status == {"error": True, "text": result["text"]}
+    checkpoint.assert_not_awaited()
+    add_energy.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_successful_debit_is_checkpointed(monkeypatch, checkpoint):
+    monkeypatch.setattr(
+        energy_module.UserORM,
+        "remove_energy",
+        AsyncMock(return_value={"error": False, "text": "Списано ⚡ 10"}),
+    )
+    data = {"user_id": 1, "energy_cost": 10}
+
+    assert await EnergyService().upload_energy(data, "remove") == "Списано ⚡ 10"
+    checkpoint.assert_awaited_once_with(data, energy_charged=True)
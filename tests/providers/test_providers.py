@@ -0,0 +1,88 @@
+import pytest
+
+from src.config.config import settings
+from src.db.enums_class import MessageRole
+from src.scripts.providers.base import provider_name
+from src.scripts.providers.benchmark import build_service
+from src.scripts.providers.mock import MOCK_WORD, MockProvider
+from src.scripts.providers.service import ProviderRegistry
+from src.scripts.queue.retry import RetryableError
+
+
+INSTANT = {"latency_median": 0, "tokens_per_second": 0, "response_tokens": 5}
+
+
+def make_job():
+    return {
+        "user_id": 1,
+        "dialog_id": 7,
+        "version": "claude-3-5-haiku-20241022",
+        "energy_cost": 10,
+        "message": "Привет",
+    }
+
+
+def test_provider_comes_from_settings_or_override(monkeypatch):
+    registry = ProviderRegistry({"mock": MockProvider, "openai": MockProvider})
+
+    assert provider_name("claude-3-5-haiku-20241022") == "anthropic"
+    assert provider_name("o1") == "openai"
+
+    monkeypatch.setattr(settings, "TEXT_PROVIDER_OVERRIDE", "mock")
+    assert provider_name("claude-3-5-haiku-20241022") == "mock"
+    assert registry.for_model("gpt-4o") is registry.get("mock")
+    assert registry.assistant() is registry.get("mock")
+
+    with pytest.raises(KeyError):
+        registry.get("anthropic")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("stream", [True, False])
+async def test_text_service_answers_with_mock(monkeypatch, stream):
+    monkeypatch.setattr(settings, "TEXT_PROVIDER_OVERRIDE", "mock")
+    monkeypatch.setattr(settings, "STREAM_ANSWERS", stream)
+    service = build_service(INSTANT, seed=1)
+    data = make_job()
+
+    await service.send_message(data)
+
+    dialog = service.dialog_service.dialogs[7]
+    assert [message.role for message in dialog] == [MessageRole.USER, MessageRole.ASSISTANT]
+    assert dialog[1].message.split() == [MOCK_WORD] * 5
+    assert data["result"] == dialog[1].message
+    assert data["prompt_saved"] and data["energy_charged"]
+    assert ("text" not in data) is stream
+
+
+@pytest.mark.asyncio
+async def test_injected_errors_are_retried_with_refund(monkeypatch):
+    monkeypatch.setattr(settings, "TEXT_PROVIDER_OVERRIDE", "mock")
+    service = build_service({**INSTANT, "error_rate": 1}, seed=1)
+    data = make_job()
+
+    with pytest.raises(RetryableError):
+        await service.send_message(data)
+
+    # Запрос уже в диалоге, повтор задачи его не продублирует
+    assert data["prompt_saved"]
+    assert not data["energy_charged"]
+    assert "text" not in data
+
+
+@pytest.mark.asyncio
+async def test_default_mock_streams_assistant_answer_to_user(monkeypatch):
+    monkeypatch.setattr(settings, "TEXT_PROVIDER_OVERRIDE", "mock")
+    provider = ProviderRegistry().assistant()
+    provider.config.update(INSTANT)
+    delivered = []
+
+    async def answer_stream(data, chunks):
+        delivered.append("".join([chunk async for chunk in chunks]))
+        return delivered[-1]
+
+    monkeypatch.setattr(provider.message_client, "answer_stream", answer_stream)
+
+    text = await provider.run_assistant(make_job(), streamed=True)
+
+    assert delivered == [text]
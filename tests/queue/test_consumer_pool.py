@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from src.scripts.queue.consumer_pool import ConsumerPool, PoolDrainingError
+
+
+@pytest.mark.asyncio
+async def test_slot_limits_concurrency():
+    pool = ConsumerPool("claude", channel=None, prefetch_count=10, concurrency=2)
+    peak = 0
+
+    async def job():
+        nonlocal peak
+        async with pool.slot():
+            peak = max(peak, pool.in_flight)
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(*(job() for _ in range(6)))
+
+    assert peak == 2
+    assert pool.stats()["in_flight"] == 0
+    assert pool.stats()["processed"] == 6
+
+
+@pytest.mark.asyncio
+async def test_slot_counts_failures():
+    pool = ConsumerPool("midjourney", channel=None, concurrency=1)
+
+    with pytest.raises(RuntimeError):
+        async with pool.slot():
+            raise RuntimeError("boom")
+
+    assert pool.stats()["failed"] == 1
+    assert pool.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_waiting_tasks_are_rejected_while_draining():
+    pool = ConsumerPool("chatgpt", channel=None, concurrency=1)
+    release = asyncio.Event()
+    results = []
+
+    async def job(name):
+        with pool.track():
+            try:
+                async with pool.slot():
+                    await release.wait()
+                results.append((name, "done"))
+            except PoolDrainingError:
+                results.append((name, "requeued"))
+
+    tasks = [asyncio.create_task(job(i)) for i in range(3)]
+    await asyncio.sleep(0)
+    assert len(pool.tasks) == 3
+
+    await pool.stop_consuming()
+    release.set()
+    await asyncio.gather(*tasks)
+
+    assert results == [(0, "done"), (1, "requeued"), (2, "requeued")]
+    assert not pool.tasks
@@ -0,0 +1,72 @@
+import asyncio
+import time
+from unittest.mock import AsyncMock
+
+import pytest
+
+from src.scripts.queue import deadline
+from src.scripts.queue import rabbit_queue as rabbit_queue_module
+from src.scripts.queue.envelope import build_job, decode, encode
+from src.scripts.queue.rabbit_queue import DEADLINE_TEXT, RabbitQueue
+
+
+def test_deadline_survives_encoding():
+    job = build_job("chatgpt", user_id=1, dialog_id=2, version="gpt-4o", deadline=123.5)
+
+    assert decode(*encode(job)).deadline == 123.5
+
+
+def test_request_timeout_is_capped_by_deadline():
+    now = time.time()
+
+    assert deadline.request_timeout({"deadline": now + 30}, 600) == pytest.approx(30, abs=1)
+    assert deadline.request_timeout({"deadline": now + 900}, 600) == 600
+    assert deadline.request_timeout({"deadline": now - 5}, 600) == deadline.MIN_REQUEST_TIMEOUT
+    assert deadline.request_timeout({}, 600) == 600
+    # Старые задачи без deadline считаются от timestamp
+    assert deadline.time_left({"timestamp": now - 100}, ttl=600) == pytest.approx(500, abs=1)
+
+
+def test_lock_outlives_deadline():
+    assert deadline.lock_ttl(time.time() + 600) > 600
+    assert deadline.lock_ttl(None) == deadline.DEFAULT_LOCK_TTL
+
+
+@pytest.mark.asyncio
+async def test_job_is_cancelled_at_deadline(monkeypatch):
+    service = RabbitQueue()
+    service.energy_service.refund = AsyncMock()
+    service.message_client.edit_message = AsyncMock()
+    fail, complete = AsyncMock(), AsyncMock()
+    monkeypatch.setattr(rabbit_queue_module.job_store, "fail", fail)
+    monkeypatch.setattr(rabbit_queue_module.job_store, "complete", complete)
+
+    cancelled = asyncio.Event()
+
+    async def stuck_provider(body):
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    body = {"user_id": 1, "timestamp": time.time(), "deadline": time.time() + 0.05}
+    await service._run_until_deadline("chatgpt", body, stuck_provider, ttl=600)
+
+    assert cancelled.is_set()
+    service.energy_service.refund.assert_awaited_once_with(body)
+    service.message_client.edit_message.assert_awaited_once_with(body, DEADLINE_TEXT)
+    fail.assert_awaited_once()
+    complete.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_provider_timeout_is_not_treated_as_deadline(monkeypatch):
+    service = RabbitQueue()
+
+    async def timed_out(body):
+        raise asyncio.TimeoutError("read timeout")
+
+    body = {"user_id": 1, "timestamp": time.time(), "deadline": time.time() + 60}
+    with pytest.raises(TimeoutError):
+        await service._run_until_deadline("chatgpt", body, timed_out, ttl=600)
@@ -0,0 +1,111 @@
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from src.scripts.queue import rabbit_queue as rabbit_queue_module
+from src.scripts.queue.envelope import build_job, encode
+from src.scripts.queue.job_store import CLAIMED
+from src.scripts.queue.rabbit_queue import RabbitQueue
+
+
+DURATIONS = {"fast": 0.01, "slow": 10, "queued": 0.01}
+
+
+class FakeQueue:
+    def __init__(self):
+        self.callback = None
+
+    async def consume(self, callback):
+        self.callback = callback
+        return "consumer-1"
+
+    async def cancel(self, consumer_tag):
+        self.callback = None
+
+
+class FakeChannel:
+    def __init__(self):
+        self.queue = FakeQueue()
+
+    async def set_qos(self, prefetch_count):
+        pass
+
+    async def declare_queue(self, name, arguments=None):
+        return self.queue
+
+
+class FakeConnection:
+    def __init__(self):
+        self.channel_instance = FakeChannel()
+        self.is_closed = False
+
+    async def channel(self):
+        return self.channel_instance
+
+
+class FakeJobStore:
+    async def claim(self, data):
+        return CLAIMED
+
+    @asynccontextmanager
+    async def hold(self, data):
+        yield
+
+    complete = release = fail = checkpoint = AsyncMock()
+
+
+def make_message(user_id: int, kind: str):
+    body, content_type = encode(
+        build_job("claude", user_id=user_id, dialog_id=1, version="claude", message=kind)
+    )
+    message = MagicMock(body=body, content_type=content_type, priority=0)
+    message.ack, message.nack, message.reject = AsyncMock(), AsyncMock(), AsyncMock()
+    return message
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(rabbit_queue_module, "job_store", FakeJobStore())
+    monkeypatch.setattr(
+        rabbit_queue_module,
+        "redis_manager",
+        SimpleNamespace(incr=AsyncMock(), get=AsyncMock(return_value=None)),
+    )
+
+    service = RabbitQueue()
+    service._is_connected = True
+    service.connection = FakeConnection()
+    service.energy_service.refund = AsyncMock()
+    service.message_client.edit_message = AsyncMock()
+    service.publisher.close = AsyncMock()
+    service.stop = AsyncMock()
+    return service
+
+
+@pytest.mark.asyncio
+async def test_drain_waits_for_fast_jobs_and_requeues_the_rest(service):
+    async def callback(body):
+        await asyncio.sleep(DURATIONS[body["message"]])
+
+    await service.consume_messages("claude", callback, prefetch_count=3, concurrency=2)
+    process_message = service.connection.channel_instance.queue.callback
+
+    fast, slow, queued = make_message(1, "fast"), make_message(2, "slow"), make_message(3, "queued")
+    for message in (fast, slow, queued):
+        asyncio.create_task(process_message(message))
+    await asyncio.sleep(0)
+
+    await service.drain(timeout=0.1)
+
+    # Быстрая задача доработала, медленная отменена, ожидавшая слот не начиналась
+    fast.ack.assert_awaited_once()
+    for message in (slow, queued):
+        message.ack.assert_not_awaited()
+        message.nack.assert_awaited_once_with(requeue=True)
+    assert service.energy_service.refund.await_count == 2
+    service.stop.assert_awaited_once()
+    assert service._pools["claude"].draining
+    assert service.connection.channel_instance.queue.callback is None
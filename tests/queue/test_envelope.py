@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+from src.scripts.queue.envelope import (
+    CONTENT_TYPE_JSON,
+    CONTENT_TYPE_MSGPACK,
+    EnvelopeError,
+    ImageJob,
+    TextJob,
+    build_job,
+    decode,
+    encode,
+)
+
+
+def test_msgpack_round_trip():
+    job = build_job(
+        "claude", user_id=1, message="hi", dialog_id=2, version="claude-3", energy_cost=3
+    )
+
+    body, content_type = encode(job)
+    decoded = decode(body, content_type)
+
+    assert content_type == CONTENT_TYPE_MSGPACK
+    assert isinstance(decoded, TextJob)
+    assert decoded == job
+
+
+def test_legacy_json_message_is_accepted():
+    body = json.dumps(
+        {
+            "type": "midjourney",
+            "user_id": 1,
+            "message": "cat",
+            "unknown_field": True,
+            "timestamp": "2025-01-01T00:00:00",
+        }
+    ).encode()
+
+    job = decode(body, CONTENT_TYPE_JSON)
+
+    assert isinstance(job, ImageJob)
+    assert job.speed_mode == "relax"
+    assert isinstance(job.timestamp, float)
+
+
+def test_missing_required_field_is_rejected():
+    body, content_type = encode(build_job("referral", user_id=1, text="hi"), "json")
+    payload = json.loads(body)
+    payload["type"] = "chatgpt"
+
+    with pytest.raises(EnvelopeError):
+        decode(json.dumps(payload).encode(), content_type)
+
+    with pytest.raises(EnvelopeError):
+        build_job("chatgpt", user_id=1, message="hi", wrong=1)
@@ -0,0 +1,34 @@
+import time
+from unittest.mock import AsyncMock
+
+import pytest
+
+from src.scripts.queue import rabbit_queue as rabbit_queue_module
+from src.scripts.queue.rabbit_queue import EXPIRED_TEXT, RabbitQueue
+
+
+def test_only_old_jobs_without_result_are_expired():
+    now = time.time()
+
+    assert RabbitQueue._is_expired({"timestamp": now - 700}, ttl=600)
+    assert not RabbitQueue._is_expired({"timestamp": now - 10}, ttl=600)
+    assert not RabbitQueue._is_expired({"timestamp": now - 700}, ttl=None)
+    assert not RabbitQueue._is_expired(
+        {"timestamp": now - 700, "result": "готово"}, ttl=600
+    )
+
+
+@pytest.mark.asyncio
+async def test_expired_job_is_refunded_and_user_notified(monkeypatch):
+    service = RabbitQueue()
+    service.energy_service.refund = AsyncMock()
+    service.message_client.edit_message = AsyncMock()
+    fail = AsyncMock()
+    monkeypatch.setattr(rabbit_queue_module.job_store, "fail", fail)
+
+    body = {"user_id": 1, "timestamp": time.time() - 700, "answer_message": 5}
+    await service._expire("chatgpt", body)
+
+    service.energy_service.refund.assert_awaited_once_with(body)
+    service.message_client.edit_message.assert_awaited_once_with(body, EXPIRED_TEXT)
+    fail.assert_awaited_once()
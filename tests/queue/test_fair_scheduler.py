@@ -0,0 +1,97 @@
+import asyncio
+import time
+
+import pytest
+
+from src.scripts.queue.fair_scheduler import FairScheduler
+
+
+async def _run(scheduler: FairScheduler, user_id, priority, order):
+    await scheduler.acquire(user_id, priority)
+    order.append(user_id)
+    await asyncio.sleep(0)
+    scheduler.release()
+
+
+@pytest.mark.asyncio
+async def test_users_are_served_round_robin():
+    scheduler = FairScheduler(concurrency=1)
+    order = []
+
+    await scheduler.acquire()
+    tasks = [asyncio.create_task(_run(scheduler, "heavy", 0, order)) for _ in range(3)]
+    tasks += [asyncio.create_task(_run(scheduler, user, 0, order)) for user in ("a", "b")]
+    await asyncio.sleep(0)
+    scheduler.release()
+    await asyncio.gather(*tasks)
+
+    assert order == ["heavy", "a", "b", "heavy", "heavy"]
+
+
+@pytest.mark.asyncio
+async def test_waiting_jobs_age_past_premium():
+    scheduler = FairScheduler(concurrency=1, aging_interval=0.005)
+    order = []
+
+    await scheduler.acquire()
+    tasks = [asyncio.create_task(_run(scheduler, "free", 0, order))]
+    await asyncio.sleep(0.06)
+    tasks += [asyncio.create_task(_run(scheduler, "premium", 5, order)) for _ in range(3)]
+    await asyncio.sleep(0)
+    scheduler.release()
+    await asyncio.gather(*tasks)
+
+    assert order[0] == "free"
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_leak_slot():
+    scheduler = FairScheduler(concurrency=1)
+    await scheduler.acquire()
+
+    waiter = asyncio.create_task(scheduler.acquire("a"))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    await asyncio.gather(waiter, return_exceptions=True)
+    scheduler.release()
+
+    assert scheduler.waiting == 0
+    await asyncio.wait_for(scheduler.acquire("b"), timeout=1)
+
+
+def _p99(values):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * 0.99))]
+
+
+async def _bench(acquire, release) -> float:
+    """Один пользователь загружает пачку документов, остальные шлют по одному запросу"""
+
+    waits = {}
+
+    async def job(user_id):
+        started = time.monotonic()
+        await acquire(user_id)
+        waits.setdefault(user_id, []).append(time.monotonic() - started)
+        await asyncio.sleep(0.002)
+        release()
+
+    jobs = [job("heavy") for _ in range(40)] + [job(f"user{i}") for i in range(10)]
+    await asyncio.gather(*jobs)
+
+    return _p99([max(values) for user_id, values in waits.items() if user_id != "heavy"])
+
+
+@pytest.mark.asyncio
+async def test_fair_scheduler_improves_p99_wait_per_user():
+    semaphore = asyncio.Semaphore(2)
+
+    async def fifo_acquire(user_id):
+        await semaphore.acquire()
+
+    fifo_p99 = await _bench(fifo_acquire, semaphore.release)
+
+    scheduler = FairScheduler(concurrency=2)
+    fair_p99 = await _bench(scheduler.acquire, scheduler.release)
+
+    assert fair_p99 < fifo_p99 / 2
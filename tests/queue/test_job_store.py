@@ -0,0 +1,91 @@
+import pytest
+
+from src.scripts.queue import job_store as job_store_module
+from src.scripts.queue.job_store import CLAIMED, DONE, IN_PROGRESS, JobStore
+
+
+class FakeRedis:
+    def __init__(self):
+        self.storage = {}
+
+    async def get(self, key):
+        return self.storage.get(key)
+
+    async def set(self, key, value, ttl=None):
+        self.storage[key] = value
+        return True
+
+    async def set_nx(self, key, value, ttl):
+        if key in self.storage:
+            return False
+        self.storage[key] = value
+        return True
+
+    async def expire(self, key, ttl):
+        return key in self.storage
+
+    async def delete(self, key):
+        self.storage.pop(key, None)
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(job_store_module, "redis_manager", fake)
+    return fake
+
+
+@pytest.mark.asyncio
+async def test_completed_job_is_not_executed_again(redis):
+    store = JobStore()
+    job = {"message_id": "m1", "user_id": 1}
+
+    assert await store.claim(job) == CLAIMED
+    assert await store.claim(dict(job)) == IN_PROGRESS
+
+    await store.complete(job)
+
+    assert await store.claim(dict(job)) == DONE
+
+
+@pytest.mark.asyncio
+async def test_redelivery_resumes_from_checkpoint(redis):
+    store = JobStore()
+    job = {"message_id": "m2", "user_id": 1}
+
+    await store.claim(job)
+    await store.checkpoint(job, energy_charged=True, prompt_saved=True)
+    # Воркер умер: захват истёк, запись с контрольными точками осталась
+    await redis.delete("job:m2:claim")
+
+    redelivered = {"message_id": "m2", "user_id": 1}
+
+    assert await JobStore().claim(redelivered) == CLAIMED
+    assert redelivered["energy_charged"] is True
+    assert redelivered["prompt_saved"] is True
+
+
+@pytest.mark.asyncio
+async def test_released_job_can_be_claimed_again(redis):
+    store = JobStore()
+    job = {"message_id": "m3", "user_id": 1}
+
+    await store.claim(job)
+    await store.release(job)
+
+    assert await store.claim(dict(job)) == CLAIMED
+
+
+@pytest.mark.asyncio
+async def test_jobs_without_id_and_redis_failures_run_normally(redis, monkeypatch):
+    store = JobStore()
+    assert await store.claim({"user_id": 1}) == CLAIMED
+
+    async def broken(*args, **kwargs):
+        raise ConnectionError("redis is down")
+
+    monkeypatch.setattr(redis, "get", broken)
+    job = {"message_id": "m4", "user_id": 1}
+
+    assert await store.claim(job) == CLAIMED
+    assert job["message_id"] is None
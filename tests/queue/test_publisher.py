@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+from src.scripts.queue import publisher as publisher_module
+from src.scripts.queue.publisher import Publisher
+
+
+class FakeExchange:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.published = []
+
+    async def publish(self, message, routing_key, timeout=None):
+        if self.fail:
+            raise ConnectionError("broker is down")
+        self.published.append((routing_key, message.body, message.priority))
+
+
+class FakeChannel:
+    def __init__(self, exchange: FakeExchange):
+        self.default_exchange = exchange
+        self.is_closed = False
+        self.declared = []
+
+    async def declare_queue(self, name, arguments=None):
+        # Ответ брокера: остальные публикации пачки успевают дойти до объявления
+        await asyncio.sleep(0)
+        self.declared.append(name)
+
+    async def close(self):
+        self.is_closed = True
+
+
+class FakeConnection:
+    def __init__(self, exchange: FakeExchange):
+        self.exchange = exchange
+        self.channels = []
+
+    async def channel(self, publisher_confirms=False):
+        channel = FakeChannel(self.exchange)
+        self.channels.append(channel)
+        return channel
+
+
+class FakeQueueService:
+    def __init__(self, exchange: FakeExchange):
+        self.connection = FakeConnection(exchange)
+
+    async def connect(self):
+        return self.connection, None
+
+
+@pytest.fixture(autouse=True)
+def fake_redis(monkeypatch):
+    storage = []
+
+    async def push_list(key, *values):
+        storage.extend(values)
+        return True
+
+    async def pop_list(key, count=1):
+        items = storage[:count]
+        del storage[:count]
+        return items
+
+    monkeypatch.setattr(publisher_module.redis_manager, "push_list", push_list)
+    monkeypatch.setattr(publisher_module.redis_manager, "pop_list", pop_list)
+    return storage
+
+
+async def _wait_flushed(publisher: Publisher):
+    for _ in range(100):
+        if not publisher.pending:
+            return
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_publish_returns_before_broker_confirm():
+    exchange = FakeExchange()
+    publisher = Publisher(FakeQueueService(exchange), {}, channels_count=2)
+
+    for i in range(5):
+        publisher.publish("claude", f"{i}".encode(), priority=5)
+
+    assert publisher.pending == 5
+    await _wait_flushed(publisher)
+
+    assert [body for _, body, _ in exchange.published] == [b"0", b"1", b"2", b"3", b"4"]
+    await publisher.close()
+
+
+@pytest.mark.asyncio
+async def test_queue_declared_once_per_channel_pool():
+    exchange = FakeExchange()
+    service = FakeQueueService(exchange)
+    publisher = Publisher(service, {}, channels_count=2)
+
+    for _ in range(10):
+        publisher.publish("chatgpt", b"{}")
+    await _wait_flushed(publisher)
+
+    declared = sum(len(channel.declared) for channel in service.connection.channels)
+    assert declared == 1
+    await publisher.close()
+
+
+@pytest.mark.asyncio
+async def test_outbox_spills_to_redis_when_broker_is_down(fake_redis):
+    exchange = FakeExchange(fail=True)
+    publisher = Publisher(FakeQueueService(exchange), {}, max_outbox=2)
+
+    for _ in range(5):
+        publisher.publish("midjourney", b"{}")
+
+    await asyncio.sleep(0.05)
+    assert publisher.pending == 2
+    assert len(fake_redis) == 3
+
+    await publisher.close(timeout=0.1)
+    assert len(fake_redis) == 5
@@ -0,0 +1,39 @@
+import httpx
+import openai
+
+from src.scripts.queue.retry import RetryPolicy, RetryableError, is_retryable
+
+
+def _openai_error(status_code: int, code: str = None) -> openai.APIStatusError:
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(status_code, request=request)
+    return openai.APIStatusError(
+        "error", response=response, body={"code": code} if code else None
+    )
+
+
+def test_next_delay_respects_tiers_and_jitter():
+    policy = RetryPolicy(delays=[5, 30], jitter=0.2)
+
+    assert 4 <= policy.next_delay(0) <= 6
+    assert 24 <= policy.next_delay(1) <= 36
+    assert policy.next_delay(2) is None
+
+
+def test_tier_queue_dead_letters_back_to_source():
+    policy = RetryPolicy(delays=[5, 30], jitter=0.2)
+
+    name, arguments = policy.tier_queue("claude", 1)
+
+    assert name == "claude_retry_30s"
+    assert arguments["x-dead-letter-routing-key"] == "claude"
+    assert arguments["x-message-ttl"] == 36000
+
+
+def test_is_retryable():
+    assert is_retryable(RetryableError())
+    assert is_retryable(_openai_error(429))
+    assert is_retryable(_openai_error(503))
+    assert not is_retryable(_openai_error(400))
+    assert not is_retryable(_openai_error(429, code="insufficient_quota"))
+    assert not is_retryable(KeyError("dialog_id"))
@@ -0,0 +1,91 @@
+from src.scripts.queue import supervisor as supervisor_module
+from src.scripts.queue.supervisor import WorkerSupervisor, WorkerSlot
+
+
+class FakeProcess:
+    def __init__(self, target=None, args=(), name=None):
+        self.name = name
+        self.args = args
+        self.pid = 1
+        self.alive = True
+        self.exitcode = None
+
+    def start(self):
+        pass
+
+    def is_alive(self):
+        return self.alive
+
+    def close(self):
+        pass
+
+
+class FakeContext:
+    Process = FakeProcess
+
+
+def _supervisor() -> WorkerSupervisor:
+    supervisor = WorkerSupervisor(groups=["notifications"])
+    supervisor.context = FakeContext()
+    return supervisor
+
+
+def test_slots_follow_worker_groups():
+    supervisor = _supervisor()
+
+    assert [slot.name for slot in supervisor.slots] == ["worker-notifications-0"]
+    assert supervisor.slots[0].queues == ["referral"]
+
+
+def test_crashed_process_restarts_with_backoff():
+    supervisor = _supervisor()
+    slot: WorkerSlot = supervisor.slots[0]
+
+    supervisor._check_slot(slot, now=0)
+    first = slot.process
+    assert first is not None
+
+    first.alive = False
+    first.exitcode = 1
+    supervisor._check_slot(slot, now=10)
+    assert slot.process is None
+    assert slot.restart_at == 11
+
+    supervisor._check_slot(slot, now=10.5)
+    assert slot.process is None
+
+    supervisor._check_slot(slot, now=11)
+    assert slot.process is not first
+
+    slot.process.alive = False
+    supervisor._check_slot(slot, now=12)
+    assert slot.restart_at == 14
+
+
+def test_backoff_resets_after_healthy_uptime():
+    supervisor = _supervisor()
+    slot = supervisor.slots[0]
+    slot.failures = 3
+
+    supervisor._check_slot(slot, now=100)
+    supervisor._check_slot(slot, now=100 + supervisor_module.HEALTHY_UPTIME + 1)
+
+    assert slot.failures == 0
+
+
+def test_processes_learn_group_size(monkeypatch):
+    monkeypatch.setattr(supervisor_module.settings, "WORKER_TEXT_PROCESSES", 3)
+    supervisor = WorkerSupervisor(groups=["text", "notifications"])
+    supervisor.context = FakeContext()
+
+    for slot in supervisor.slots:
+        supervisor._check_slot(slot, now=0)
+
+    # Каждый процесс знает размер своей группы, чтобы взять долю RATE_LIMITS
+    sizes = {slot.name: slot.process.args[2] for slot in supervisor.slots}
+    assert sizes == {
+        "worker-text-0": 3,
+        "worker-text-1": 3,
+        "worker-text-2": 3,
+        "worker-notifications-0": 1,
+    }
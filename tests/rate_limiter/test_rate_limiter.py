@@ -0,0 +1,117 @@
+import asyncio
+import time
+
+import pytest
+
+from src.scripts.rate_limiter import service as limiter_module
+from src.scripts.rate_limiter.service import RateLimiter
+
+
+@pytest.mark.asyncio
+async def test_waiters_are_served_by_priority():
+    limiter = RateLimiter("test", max_concurrency=1)
+    order = []
+
+    async def call(name, priority):
+        async with limiter.acquire(priority=priority):
+            order.append(name)
+
+    async with limiter.acquire():
+        tasks = [
+            asyncio.create_task(call("free", 0)),
+            asyncio.create_task(call("premium", 5)),
+            asyncio.create_task(call("background", -1)),
+        ]
+        await asyncio.sleep(0)
+        assert limiter.waiting == 3
+
+    await asyncio.gather(*tasks)
+    assert order == ["premium", "free", "background"]
+
+
+def test_concurrency_follows_aimd(monkeypatch):
+    limiter = RateLimiter("test", max_concurrency=16)
+
+    limiter.observe(429, {"retry-after": "0"})
+    limiter.observe(429, {})
+    assert limiter.limit == 8
+
+    # Сразу после снижения и без упора в лимит он не растёт
+    limiter.in_flight = 8
+    limiter.observe(200, {})
+    assert limiter.limit == 8
+
+    monkeypatch.setattr(limiter_module, "DECREASE_COOLDOWN", 0)
+    limiter.in_flight = 2
+    limiter.observe(200, {})
+    assert limiter.limit == 8
+
+    limiter.in_flight = 8
+    for _ in range(8):
+        limiter.observe(200, {})
+    assert 8.9 < limiter.limit < 9.1
+
+
+def test_budgets_are_learned_from_headers():
+    limiter = RateLimiter("test", rpm=None, tpm=None)
+    headers = {
+        "x-ratelimit-limit-requests": "60",
+        "x-ratelimit-remaining-requests": "0",
+        "x-ratelimit-limit-tokens": "60000",
+        "x-ratelimit-remaining-tokens": "59000",
+    }
+
+    limiter.observe(200, headers, provider="openai")
+
+    now = time.monotonic()
+    assert limiter.requests.capacity == 60
+    assert limiter.requests.delay(1, now) == pytest.approx(1, abs=0.05)
+    assert limiter.tokens.delay(1000, now) == 0
+
+
+@pytest.mark.asyncio
+async def test_throughput_settles_below_provider_ceiling(monkeypatch):
+    monkeypatch.setattr(limiter_module, "DECREASE_COOLDOWN", 0.02)
+    limiter = RateLimiter("test", max_concurrency=32)
+
+    ceiling, in_flight, throttled = 8, 0, 0
+
+    async def provider_call():
+        nonlocal in_flight, throttled
+        async with limiter.acquire():
+            in_flight += 1
+            try:
+                await asyncio.sleep(0.002)
+                if in_flight > ceiling:
+                    throttled += 1
+                    limiter.observe(429, {"retry-after-ms": "5"})
+                else:
+                    limiter.observe(200, {})
+            finally:
+                in_flight -= 1
+
+    await asyncio.gather(*(provider_call() for _ in range(400)))
+
+    # После нескольких первых 429 лимит держится около потолка провайдера
+    assert throttled < 100
+    assert limiter.limit <= ceiling * 2
+
+
+def test_group_processes_share_provider_budget(monkeypatch):
+    monkeypatch.setattr(limiter_module.settings, "WORKER_GROUP_PROCESSES", 4)
+    keys = max(len(limiter_module.credential_pools.get("openai")), 1)
+    config = limiter_module.settings.RATE_LIMITS["openai"]
+
+    limiter = limiter_module.RateLimiterRegistry().get("openai", "gpt-4o")
+    assert limiter.requests.capacity == config["rpm"] * keys / 4
+    assert limiter.tokens.capacity == config["tpm"] * keys / 4
+    assert limiter.max_concurrency == config["concurrency"] * keys // 4
+
+    # Заголовки описывают весь аккаунт - процессу достаётся его доля
+    limiter.observe(
+        200,
+        {"x-ratelimit-limit-requests": "400", "x-ratelimit-remaining-requests": "400"},
+        provider="openai",
+        scale=1 / 4,
+    )
+    assert limiter.requests.capacity == 100
@@ -0,0 +1,107 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src.config.config import settings
+from src.db.enums_class import MessageRole
+from src.scripts.response_cache import service as cache_module
+from src.scripts.response_cache.service import ResponseCache, get_metrics
+
+
+class FakeRedis:
+    def __init__(self):
+        self.storage = {}
+        self.sets = {}
+        self.hashes = {}
+
+    async def get(self, key):
+        return self.storage.get(key)
+
+    async def set(self, key, value, ttl=None):
+        self.storage[key] = value
+
+    async def delete(self, key):
+        self.storage.pop(key, None)
+
+    async def zadd(self, key, mapping, ttl=None):
+        self.sets.setdefault(key, {}).update(mapping)
+
+    async def zcard(self, key):
+        return len(self.sets.get(key, {}))
+
+    async def zpopmin(self, key, count=1):
+        members = sorted(self.sets[key], key=self.sets[key].get)[:count]
+        for member in members:
+            del self.sets[key][member]
+        return members
+
+    async def hincrby(self, key, ttl=None, **amounts):
+        data = self.hashes.setdefault(key, {})
+        for field, amount in amounts.items():
+            data[field] = data.get(field, 0) + amount
+
+    async def get_hgetall(self, key):
+        return {field.encode(): str(value).encode() for field, value in self.hashes.get(key, {}).items()}
+
+
+def user_message(text):
+    return SimpleNamespace(role=MessageRole.USER, message=text)
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(cache_module, "redis_manager", fake)
+    return fake
+
+
+@pytest.mark.asyncio
+async def test_first_turn_is_cached_and_counted(redis):
+    cache = ResponseCache()
+    version = "gpt-4o-mini"
+
+    assert await cache.lookup(version, None, [user_message("Напиши  тост")]) is None
+    await cache.store(version, None, [user_message("Напиши  тост")], "За нас!")
+
+    assert await cache.lookup(version, None, [user_message("напиши тост ")]) == "За нас!"
+
+    metrics = await get_metrics()
+    assert metrics[version] == {
+        "hits": 1,
+        "misses": 1,
+        "bytes_saved": len("За нас!".encode()),
+        "hit_rate": 0.5,
+    }
+
+
+@pytest.mark.asyncio
+async def test_only_enabled_models_without_history_are_cached(redis):
+    cache = ResponseCache()
+    history = [
+        user_message("привет"),
+        SimpleNamespace(role=MessageRole.ASSISTANT, message="здравствуйте"),
+        user_message("привет"),
+    ]
+
+    await cache.store("gpt-4o-mini", None, history, "ответ")
+    await cache.store("gpt-4o-mini", "краткое содержание", [user_message("привет")], "ответ")
+    await cache.store("o1", None, [user_message("привет")], "ответ")
+
+    assert redis.storage == {}
+
+
+@pytest.mark.asyncio
+async def test_least_recently_used_entries_are_evicted(monkeypatch, redis):
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_MAX_ENTRIES", 2)
+    cache = ResponseCache()
+    version = "gpt-4o-mini"
+
+    for prompt in ("один", "два"):
+        await cache.store(version, None, [user_message(prompt)], prompt)
+    # Обращение к первой записи делает вытесняемой вторую
+    assert await cache.lookup(version, None, [user_message("один")]) == "один"
+    await cache.store(version, None, [user_message("три")], "три")
+
+    assert await cache.lookup(version, None, [user_message("один")]) == "один"
+    assert await cache.lookup(version, None, [user_message("два")]) is None
+    assert await cache.lookup(version, None, [user_message("три")]) == "три"
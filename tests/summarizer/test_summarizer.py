@@ -0,0 +1,120 @@
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from src.db.enums_class import MessageRole
+from src.scripts.queue import rabbit_queue as rabbit_queue_module
+from src.scripts.queue.envelope import build_job, encode
+from src.scripts.queue.rabbit_queue import RabbitQueue
+from src.scripts.queue.retry import RetryPolicy
+from src.scripts.summarizer import service as summarizer_module
+from src.scripts.summarizer.service import SUMMARY_CHUNK_TOKENS, DialogSummarizer
+
+
+def make_message(message_id, role=MessageRole.USER, tokens=100):
+    return SimpleNamespace(
+        message_id=message_id, role=role, message="текст", token_count=tokens
+    )
+
+
+def test_chunk_stops_at_tail_and_token_limit():
+    messages = [make_message(i, tokens=SUMMARY_CHUNK_TOKENS // 3) for i in range(1, 6)]
+
+    assert [m.message_id for m in DialogSummarizer._select_chunk(messages, 3)] == [1, 2]
+    assert [m.message_id for m in DialogSummarizer._select_chunk(messages, 10)] == [1, 2, 3]
+    assert DialogSummarizer._select_chunk(messages, 1) == []
+
+
+@pytest.mark.asyncio
+async def test_compact_folds_history_before_recent_tail(monkeypatch):
+    history = [
+        make_message(i, MessageRole.USER if i % 2 else MessageRole.ASSISTANT)
+        for i in range(1, 11)
+    ]
+    # В хвосте первым оказался ответ ассистента - он тоже уходит в краткое содержание
+    tail = history[5:]
+
+    orm = SimpleNamespace(
+        get_dialog=AsyncMock(
+            return_value=SimpleNamespace(id=7, summary="раньше", summary_message_id=None)
+        ),
+        get_dialog_context=AsyncMock(return_value=list(tail)),
+        get_messages_after=AsyncMock(
+            side_effect=lambda dialog_id, after: [
+                m for m in history if m.message_id > (after or 0)
+            ]
+        ),
+        set_summary=AsyncMock(),
+    )
+    monkeypatch.setattr(summarizer_module, "DialogORM", orm)
+
+    summarizer = DialogSummarizer()
+    summarize = AsyncMock(return_value="новое содержание")
+    monkeypatch.setattr(summarizer, "_summarize", summarize)
+
+    await summarizer.compact({"dialog_id": 7, "version": "gpt-4o"})
+
+    assert summarize.await_args.args[0] == "раньше"
+    assert [m.message_id for m in summarize.await_args.args[1]] == [1, 2, 3, 4, 5, 6]
+    orm.set_summary.assert_awaited_once_with(7, "новое содержание", 6)
+
+
+@pytest.mark.asyncio
+async def test_schedule_publishes_once_per_dialog(monkeypatch):
+    orm = SimpleNamespace(
+        get_dialog=AsyncMock(return_value=SimpleNamespace(id=7, summary_message_id=None)),
+        count_dialog_tokens=AsyncMock(return_value=10**6),
+    )
+    locks = set()
+
+    async def set_nx(key, value, ttl):
+        if key in locks:
+            return False
+        locks.add(key)
+        return True
+
+    publish = AsyncMock()
+    monkeypatch.setattr(summarizer_module, "DialogORM", orm)
+    monkeypatch.setattr(summarizer_module.redis_manager, "set_nx", set_nx)
+
+    summarizer = DialogSummarizer(SimpleNamespace(publish_message=publish))
+    await summarizer.schedule(7, "gpt-4o")
+    await summarizer.schedule(7, "gpt-4o")
+
+    publish.assert_awaited_once()
+    assert publish.await_args.kwargs["queue_name"] == "dialog_summary"
+
+    orm.count_dialog_tokens.return_value = 10
+    publish.reset_mock()
+    locks.clear()
+    await summarizer.schedule(7, "gpt-4o")
+    publish.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_failed_summary_job_releases_lock_without_notifying(monkeypatch):
+    key = summarizer_module.SUMMARY_LOCK_KEY.format(dialog_id=5)
+    redis = SimpleNamespace(
+        incr=AsyncMock(), get=AsyncMock(return_value="summary"), delete=AsyncMock()
+    )
+    monkeypatch.setattr(rabbit_queue_module, "redis_manager", redis)
+    monkeypatch.setattr(rabbit_queue_module.job_store, "fail", AsyncMock())
+
+    service = RabbitQueue()
+    service.message_client.answer_message = AsyncMock()
+    service.publisher.publish = lambda *args, **kwargs: None
+
+    job = build_job("dialog_summary", dialog_id=5, version="gpt-4o", key=key)
+    body, content_type = encode(job)
+    message = SimpleNamespace(
+        body=body, content_type=content_type, priority=0, nack=AsyncMock()
+    )
+
+    await service._handle_failure(
+        "dialog_summary", message, job.to_dict(), ValueError("boom"), RetryPolicy([])
+    )
+
+    message.nack.assert_awaited_once_with(requeue=False)
+    service.message_client.answer_message.assert_not_awaited()
+    redis.delete.assert_awaited_once_with(key)
@@ -0,0 +1,80 @@
+import pytest
+
+from src.scripts.transcription import service as transcription_module
+from src.scripts.transcription.service import Transcriber, choose_cuts
+
+
+class FakeRedis:
+    def __init__(self):
+        self.storage = {}
+
+    async def get(self, key):
+        return self.storage.get(key)
+
+    async def set(self, key, value, ttl=None):
+        self.storage[key] = value
+
+
+def test_cuts_prefer_nearby_silence():
+    assert choose_cuts([20, 55, 130, 170], duration=200, target=60) == [55, 130]
+    # После 55 секунды пауз рядом нет - режем ровно через target
+    assert choose_cuts([55], duration=200, target=60) == [55, 115]
+    assert choose_cuts([30], duration=80, target=60) == []
+
+
+@pytest.mark.asyncio
+async def test_transcript_is_cached_by_unique_id(monkeypatch):
+    monkeypatch.setattr(transcription_module, "redis_manager", FakeRedis())
+    transcriber = Transcriber(client=None)
+    calls = []
+
+    async def download(url, timeout):
+        return b"audio"
+
+    async def whisper(audio, data):
+        calls.append(audio)
+        return "привет"
+
+    monkeypatch.setattr(transcriber, "_download", download)
+    monkeypatch.setattr(transcriber, "_whisper", whisper)
+    file = {"url": "https://example.org/voice.ogg", "unique_id": "abc", "duration": 5}
+
+    assert await transcriber.transcribe(file, {}) == "привет"
+    assert await transcriber.transcribe(file, {}) == "привет"
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_long_voice_is_split_and_stitched_in_order(monkeypatch):
+    transcriber = Transcriber(client=None)
+
+    async def find_silences(audio):
+        return [58.0, 121.0]
+
+    async def cut_segment(audio, start, end):
+        return f"{start:.0f}".encode()
+
+    async def whisper(audio, data):
+        return {b"0": "раз", b"58": "два", b"121": "три"}[audio]
+
+    monkeypatch.setattr(transcription_module, "find_silences", find_silences)
+    monkeypatch.setattr(transcription_module, "cut_segment", cut_segment)
+    monkeypatch.setattr(transcriber, "_whisper", whisper)
+
+    assert await transcriber._transcribe(b"audio", duration=180, data={}) == "раз два три"
+
+
+@pytest.mark.asyncio
+async def test_without_ffmpeg_voice_is_sent_whole(monkeypatch):
+    transcriber = Transcriber(client=None)
+
+    async def find_silences(audio):
+        raise FileNotFoundError("ffmpeg")
+
+    async def whisper(audio, data):
+        return "целиком"
+
+    monkeypatch.setattr(transcription_module, "find_silences", find_silences)
+    monkeypatch.setattr(transcriber, "_whisper", whisper)
+
+    assert await transcriber._transcribe(b"audio", duration=300, data={}) == "целиком"
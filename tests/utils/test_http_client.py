@@ -0,0 +1,46 @@
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from src.utils.http_client import HttpClient
+
+
+@pytest.mark.asyncio
+async def test_requests_reuse_keep_alive_connection():
+    peers = []
+
+    async def handler(request: web.Request) -> web.Response:
+        peers.append(request.transport.get_extra_info("peername"))
+        return web.Response(text="ok")
+
+    app = web.Application()
+    app.router.add_get("/", handler)
+    server = TestServer(app)
+    await server.start_server()
+
+    client = HttpClient()
+    try:
+        for _ in range(3):
+            async with client.session() as session:
+                async with session.get(server.make_url("/")) as response:
+                    assert await response.text() == "ok"
+
+        assert len(set(peers)) == 1
+        assert not (await client.get_session()).closed
+    finally:
+        await client.close()
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_closed_session_is_recreated():
+    client = HttpClient()
+    first = await client.get_session()
+    await client.close()
+
+    second = await client.get_session()
+    try:
+        assert first.closed
+        assert second is not first and not second.closed
+    finally:
+        await client.close()